@@ -1,5 +1,7 @@
 import streamlit as st
 from db import init_db, authenticate_user, get_background_color
+from diagnostics import command_recorder
+from profiling import profiler
 import views.judges_page as judges_page
 import views.competitors_page as competitors_page
 import views.scoring_page as scoring_page
@@ -9,8 +11,9 @@ import views.questions_page as questions_page
 def main():
     # Setup Streamlit page
     st.set_page_config(page_title="Judging Tool", layout="wide")
+    command_recorder.start_rerun()
 
-    # Create DB tables if it doesn't exist
+    # Create indexes + default admin once per process (cached across reruns)
     init_db()
     apply_background_theme()
 
@@ -28,13 +31,16 @@ def main():
 
     if user["role"] == "admin":
         page = st.sidebar.radio("Navigation", [
-            "Manage Judges", "Manage Competitors", "Manage Questions", "Customize", "Leaderboard"
+            "Manage Judges", "Manage Competitors", "Manage Questions", "Customize", "Leaderboard",
+            "Diagnostics",
         ])
     else:
         page = st.sidebar.radio("Navigation", [
             "Enter Scores"
         ])
 
+    command_recorder.set_page(page)
+
     # Routes to correct page
     if page == "Manage Judges":
         judges_page.show()
@@ -49,6 +55,9 @@ def main():
         scoring_page.show()
     elif page == "Leaderboard":
         leaderboard_page.show()
+    elif page == "Diagnostics":
+        import views.diagnostics_page as diagnostics_page
+        diagnostics_page.show()
 
 def apply_background_theme():
     color = get_background_color()
@@ -85,4 +94,5 @@ def render_login():
     st.stop()
 
 if __name__ == "__main__":
-    main()
+    # Profiles the whole rerun when JUDGING_PROFILE is set or an admin turns it on
+    profiler.run(main)
@@ -0,0 +1,556 @@
+"""
+Benchmarks for the storage layer, written as JSON so runs can be diffed between versions.
+
+    python benchmark.py db --judges 20 --competitors 200 --questions 10
+    python benchmark.py db --backend mongo --uri mongodb://localhost:27017 --output before.json
+    python benchmark.py db --backend sqlite --judges 200 --competitors 2000 --questions 20
+    python benchmark.py pages --budget page_budget.json   # cost of each click, per rerun
+
+The target database is wiped and reseeded. Mongo runs default to an in-process mongomock
+(`pip install mongomock`) and a dedicated database name so real data is never touched.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from pymongo import monitoring
+
+DEFAULT_BENCH_DB = "judging_app_bench"
+DEFAULT_BENCH_URI = "mongomock://"
+# Answers/scores per insert batch while seeding
+SEED_BATCH_SIZE = 5000
+
+
+class RoundTripCounter(monitoring.CommandListener):
+    """
+    Counts commands sent to storage. Real Mongo servers report through pymongo's command
+    monitoring; mongomock and SQLite are counted at the driver call boundary instead.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def add(self, n: int = 1):
+        with self._lock:
+            self.count += n
+
+    def reset(self) -> int:
+        with self._lock:
+            count, self.count = self.count, 0
+        return count
+
+    def started(self, event):
+        self.add()
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+class _CountingCollection:
+    def __init__(self, collection, counter: RoundTripCounter):
+        self._collection = collection
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            self._counter.add()
+            return attr(*args, **kwargs)
+
+        return call
+
+
+class _CountingDatabase:
+    """mongomock database proxy: every collection method call counts as one round trip."""
+
+    def __init__(self, db, counter: RoundTripCounter):
+        self._db = db
+        self._counter = counter
+
+    def __getattr__(self, name):
+        if name in ("client", "name") or name.startswith("_"):
+            return getattr(self._db, name)
+        return _CountingCollection(self._db[name], self._counter)
+
+    def __getitem__(self, name):
+        return _CountingCollection(self._db[name], self._counter)
+
+    def list_collection_names(self):
+        self._counter.add()
+        return self._db.list_collection_names()
+
+
+def configure_target(args) -> Dict[str, Any]:
+    """
+    Point db.py at the benchmark database through its usual config env vars.
+
+    Must run before db.get_backend() is first called. Returns a JSON-safe description.
+    """
+    os.environ["JUDGING_BACKEND"] = args.backend
+    target: Dict[str, Any] = {"backend": args.backend}
+    if args.backend == "mongo":
+        os.environ["MONGODB_URI"] = args.uri
+        os.environ["MONGODB_DB"] = args.db_name
+        os.environ["ANSWERS_LAYOUT"] = args.answers_layout
+        target["mongomock"] = args.uri.startswith(DEFAULT_BENCH_URI)
+        target["db_name"] = args.db_name
+        target["answers_layout"] = args.answers_layout
+    elif args.backend == "sqlite":
+        path = args.sqlite_path or os.path.join(tempfile.mkdtemp(), "bench.sqlite3")
+        os.environ["SQLITE_PATH"] = path
+        target["sqlite_path"] = path
+    return target
+
+
+def attach_counter(backend, counter: RoundTripCounter):
+    """Hook `counter` into the live backend; real Mongo needs install_listener() instead."""
+    from storage import MongoBackend, SQLiteBackend
+
+    if isinstance(backend, MongoBackend) and type(backend.db).__module__.startswith("mongomock"):
+        backend.db = _CountingDatabase(backend.db, counter)
+    elif isinstance(backend, SQLiteBackend):
+        # One traced SQL statement stands in for one round trip
+        backend._conn.set_trace_callback(lambda statement: counter.add())
+
+
+def install_listener(counter: RoundTripCounter):
+    # Applies to every MongoClient created afterwards, so call before get_db()
+    monitoring.register(counter)
+
+
+def reset_storage(backend):
+    from storage import MongoBackend, SQLiteBackend
+
+    if isinstance(backend, MongoBackend):
+        for name in backend.db.list_collection_names():
+            backend.db[name].drop()
+    elif isinstance(backend, SQLiteBackend):
+        with backend._lock, backend._conn:
+            for (table,) in backend._conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"
+            ).fetchall():
+                backend._conn.execute(f"DELETE FROM {table}")
+
+
+def _bulk_load(backend, answers: List[tuple], scores: Dict[tuple, float]):
+    # Seeding goes straight to storage; going through save_answers would take hours at scale
+    from bson import ObjectId
+    from pymongo import UpdateOne
+    from storage import MongoBackend
+
+    if isinstance(backend, MongoBackend):
+        db = backend.db
+        for start in range(0, len(answers), SEED_BATCH_SIZE):
+            db.answers.insert_many(
+                [
+                    {
+                        "judge_id": ObjectId(j),
+                        "competitor_id": ObjectId(c),
+                        "question_id": ObjectId(q),
+                        "value": v,
+                    }
+                    for j, c, q, v in answers[start : start + SEED_BATCH_SIZE]
+                ]
+            )
+        items = list(scores.items())
+        for start in range(0, len(items), SEED_BATCH_SIZE):
+            db.scores.insert_many(
+                [
+                    {"judge_id": ObjectId(j), "competitor_id": ObjectId(c), "value": v}
+                    for (j, c), v in items[start : start + SEED_BATCH_SIZE]
+                ]
+            )
+        totals: Dict[str, list] = {}
+        for (_, c), v in items:
+            entry = totals.setdefault(c, [0, 0.0])
+            entry[0] += 1
+            entry[1] += v
+        ops = [
+            UpdateOne(
+                {"_id": ObjectId(c)},
+                {"$set": {"num_scores": n, "total_score": s, "avg_score": s / n}},
+            )
+            for c, (n, s) in totals.items()
+        ]
+        if ops:
+            db.leaderboard.bulk_write(ops, ordered=False)
+    else:
+        with backend._lock, backend._conn:
+            backend._conn.executemany(
+                "INSERT INTO answers (judge_id, competitor_id, question_id, value) "
+                "VALUES (?, ?, ?, ?)",
+                answers,
+            )
+            backend._conn.executemany(
+                "INSERT INTO scores (judge_id, competitor_id, value) VALUES (?, ?, ?)",
+                [(j, c, v) for (j, c), v in scores.items()],
+            )
+
+
+def seed_event(db, backend, judges: int, competitors: int, questions: int, fill: float, rng):
+    """Create judges x competitors x questions; `fill` is the share of pairs answered."""
+    for i in range(judges):
+        db.create_judge_account(f"Judge {i}", f"judge{i}@bench.local", f"judge{i}", "judge")
+    for i in range(competitors):
+        db.insert_competitor(f"Competitor {i}", f"Notes for competitor {i}")
+    for i in range(questions):
+        db.insert_question(f"Question {i}")
+    judge_ids = [j["id"] for j in db.get_judges()]
+    competitor_ids = [c["id"] for c in db.get_competitors()]
+    question_ids = [q["id"] for q in db.get_questions()]
+
+    answers: List[tuple] = []
+    scores: Dict[tuple, float] = {}
+    for judge_id in judge_ids:
+        for competitor_id in competitor_ids:
+            if rng.random() >= fill:
+                continue
+            values = [rng.randint(1, 10) * 10 for _ in question_ids]
+            answers.extend(
+                (judge_id, competitor_id, question_id, value)
+                for question_id, value in zip(question_ids, values)
+            )
+            scores[(judge_id, competitor_id)] = sum(values) / len(values)
+    _bulk_load(backend, answers, scores)
+    if getattr(backend, "answers_layout", None) == "sheets":
+        # Seeded as rows; move them so reads measure the finished layout
+        while not db.migrate_answer_sheets()["done"]:
+            pass
+    # Seeding bypassed the facade, so move the versions on by hand
+    db._bump_versions("scores")
+    return judge_ids, competitor_ids, question_ids, len(answers)
+
+
+def summarize(timings: List[float], trips: List[int]) -> Dict[str, Any]:
+    return {
+        "calls": len(timings),
+        "ms": {
+            "min": round(min(timings), 3),
+            "median": round(statistics.median(timings), 3),
+            "mean": round(statistics.fmean(timings), 3),
+            "max": round(max(timings), 3),
+        },
+        "round_trips": {
+            "min": min(trips),
+            "median": statistics.median(trips),
+            "max": max(trips),
+        },
+    }
+
+
+def measure(
+    counter: RoundTripCounter, calls: int, func: Callable[[int], Any]
+) -> Dict[str, Any]:
+    timings, trips = [], []
+    for i in range(calls):
+        counter.reset()
+        started = time.perf_counter()
+        func(i)
+        timings.append((time.perf_counter() - started) * 1000)
+        trips.append(counter.reset())
+    return summarize(timings, trips)
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def run_report(kind: str, args, target, body: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "benchmark": kind,
+        "label": args.label,
+        "revision": git_revision(),
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "target": target,
+        **body,
+    }
+
+
+def prepare(args):
+    """Configure, connect, wipe and seed; returns (db module, counter, target, event)."""
+    target = configure_target(args)
+    counter = RoundTripCounter()
+    if args.backend == "mongo" and not target["mongomock"]:
+        install_listener(counter)
+
+    import db
+
+    backend = db.get_backend()
+    attach_counter(backend, counter)
+    reset_storage(db.get_backend())
+    db._read_cache.clear()
+    db.init_db()
+
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    judge_ids, competitor_ids, question_ids, answers = seed_event(
+        db, backend, args.judges, args.competitors, args.questions, args.fill, rng
+    )
+    event = {
+        "judges": args.judges,
+        "competitors": args.competitors,
+        "questions": args.questions,
+        "answers": answers,
+        "seed_seconds": round(time.perf_counter() - started, 3),
+        "judge_ids": judge_ids,
+        "competitor_ids": competitor_ids,
+        "question_ids": question_ids,
+    }
+    counter.reset()
+    return db, counter, target, event
+
+
+def cmd_db(args) -> Dict[str, Any]:
+    db, counter, target, event = prepare(args)
+    rng = random.Random(args.seed + 1)
+    judge_ids = event.pop("judge_ids")
+    competitor_ids = event.pop("competitor_ids")
+    question_ids = event.pop("question_ids")
+
+    def save(_):
+        answers = {q: rng.randint(1, 10) * 10 for q in question_ids}
+        db.save_answers_for_judge(rng.choice(judge_ids), rng.choice(competitor_ids), answers)
+
+    def save_bulk(_):
+        # One grid submission: a screenful of competitors for one judge
+        chosen = rng.sample(competitor_ids, min(20, len(competitor_ids)))
+        db.save_answers_bulk(
+            rng.choice(judge_ids),
+            {c: {q: rng.randint(1, 10) * 10 for q in question_ids} for c in chosen},
+        )
+
+    # Destructive calls run last and once, on ids the reads no longer need
+    results = {
+        "get_leaderboard": measure(counter, args.repeat, lambda _: db.get_leaderboard()),
+        "get_judges_with_user": measure(
+            counter, args.repeat, lambda _: db.get_judges_with_user()
+        ),
+        # Backend calls directly: the facade would serve repeats from the read cache
+        "list_judges_page": measure(
+            counter,
+            args.repeat,
+            lambda _: db.get_backend().list_judges_page(limit=db.PAGE_SIZE + 1, prefix="j"),
+        ),
+        "detailed_export": measure(
+            counter, args.export_repeat, lambda _: list(db.iter_detailed_export_csv())
+        ),
+        "save_answers_for_judge": measure(counter, args.repeat, save),
+        "save_answers_bulk": measure(counter, args.repeat, save_bulk),
+        "delete_question": measure(counter, 1, lambda _: db.delete_question(question_ids[-1])),
+        "delete_judge_account": measure(
+            counter, 1, lambda _: db.delete_judge_account(judge_ids[-1])
+        ),
+    }
+    return run_report("db", args, target, {"event": event, "results": results})
+
+
+# --- Page reruns (streamlit.testing AppTest) ---
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+ADMIN_PAGES = ["Manage Judges", "Manage Competitors", "Manage Questions", "Customize", "Leaderboard"]
+# (views module, role) rendered on their own through show()
+VIEW_MODULES = [
+    ("judges_page", "admin"),
+    ("competitors_page", "admin"),
+    ("questions_page", "admin"),
+    ("customize_page", "admin"),
+    ("leaderboard_page", "admin"),
+    ("scoring_page", "judge"),
+]
+PAGE_TIMEOUT_SECONDS = 120
+
+
+class _Steps:
+    """Collects wall time and round trips per named rerun, across scenario repeats."""
+
+    def __init__(self, counter: RoundTripCounter):
+        self.counter = counter
+        self.timings: Dict[str, List[float]] = {}
+        self.trips: Dict[str, List[int]] = {}
+        self.errors: Dict[str, List[str]] = {}
+
+    def rerun(self, name: str, at, action: Optional[Callable[[Any], Any]] = None):
+        self.counter.reset()
+        started = time.perf_counter()
+        (action(at) if action else at).run()
+        self.timings.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+        self.trips.setdefault(name, []).append(self.counter.reset())
+        errors = [str(e.value) for e in at.exception]
+        if errors:
+            self.errors.setdefault(name, []).extend(errors)
+        return at
+
+    def results(self) -> Dict[str, Any]:
+        results = {}
+        for name, timings in self.timings.items():
+            results[name] = summarize(timings, self.trips[name])
+            if name in self.errors:
+                results[name]["errors"] = self.errors[name]
+        return results
+
+
+def _login(steps: _Steps, prefix: str, username: str, password: str):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=PAGE_TIMEOUT_SECONDS)
+    steps.rerun(f"{prefix}/open_login", at)
+    at.text_input[0].input(username)
+    at.text_input[1].input(password)
+    return steps.rerun(f"{prefix}/log_in", at, lambda at: at.button[0].click())
+
+
+def _button(at, label: str):
+    return next((b for b in at.button if b.label == label), None)
+
+
+def admin_scenario(steps: _Steps):
+    at = _login(steps, "admin", "admin", "admin")
+    for page in ADMIN_PAGES:
+        steps.rerun(f"admin/open {page}", at, lambda at: at.sidebar.radio[0].set_value(page))
+    steps.rerun("admin/refresh_leaderboard", at, lambda at: _button(at, "Refresh leaderboard").click())
+
+
+def judge_scenario(steps: _Steps, username: str, competitor_index: int):
+    at = _login(steps, "judge", username, "judge")
+    search = f"competitor {competitor_index % 10}"
+    steps.rerun(
+        "judge/search_competitor", at, lambda at: at.text_input(key="competitor_search").input(search)
+    )
+    index = competitor_index % len(at.selectbox[0].options)
+    steps.rerun("judge/select_competitor", at, lambda at: at.selectbox[0].select_index(index))
+    if _button(at, "Edit scores"):
+        steps.rerun("judge/edit_scores", at, lambda at: _button(at, "Edit scores").click())
+    steps.rerun("judge/change_radio", at, lambda at: at.main.radio[0].set_value(7))
+    for radio in at.main.radio:
+        if not radio.value:
+            radio.set_value(5)
+    steps.rerun("judge/save_scores", at, lambda at: _button(at, "Save scores").click())
+
+
+def views_scenario(steps: _Steps, users: Dict[str, Dict[str, Any]]):
+    from streamlit.testing.v1 import AppTest
+
+    for module, role in VIEW_MODULES:
+        at = AppTest.from_string(
+            f"import views.{module} as page\npage.show()", default_timeout=PAGE_TIMEOUT_SECONDS
+        )
+        at.session_state["user"] = users[role]
+        steps.rerun(f"views/{module}.show cold", at)
+        steps.rerun(f"views/{module}.show warm", at)
+
+
+def check_budget(results: Dict[str, Dict[str, Any]], budget: Dict[str, Dict[str, float]]):
+    """Return one entry per step whose median exceeds its budgeted ms / round trips."""
+    over = []
+    for name, limits in budget.items():
+        measured = results.get(name)
+        if measured is None:
+            over.append({"step": name, "error": "step not measured"})
+            continue
+        for key, unit in (("ms", "ms"), ("round_trips", "round_trips")):
+            if key in limits and measured[unit]["median"] > limits[key]:
+                over.append(
+                    {"step": name, key: measured[unit]["median"], "budget": limits[key]}
+                )
+    return over
+
+
+def cmd_pages(args) -> Dict[str, Any]:
+    db, counter, target, event = prepare(args)
+    del event["judge_ids"], event["competitor_ids"], event["question_ids"]
+    users = {
+        "admin": db.authenticate_user("admin", "admin"),
+        "judge": db.authenticate_user("judge0", "judge"),
+    }
+    steps = _Steps(counter)
+    for i in range(args.repeat):
+        admin_scenario(steps)
+        judge_scenario(steps, f"judge{i % args.judges}", i + 1)
+        views_scenario(steps, users)
+    results = steps.results()
+    report = run_report("pages", args, target, {"event": event, "results": results})
+    if args.budget:
+        with open(args.budget) as fh:
+            report["over_budget"] = check_budget(results, json.load(fh))
+    return report
+
+
+def add_target_arguments(parser):
+    parser.add_argument("--backend", choices=["mongo", "sqlite", "memory"], default="mongo")
+    parser.add_argument("--uri", default=DEFAULT_BENCH_URI, help="Mongo URI (default: mongomock)")
+    parser.add_argument("--db-name", default=DEFAULT_BENCH_DB, help="Mongo database to wipe")
+    parser.add_argument(
+        "--answers-layout", choices=["rows", "sheets"], default="rows", help="Mongo answers layout"
+    )
+    parser.add_argument("--sqlite-path", help="SQLite file to wipe (default: a temp file)")
+    parser.add_argument("--judges", type=int, default=20)
+    parser.add_argument("--competitors", type=int, default=200)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--fill", type=float, default=1.0, help="Share of pairs answered")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--label", default="", help="Free-form tag stored in the report")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Judging app benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    bench_db = sub.add_parser("db", help="Time db.py calls against a seeded event")
+    add_target_arguments(bench_db)
+    bench_db.add_argument("--repeat", type=int, default=20, help="Calls per read/save benchmark")
+    bench_db.add_argument("--export-repeat", type=int, default=1)
+    bench_db.set_defaults(func=cmd_db)
+
+    bench_pages = sub.add_parser("pages", help="Time app reruns per click through AppTest")
+    add_target_arguments(bench_pages)
+    bench_pages.add_argument("--repeat", type=int, default=3, help="Runs of each scenario")
+    bench_pages.add_argument(
+        "--budget", help='JSON {"step": {"ms": max, "round_trips": max}}; exit 1 when exceeded'
+    )
+    bench_pages.set_defaults(func=cmd_pages)
+
+    args = parser.parse_args(argv)
+    real_mongo = args.backend == "mongo" and not args.uri.startswith(DEFAULT_BENCH_URI)
+    if real_mongo and args.db_name in ("judging_app", os.getenv("MONGODB_DB")):
+        parser.error("refusing to wipe the app database; pass a different --db-name")
+    report = args.func(args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(text + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    return 1 if report.get("over_budget") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
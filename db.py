@@ -1,13 +1,49 @@
+import csv
+import functools
 import hashlib
+import io
 import os
-from typing import Any, Dict, Optional
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import streamlit as st
-from bson import ObjectId
-from pymongo import ASCENDING, MongoClient
-from pymongo.errors import DuplicateKeyError
-from bson.binary import Binary
-from datetime import datetime
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+try:
+    from streamlit.runtime.scriptrunner_utils.script_run_context import (
+        SCRIPT_RUN_CONTEXT_ATTR_NAME,
+    )
+except ImportError:  # streamlit < 1.38
+    from streamlit.runtime.scriptrunner.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+from pymongo import MongoClient
+
+from diagnostics import command_recorder
+from images import banner_blobs, banner_metadata
+from storage import (
+    AnswerSheetsMongoBackend,
+    MemoryBackend,
+    MongoBackend,
+    SQLiteBackend,
+    StorageBackend,
+)
+from storage.mongo_sheets import MIGRATION_BATCH_SIZE
 
 # Pull from Streamlit secrets first, env var second, and finally a hard-coded fallback
 DEFAULT_MONGODB_URI = (
@@ -15,401 +51,886 @@ DEFAULT_MONGODB_URI = (
     "@judging-app-cluster.snhtcji.mongodb.net/?appName=Judging-app-cluster"
 )
 DEFAULT_DB_NAME = "judging_app"
-
-
-def _get_mongo_uri() -> str:
+# URIs starting with this use an in-process mongomock client (local benchmarks only)
+MONGOMOCK_SCHEME = "mongomock://"
+# mongo (Atlas/remote), sqlite (embedded file for offline venues) or memory (tests/demos)
+DEFAULT_BACKEND = "mongo"
+DEFAULT_SQLITE_PATH = "judging_app.sqlite3"
+# Mongo answers layout: rows (one doc per question) or sheets (one doc per judge+competitor)
+DEFAULT_ANSWERS_LAYOUT = "rows"
+# Local file holding judges' saves until the database confirms them
+DEFAULT_SUBMISSION_QUEUE_PATH = "submission_queue.sqlite3"
+
+
+def _get_config(name: str, default: Optional[str] = None) -> Optional[str]:
     # Streamlit Cloud exposes secrets via st.secrets
     try:
-        secret_uri = st.secrets.get("MONGODB_URI")  # type: ignore[attr-defined]
+        secret_value = st.secrets.get(name)  # type: ignore[attr-defined]
     except Exception:
-        secret_uri = None
-    if secret_uri:
-        return secret_uri
-    return os.getenv("MONGODB_URI", DEFAULT_MONGODB_URI)
+        secret_value = None
+    if secret_value:
+        return secret_value
+    return os.getenv(name, default)
+
+
+def _get_mongo_uri() -> str:
+    return _get_config("MONGODB_URI", DEFAULT_MONGODB_URI)
 
 
 def _get_db_name() -> str:
-    try:
-        secret_db = st.secrets.get("MONGODB_DB")  # type: ignore[attr-defined]
-    except Exception:
-        secret_db = None
-    if secret_db:
-        return secret_db
-    return os.getenv("MONGODB_DB", os.getenv("MONGODB_DBNAME", DEFAULT_DB_NAME))
+    return _get_config("MONGODB_DB", os.getenv("MONGODB_DBNAME", DEFAULT_DB_NAME))
 
 
 @st.cache_resource
 def get_db():
     # Cached Mongo client/db for Streamlit reruns
-    client = MongoClient(_get_mongo_uri())
+    uri = _get_mongo_uri()
+    if uri.startswith(MONGOMOCK_SCHEME):
+        import mongomock  # optional, not in requirements.txt
+
+        client = mongomock.MongoClient()
+    else:
+        # Every command is attributed to the session/rerun that sent it (Diagnostics page)
+        client = MongoClient(uri, event_listeners=[command_recorder])
     return client[_get_db_name()]
 
 
-def _oid(value: Any) -> ObjectId:
-    if isinstance(value, ObjectId):
-        return value
-    return ObjectId(str(value))
+@st.cache_resource
+def get_backend() -> StorageBackend:
+    """Storage engine picked by JUDGING_BACKEND, shared by every session in the process."""
+    name = _get_config("JUDGING_BACKEND", DEFAULT_BACKEND).lower()
+    if name == "mongo":
+        # mongomock has no sessions, so never try transactions against it
+        mock = _get_mongo_uri().startswith(MONGOMOCK_SCHEME)
+        layout = _get_config("ANSWERS_LAYOUT", DEFAULT_ANSWERS_LAYOUT).lower()
+        if layout not in ("rows", "sheets"):
+            raise ValueError(f"Unknown ANSWERS_LAYOUT {layout!r} (expected rows or sheets)")
+        backend_class = AnswerSheetsMongoBackend if layout == "sheets" else MongoBackend
+        return backend_class(get_db(), transactions=False if mock else None)
+    if name == "sqlite":
+        return SQLiteBackend(_get_config("SQLITE_PATH", DEFAULT_SQLITE_PATH))
+    if name == "memory":
+        return MemoryBackend()
+    raise ValueError(f"Unknown JUDGING_BACKEND {name!r} (expected mongo, sqlite or memory)")
+
+
+def get_submission_queue_path() -> Optional[str]:
+    """
+    File for the write-behind queue of judges' saves, or None when saves go straight to
+    storage. SUBMISSION_QUEUE=on/off, off by default: acknowledged saves live in that file
+    until sent, so only turn it on where the file sits on a persistent disk (not on hosts
+    with an ephemeral filesystem such as Streamlit Community Cloud).
+    """
+    enabled = _get_config("SUBMISSION_QUEUE", "off").lower()
+    if enabled not in ("on", "off"):
+        raise ValueError(f"Unknown SUBMISSION_QUEUE {enabled!r} (expected on or off)")
+    if enabled == "off":
+        return None
+    return _get_config("SUBMISSION_QUEUE_PATH", DEFAULT_SUBMISSION_QUEUE_PATH)
 
 
-def _doc_with_id(doc: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
-    if not doc:
-        return None
-    clean = dict(doc)
-    clean["id"] = str(clean.pop("_id"))
-    # Normalize nested ids if present
-    for key in ("judge_id", "competitor_id", "question_id"):
-        if key in clean and isinstance(clean[key], ObjectId):
-            clean[key] = str(clean[key])
-    return clean
+# --- Concurrent reads ---
+
+# Shared by every session; bounds how many reads one process runs against storage at once
+READ_POOL_WORKERS = 8
+
+
+@st.cache_resource
+def _read_pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=READ_POOL_WORKERS, thread_name_prefix="db-read")
+
+
+def _set_thread_ctx(thread: threading.Thread, ctx):
+    # add_script_run_ctx ignores None, so detaching sets the attribute directly
+    if ctx is None:
+        setattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, None)
+    else:
+        add_script_run_ctx(thread, ctx)
 
 
-def init_db():
+def fetch_concurrently(**calls: Callable[[], Any]) -> Dict[str, Any]:
     """
-    Create indexes and seed default admin.
+    Run independent zero-argument reads in parallel on the shared pool.
+
+    Every backend is thread-safe, so every call shares the cached one; latency approaches
+    the slowest call instead of the sum. Returns {name: result}; the first error is raised.
     """
-    db = get_db()
-    db.judges.create_index("email", unique=True)
-    db.users.create_index("username", unique=True)
-    db.users.create_index("judge_id", unique=True, sparse=True)
-    db.scores.create_index(
-        [("judge_id", ASCENDING), ("competitor_id", ASCENDING)], unique=True
-    )
-    db.answers.create_index(
-        [("judge_id", ASCENDING), ("competitor_id", ASCENDING), ("question_id", ASCENDING)],
-        unique=True,
-    )
-    create_default_admin_if_missing(db)
+    if len(calls) <= 1:
+        return {name: call() for name, call in calls.items()}
+    ctx = get_script_run_ctx()
+
+    def _in_session(call):
+        def run():
+            # Borrow the caller's Streamlit context (None included) so cached resources and
+            # metrics attribute right, then hand the pooled thread back as it was
+            thread = threading.current_thread()
+            previous = get_script_run_ctx(suppress_warning=True)
+            _set_thread_ctx(thread, ctx)
+            try:
+                return call()
+            finally:
+                _set_thread_ctx(thread, previous)
+
+        return run
+
+    pool = _read_pool()
+    futures = {name: pool.submit(_in_session(call)) for name, call in calls.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+
+@st.cache_resource
+def init_db() -> Dict[str, Any]:
+    """
+    Create tables/indexes and seed default admin, once per process.
+
+    Schema work is skipped when the backend's schema marker is already current.
+    Returns timing for the bootstrap step.
+    """
+    started = time.perf_counter()
+    backend = get_backend()
+    result = backend.init()
+    create_default_admin_if_missing(backend)
+    return {**result, "seconds": time.perf_counter() - started}
+
+
+# --- Data versioning + read cache ---
+
+# Max cached read results per process (least recently used entries are evicted)
+READ_CACHE_MAX_ENTRIES = 128
+# How long a process trusts its copy of the version counters before re-reading them.
+# Writes from this process are seen immediately; this bounds staleness across replicas.
+VERSION_REFRESH_SECONDS = 2.0
+
+_MISS = object()
+
+
+class _ReadCache:
+    """
+    Process-wide LRU of read results, each tagged with the collection versions it was
+    read at. An entry is only served while those versions are still current.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Any, Tuple[Tuple[int, ...], Any]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._versions_read_at = 0.0
+        self._lock = threading.Lock()
+
+    def versions(self) -> Dict[str, int]:
+        with self._lock:
+            if time.monotonic() - self._versions_read_at < VERSION_REFRESH_SECONDS:
+                return self._versions
+        self.set_versions(get_backend().get_versions())
+        return self._versions
+
+    def set_versions(self, versions: Dict[str, int]):
+        with self._lock:
+            self._versions = dict(versions)
+            self._versions_read_at = time.monotonic()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return _MISS
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, version, value):
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions_read_at = 0.0
+
+
+_read_cache = _ReadCache(READ_CACHE_MAX_ENTRIES)
+
+
+def _copy_result(value):
+    # Hand out copies so callers can't mutate what other sessions will read
+    if isinstance(value, list):
+        return [dict(item) if isinstance(item, dict) else item for item in value]
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+
+def _cached_read(*collections: str):
+    """
+    Cache a read function process-wide until any of `collections` changes version.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            version = get_versions(*collections)
+            key = (func.__name__, args, tuple(sorted(kwargs.items())))
+            value = _read_cache.get(key, version)
+            if value is _MISS:
+                value = func(*args, **kwargs)
+                _read_cache.put(key, version, value)
+            return _copy_result(value)
+
+        wrapper.uncached = func
+        return wrapper
+
+    return decorator
+
+
+def _bump_versions(*collections: str):
+    """
+    Increment the change counters for `collections` (and the global data version).
+    """
+    inc = {name: 1 for name in collections}
+    # Assets/settings don't feed the exports; every other collection moves the data version
+    if set(collections) - {"assets"}:
+        inc["data"] = 1
+    # Our own writes invalidate this process's cache right away
+    _read_cache.set_versions(get_backend().bump_versions(inc))
+
+
+def get_data_version() -> int:
+    return int(_read_cache.versions().get("data", 0))
+
+
+def get_versions(*collections: str) -> Tuple[int, ...]:
+    """Current change counters for `collections` (refreshed at most every couple of seconds)."""
+    versions = _read_cache.versions()
+    return tuple(versions.get(name, 0) for name in collections)
 
 
 # --- CRUD operations ---
 
 def get_judges():
-    db = get_db()
-    rows = db.judges.find().sort("_id", ASCENDING)
-    return [_doc_with_id(r) for r in rows]
+    return get_backend().get_judges()
+
+
+def get_judges_with_user(
+    skip: int = 0, limit: Optional[int] = None, fields: Optional[List[str]] = None
+):
+    """
+    Judges in id order merged with their linked username.
 
+    `skip`/`limit` page through judges and `fields` restricts which judge fields are
+    loaded (id and username are always present).
+    """
+    return get_backend().get_judges_with_user(skip=skip, limit=limit, fields=fields)
+
+
+# Rows per page on the admin list pages
+PAGE_SIZE = 25
+
+
+class EntityPage(NamedTuple):
+    items: List[Dict[str, Any]]
+    # Pass as `after_id` to get the next page; None on the last page
+    next_after: Optional[str]
+
+
+def _entity_page(rows: List[Dict[str, Any]], limit: int) -> EntityPage:
+    # Backends are asked for limit + 1 rows so the last page is known without a count
+    if len(rows) > limit:
+        return EntityPage(rows[:limit], str(rows[limit - 1]["id"]))
+    return EntityPage(rows, None)
 
-def get_judges_with_user():
-    db = get_db()
-    results = []
-    for judge in db.judges.find().sort("_id", ASCENDING):
-        linked_user = db.users.find_one({"judge_id": judge["_id"], "role": "judge"})
-        merged = _doc_with_id(judge)
-        merged["username"] = linked_user["username"] if linked_user else None
-        results.append(merged)
-    return results
+
+def _search_prefix(prefix: Optional[str]) -> Optional[str]:
+    prefix = (prefix or "").strip().lower()
+    return prefix or None
+
+
+@_cached_read("judges")
+def _list_judges_rows(after_id, limit, prefix):
+    return get_backend().list_judges_page(after_id=after_id, limit=limit + 1, prefix=prefix)
+
+
+def list_judges_page(
+    after_id: Optional[str] = None, limit: int = PAGE_SIZE, prefix: Optional[str] = None
+) -> EntityPage:
+    """
+    One page of judges (with username) in id order, starting after `after_id`.
+
+    `prefix` matches the start of the name or email, case-insensitively.
+    """
+    rows = _list_judges_rows(after_id, limit, _search_prefix(prefix))
+    return _entity_page(rows, limit)
 
 
 def insert_judge(name: str, email: str):
-    db = get_db()
-    db.judges.insert_one({"name": name, "email": email})
+    get_backend().insert_judge(name, email)
+    _bump_versions("judges")
 
 
 def create_judge_account(name: str, email: str, username: str, password: str):
     """
-    Create judge record and associated user account.
+    Create judge record and associated user account; returns the new judge id.
     """
-    db = get_db()
-    result = db.judges.insert_one({"name": name, "email": email})
-    judge_id = result.inserted_id
-    try:
-        db.users.insert_one(
-            {
-                "username": username,
-                "password_hash": hash_password(password),
-                "role": "judge",
-                "judge_id": judge_id,
-            }
-        )
-    except DuplicateKeyError:
-        # Roll back the judge if username or email collides
-        db.judges.delete_one({"_id": judge_id})
-        raise
+    judge_id = get_backend().create_judge_account(name, email, username, hash_password(password))
+    _bump_versions("judges")
     return judge_id
 
 
 def get_judge_by_id(judge_id: Any):
-    db = get_db()
-    row = db.judges.find_one({"_id": _oid(judge_id)})
-    return _doc_with_id(row)
+    return get_backend().get_judge_by_id(judge_id)
 
 
 def update_judge_account(
     judge_id: Any, name: str, email: str, username: str, password: Optional[str] = None
 ):
-    db = get_db()
-    judge_oid = _oid(judge_id)
-    db.judges.update_one({"_id": judge_oid}, {"$set": {"name": name, "email": email}})
-    update_fields: Dict[str, Any] = {"username": username}
-    if password:
-        update_fields["password_hash"] = hash_password(password)
-    db.users.update_one(
-        {"judge_id": judge_oid, "role": "judge"},
-        {"$set": update_fields},
-        upsert=True,
-    )
+    password_hash = hash_password(password) if password else None
+    get_backend().update_judge_account(judge_id, name, email, username, password_hash)
+    _bump_versions("judges")
 
 
 def delete_judge_account(judge_id: Any):
-    db = get_db()
-    judge_oid = _oid(judge_id)
-    db.scores.delete_many({"judge_id": judge_oid})
-    db.answers.delete_many({"judge_id": judge_oid})
-    db.users.delete_many({"judge_id": judge_oid})
-    db.judges.delete_one({"_id": judge_oid})
+    get_backend().delete_judge_account(judge_id)
+    _bump_versions("judges", "scores")
 
 
+@_cached_read("competitors")
 def get_competitors():
-    db = get_db()
-    rows = db.competitors.find().sort("_id", ASCENDING)
-    return [_doc_with_id(r) for r in rows]
+    return get_backend().get_competitors()
+
+
+@_cached_read("competitors")
+def _list_competitors_rows(after_id, limit, prefix):
+    return get_backend().list_competitors_page(after_id=after_id, limit=limit + 1, prefix=prefix)
+
+
+def list_competitors_page(
+    after_id: Optional[str] = None, limit: int = PAGE_SIZE, prefix: Optional[str] = None
+) -> EntityPage:
+    """One page of competitors in id order; `prefix` matches the start of the name."""
+    rows = _list_competitors_rows(after_id, limit, _search_prefix(prefix))
+    return _entity_page(rows, limit)
+
+
+# Matches shown by the judges' competitor picker
+COMPETITOR_PICKER_LIMIT = 20
+
+
+@_cached_read("competitors", "scores")
+def search_competitors_for_judge(
+    judge_id: Any, prefix: Optional[str] = None, limit: int = COMPETITOR_PICKER_LIMIT
+) -> List[Dict[str, Any]]:
+    """
+    Competitors whose name starts with `prefix` (case-insensitive), by name, with a
+    `scored` flag for this judge. At most `limit` rows whatever the event size.
+    """
+    return get_backend().search_competitors_for_judge(judge_id, _search_prefix(prefix), limit)
 
 
 def insert_competitor(name: str, notes: str = ""):
-    db = get_db()
-    db.competitors.insert_one({"name": name, "notes": notes})
+    get_backend().insert_competitor(name, notes)
+    _bump_versions("competitors")
 
 
 def update_competitor(competitor_id: Any, name: str, notes: Optional[str] = None):
-    db = get_db()
-    update_fields: Dict[str, Any] = {"name": name}
-    if notes is not None:
-        update_fields["notes"] = notes
-    db.competitors.update_one({"_id": _oid(competitor_id)}, {"$set": update_fields})
+    get_backend().update_competitor(competitor_id, name, notes)
+    _bump_versions("competitors")
 
 def delete_competitor(competitor_id: Any):
-    db = get_db()
-    comp_oid = _oid(competitor_id)
-    db.scores.delete_many({"competitor_id": comp_oid})
-    db.answers.delete_many({"competitor_id": comp_oid})
-    db.competitors.delete_one({"_id": comp_oid})
-
-
-def replace_scores_for_judge(judge_id, scores_dict):
-    # Replace all scores for a judge
-    db = get_db()
-    judge_oid = _oid(judge_id)
-    db.scores.delete_many({"judge_id": judge_oid})
-    for competitor_id, value in scores_dict.items():
-        db.scores.insert_one(
-            {"judge_id": judge_oid, "competitor_id": _oid(competitor_id), "value": value}
-        )
+    get_backend().delete_competitor(competitor_id)
+    _bump_versions("competitors", "scores")
 
 
-def save_answers_for_judge(judge_id: Any, competitor_id: Any, answers_dict: Dict[Any, float]):
-    # Save per-question answers and aggregate into scores collection
-    db = get_db()
-    judge_oid = _oid(judge_id)
-    comp_oid = _oid(competitor_id)
-
-    db.answers.delete_many({"judge_id": judge_oid, "competitor_id": comp_oid})
-    db.scores.delete_many({"judge_id": judge_oid, "competitor_id": comp_oid})
-
-    if answers_dict:
-        payload = []
-        for question_id, value in answers_dict.items():
-            payload.append(
-                {
-                    "judge_id": judge_oid,
-                    "competitor_id": comp_oid,
-                    "question_id": _oid(question_id),
-                    "value": value,
-                }
-            )
-        if payload:
-            db.answers.insert_many(payload)
-
-        avg_value = sum(answers_dict.values()) / len(answers_dict)
-        db.scores.insert_one(
-            {"judge_id": judge_oid, "competitor_id": comp_oid, "value": avg_value}
-        )
-    else:
-        # No answers, ensure scores entry is removed
-        db.scores.delete_many({"judge_id": judge_oid, "competitor_id": comp_oid})
+SCORE_BATCH_SIZE = 500
+
+
+def replace_scores_for_judge(
+    judge_id: Any,
+    scores: Union[Mapping[Any, float], Iterable[Tuple[Any, float]]],
+    batch_size: int = SCORE_BATCH_SIZE,
+) -> Dict[str, Any]:
+    """
+    Replace all scores for a judge from {competitor_id: value} or (competitor_id, value) pairs.
+
+    Bad rows (invalid id, unknown competitor, non-numeric value, duplicate competitor) are
+    skipped and reported instead of aborting the load:
+    {"written": int, "failed": [{"competitor_id": ..., "error": str}, ...]}
+    """
+    items = scores.items() if isinstance(scores, Mapping) else scores
+    result = get_backend().replace_scores_for_judge(judge_id, items, batch_size)
+    _bump_versions("scores")
+    return result
+
+
+def save_answers_for_judge(
+    judge_id: Any,
+    competitor_id: Any,
+    answers_dict: Dict[Any, float],
+    use_transaction: Optional[bool] = None,
+):
+    """
+    Save per-question answers and aggregate them into the judge's score.
+
+    Readers never see a half-written submission on SQLite or on Mongo replica sets
+    (Atlas); `use_transaction` forces the Mongo choice either way.
+    """
+    get_backend().save_answers_for_judge(judge_id, competitor_id, answers_dict, use_transaction)
+    _bump_versions("scores")
+
+
+def save_answers_bulk(
+    judge_id: Any,
+    answers_by_competitor: Dict[Any, Dict[Any, float]],
+    use_transaction: Optional[bool] = None,
+    keys: Optional[Dict[Any, str]] = None,
+):
+    """
+    Save several competitors' answers for one judge in a single batch of writes.
+
+    `answers_by_competitor` is {competitor_id: {question_id: value}}; each entry replaces
+    that competitor's answers and score exactly like save_answers_for_judge. With `keys`
+    ({competitor_id: idempotency key}) an entry already saved under its key is skipped.
+    """
+    if not answers_by_competitor:
+        return
+    get_backend().save_answers_bulk(judge_id, answers_by_competitor, use_transaction, keys)
+    _bump_versions("scores")
+
+
+def migrate_answer_sheets(batch_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Move one batch of per-question answers into answer sheets (ANSWERS_LAYOUT=sheets only).
+
+    Call until the result says {"done": True}; safe to stop and rerun at any point.
+    """
+    backend = get_backend()
+    if getattr(backend, "answers_layout", None) != "sheets":
+        raise RuntimeError("Set ANSWERS_LAYOUT=sheets (Mongo backend) before migrating answers.")
+    return backend.migrate_answer_sheets(batch_size or MIGRATION_BATCH_SIZE)
 
 
 def get_scores_for_judge(judge_id: Any):
-    db = get_db()
-    judge_oid = _oid(judge_id)
-    rows = db.scores.find({"judge_id": judge_oid})
-    return {str(row["competitor_id"]): row["value"] for row in rows}
-
-
-def get_leaderboard():
-    db = get_db()
-    pipeline = [
-        {
-            "$lookup": {
-                "from": "scores",
-                "localField": "_id",
-                "foreignField": "competitor_id",
-                "as": "score_docs",
-            }
-        },
-        {
-            "$addFields": {
-                "num_scores": {"$size": "$score_docs"},
-                "total_score": {"$sum": "$score_docs.value"},
-                "avg_score": {
-                    "$cond": [
-                        {"$gt": [{"$size": "$score_docs"}, 0]},
-                        {"$avg": "$score_docs.value"},
-                        0,
-                    ]
-                },
-            }
-        },
-        {
-            "$project": {
-                "name": 1,
-                "num_scores": 1,
-                "total_score": 1,
-                "avg_score": 1,
+    return get_backend().get_scores_for_judge(judge_id)
+
+
+def get_leaderboard(limit: Optional[int] = None):
+    """
+    Leaderboard rows, best average first (optionally top-N only).
+    """
+    return get_backend().get_leaderboard(limit)
+
+
+# --- Submission history ---
+
+# Compaction stops this far behind now so saves still in flight are never skipped
+COMPACTION_LAG_SECONDS = 60
+
+
+def _scores_as_of(backend: StorageBackend, at: datetime):
+    """
+    {(judge_id, competitor_id): score} as of `at`: the nearest snapshot plus every
+    logged change after it. Returns (scores, snapshot, changes replayed).
+
+    Raises ValueError before the first snapshot (taken when the log was completed), as
+    the log alone can't reconstruct scores from then.
+    """
+    snapshot = backend.latest_snapshot(at)
+    if snapshot is None:
+        raise ValueError(f"No score history is recorded as far back as {at:%Y-%m-%d %H:%M} UTC")
+    scores: Dict[Tuple[str, str], float] = {
+        (j, c): value for j, c, value in backend.iter_snapshot_scores(snapshot["id"])
+    }
+    replayed = 0
+    for judge_id, competitor_id, score in backend.iter_submission_scores(snapshot["at"], at):
+        replayed += 1
+        if score is None:
+            scores.pop((judge_id, competitor_id), None)
+        else:
+            scores[(judge_id, competitor_id)] = score
+    return scores, snapshot, replayed
+
+
+def compact_submissions(until: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Fold the submissions log up to `until` (default: now minus COMPACTION_LAG_SECONDS,
+    UTC) into a snapshot, so as-of reads replay only what came after it.
+
+    Returns {"snapshot_at", "pairs", "replayed"}; "snapshot_at" is None when the newest
+    snapshot already covers `until`.
+    """
+    if until is None:
+        until = datetime.utcnow() - timedelta(seconds=COMPACTION_LAG_SECONDS)
+    # Mongo keeps milliseconds; truncate so the stored snapshot time equals `until`
+    until = until.replace(microsecond=until.microsecond // 1000 * 1000)
+    backend = get_backend()
+    latest = backend.latest_snapshot(until)
+    if latest is None or latest["at"] >= until:
+        # Nothing to fold: no history before `until`, or the newest snapshot covers it
+        return {"snapshot_at": None, "pairs": latest["pairs"] if latest else 0, "replayed": 0}
+    scores, _, replayed = _scores_as_of(backend, until)
+    backend.insert_snapshot(until, scores)
+    return {"snapshot_at": until, "pairs": len(scores), "replayed": replayed}
+
+
+@_cached_read("competitors", "scores")
+def get_leaderboard_as_of(at: datetime) -> List[Dict[str, Any]]:
+    """
+    Leaderboard rows (same keys as get_leaderboard) rebuilt from the submissions log as
+    of `at` (UTC). Names are today's; deleted competitors are left out. Raises
+    ValueError for times before the history starts.
+    """
+    scores, _, _ = _scores_as_of(get_backend(), at)
+    totals: Dict[str, List[float]] = {}
+    for (_, competitor_id), value in scores.items():
+        entry = totals.setdefault(competitor_id, [0, 0.0])
+        entry[0] += 1
+        entry[1] += value
+    rows = []
+    for competitor in get_competitors():
+        count, total = totals.get(competitor["id"], (0, 0.0))
+        rows.append(
+            {
+                "competitor_id": competitor["id"],
+                "competitor_name": competitor["name"],
+                "name": competitor["name"],
+                "num_scores": count,
+                "total_score": total,
+                "avg_score": total / count if count else 0,
             }
-        },
-        {"$sort": {"avg_score": -1}},
-    ]
-    rows = db.competitors.aggregate(pipeline)
-    results = []
-    for row in rows:
-        base = _doc_with_id(row)
-        base["competitor_id"] = base.pop("id")
-        base["competitor_name"] = row["name"]
-        results.append(base)
-    return results
+        )
+    rows.sort(key=lambda row: (-row["avg_score"], row["competitor_id"]))
+    return rows
+
+
+@_cached_read("scores")
+def get_submission_history(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    judge_id: Any = None,
+    competitor_id: Any = None,
+    limit: int = 100,
+) -> List[Dict[str, Any]]:
+    """Logged saves, newest first, optionally for one judge and/or competitor (UTC times)."""
+    return get_backend().get_submissions(since, until, judge_id, competitor_id, limit)
 
 
 # --- Assets / customization helpers ---
+
 def save_banner_image(file_bytes: bytes, filename: str, content_type: str):
-    """Save or replace the banner image in the `assets` collection."""
-    db = get_db()
-    doc = {
-        "key": "banner",
-        "filename": filename,
-        "content_type": content_type,
-        "data": Binary(file_bytes),
-        "updated_at": datetime.utcnow(),
-    }
-    db.assets.update_one({"key": "banner"}, {"$set": doc}, upsert=True)
+    """Save or replace the banner image (content-addressed, with resized WebP variants)."""
+    backend = get_backend()
+    content_hash, blobs = banner_blobs(file_bytes, content_type)
+    # Blobs first, then the metadata that points at them, then drop superseded blobs
+    backend.put_asset_blobs("banner", content_hash, blobs)
+    backend.set_asset("banner", banner_metadata(filename, content_type, content_hash, blobs))
+    backend.delete_asset_blobs("banner", keep_hash=content_hash)
+    _bump_versions("assets")
+
+
+@_cached_read("assets")
+def get_banner_info() -> Optional[Dict[str, Any]]:
+    """Return banner metadata (hash, variants, filename...) without any image bytes."""
+    row = get_backend().get_asset("banner")
+    if not row or not row.get("hash"):
+        return None
+    return row
 
 
-def get_banner_image():
-    """Return banner image as dict or None: {filename, content_type, data(bytes)}"""
-    db = get_db()
-    row = db.assets.find_one({"key": "banner"})
-    if not row:
+@functools.lru_cache(maxsize=8)
+def _load_asset_blob(content_hash: str, variant: str) -> bytes:
+    # Content-addressed, so a cached blob can never go stale; misses raise and aren't cached
+    data = get_backend().load_asset_blob(content_hash, variant)
+    if data is None:
+        raise LookupError(f"{content_hash}:{variant}")
+    return data
+
+
+def get_banner_image(variant: str = "display"):
+    """Return banner image as dict or None: {filename, content_type, data(bytes), hash}"""
+    info = get_banner_info()
+    if not info:
+        return None
+    variants = info.get("variants", {})
+    if variant not in variants:
+        variant = "original"
+    try:
+        data = _load_asset_blob(info["hash"], variant)
+    except LookupError:
+        # Replaced by another replica since our metadata was read
         return None
     return {
-        "filename": row.get("filename"),
-        "content_type": row.get("content_type"),
-        "data": bytes(row.get("data")) if row.get("data") is not None else None,
-        "updated_at": row.get("updated_at"),
+        "filename": info.get("filename"),
+        "content_type": variants.get(variant, {}).get("content_type", info.get("content_type")),
+        "data": data,
+        "updated_at": info.get("updated_at"),
+        "hash": info["hash"],
     }
 
 
 def delete_banner_image():
-    """Remove the banner image document from the assets collection."""
-    db = get_db()
-    db.assets.delete_many({"key": "banner"})
+    """Remove the banner image document and its stored variants."""
+    backend = get_backend()
+    backend.delete_asset("banner")
+    backend.delete_asset_blobs("banner")
+    _bump_versions("assets")
 
 def set_background_color(color_hex: str):
     """Persist a background color setting (hex string)."""
-    db = get_db()
-    doc = {
-        "key": "background_color",
-        "color": color_hex,
-        "updated_at": datetime.utcnow(),
-    }
-    db.assets.update_one({"key": "background_color"}, {"$set": doc}, upsert=True)
+    get_backend().set_asset("background_color", {"color": color_hex})
+    _bump_versions("assets")
 
+@_cached_read("assets")
 def get_background_color() -> Optional[str]:
     """Return stored background color hex string or None."""
-    db = get_db()
-    row = db.assets.find_one({"key": "background_color"})
+    row = get_backend().get_asset("background_color")
     if not row:
         return None
     return row.get("color")
 
 def clear_background_color():
     """Remove background color setting."""
-    db = get_db()
-    db.assets.delete_many({"key": "background_color"})
+    get_backend().delete_asset("background_color")
+    _bump_versions("assets")
 
 def set_intro_message(text: str):
     """Persist intro message shown to judges on the scoring page."""
-    db = get_db()
-    doc = {
-        "key": "intro_message",
-        "text": text,
-        "updated_at": datetime.utcnow(),
-    }
-    db.assets.update_one({"key": "intro_message"}, {"$set": doc}, upsert=True)
+    get_backend().set_asset("intro_message", {"text": text})
+    _bump_versions("assets")
 
+@_cached_read("assets")
 def get_intro_message() -> Optional[str]:
-    db = get_db()
-    row = db.assets.find_one({"key": "intro_message"})
+    row = get_backend().get_asset("intro_message")
     if not row:
         return None
     return row.get("text")
 
 def clear_intro_message():
-    db = get_db()
-    db.assets.delete_many({"key": "intro_message"})
+    get_backend().delete_asset("intro_message")
+    _bump_versions("assets")
 
 
 # --- Questions/answers ---
 
-def _recompute_scores_from_answers(db):
+def rebuild_scores_from_answers() -> Dict[str, int]:
     """
-    Rebuild scores collection by averaging existing answers per judge+competitor.
+    Repair path: rebuild scores (and the leaderboard) from answers inside the database.
     """
-    db.scores.delete_many({})
-    pipeline = [
-        {
-            "$group": {
-                "_id": {"judge_id": "$judge_id", "competitor_id": "$competitor_id"},
-                "avg_value": {"$avg": "$value"},
-            }
-        }
-    ]
-    docs = []
-    for row in db.answers.aggregate(pipeline):
-        docs.append(
-            {
-                "judge_id": row["_id"]["judge_id"],
-                "competitor_id": row["_id"]["competitor_id"],
-                "value": row["avg_value"],
-            }
-        )
-    if docs:
-        db.scores.insert_many(docs)
+    result = get_backend().rebuild_scores_from_answers()
+    _bump_versions("scores")
+    return result
+
+
+def verify_scores(tolerance: float = 1e-6) -> List[Dict[str, Any]]:
+    """
+    Compare scores against answer averages and the leaderboard against scores.
+
+    Returns one dict per drifted entry; an empty list means everything is consistent.
+    """
+    return get_backend().verify_scores(tolerance)
 
+
+@_cached_read("questions")
 def get_questions():
-    db = get_db()
-    rows = db.questions.find().sort("_id", ASCENDING)
-    return [_doc_with_id(r) for r in rows]
+    return get_backend().get_questions()
+
+@_cached_read("questions")
+def _list_questions_rows(after_id, limit):
+    return get_backend().list_questions_page(after_id=after_id, limit=limit + 1)
+
+
+def list_questions_page(after_id: Optional[str] = None, limit: int = PAGE_SIZE) -> EntityPage:
+    """One page of questions in id order, starting after `after_id`."""
+    return _entity_page(_list_questions_rows(after_id, limit), limit)
 
 def insert_question(prompt):
-    db = get_db()
-    db.questions.insert_one({"prompt": prompt})
+    get_backend().insert_question(prompt)
+    _bump_versions("questions")
 
 def update_question(question_id, prompt):
-    db = get_db()
-    db.questions.update_one({"_id": _oid(question_id)}, {"$set": {"prompt": prompt}})
+    get_backend().update_question(question_id, prompt)
+    _bump_versions("questions")
 
 def delete_question(question_id):
-    db = get_db()
-    question_oid = _oid(question_id)
-    db.answers.delete_many({"question_id": question_oid})
-    db.questions.delete_one({"_id": question_oid})
-    _recompute_scores_from_answers(db)
+    # Only judge+competitor pairs that answered this question get a new average
+    get_backend().delete_question(question_id)
+    _bump_versions("questions", "scores")
 
 def get_answers_for_judge_competitor(judge_id, competitor_id):
-    db = get_db()
-    rows = db.answers.find(
-        {"judge_id": _oid(judge_id), "competitor_id": _oid(competitor_id)}
+    return get_backend().get_answers_for_judge_competitor(judge_id, competitor_id)
+
+
+# Collections whose changes invalidate a judge's cached scoring context. A judge's own
+# answers only change through their own saves, which drop the context explicitly.
+SCORING_CONTEXT_COLLECTIONS = ("judges", "questions", "assets")
+
+
+def get_scoring_context(judge_id: Any, competitor_id: Any = None) -> Dict[str, Any]:
+    """
+    Everything the Enter Scores page needs for one judge.
+
+    Shared data (banner, intro, questions) comes from the process read cache;
+    the judge profile and all of the judge's answers come from one backend call, and the
+    parts are fetched concurrently. "banner" is metadata only: the context is kept in
+    session state, so the bytes stay in the process-wide blob cache (get_banner_image).
+    Returns
+    {"version", "banner", "intro", "questions", "judge",
+     "answers_by_competitor": {competitor_id: {question_id: value}}, "answers"} where
+    "answers" is the entry for `competitor_id` when given.
+    """
+    version = get_versions(*SCORING_CONTEXT_COLLECTIONS)
+    results = fetch_concurrently(
+        judge=lambda: get_backend().get_judge_with_answers(judge_id),
+        banner=_banner_or_none,
+        intro=get_intro_message,
+        questions=get_questions,
+    )
+    judge, answers_by_competitor = results["judge"]
+    return {
+        "version": version,
+        "banner": results["banner"],
+        "intro": results["intro"],
+        "questions": results["questions"],
+        "judge": judge,
+        "answers_by_competitor": answers_by_competitor,
+        "answers": answers_by_competitor.get(str(competitor_id), {}) if competitor_id else {},
+    }
+
+
+def _banner_or_none():
+    # Loads (and so caches) the image bytes, but hands back only the metadata
+    try:
+        banner = get_banner_image()
+    except Exception:
+        return None
+    if banner:
+        banner.pop("data")
+    return banner
+
+
+class LeaderboardPageData(NamedTuple):
+    leaderboard: List[Dict[str, Any]]
+    data_version: int
+
+
+def get_leaderboard_page_data() -> LeaderboardPageData:
+    """Leaderboard rows and the current data version, fetched concurrently."""
+    results = fetch_concurrently(leaderboard=get_leaderboard, data_version=get_data_version)
+    return LeaderboardPageData(**results)
+
+
+# --- Exports ---
+
+DETAILED_EXPORT_BASE_FIELDS = [
+    "Judge ID",
+    "Judge Name",
+    "Username",
+    "Judge Email",
+    "Competitor ID",
+    "Competitor",
+    "Competitor Notes",
+]
+
+
+def _question_header(question) -> str:
+    return f"Q: {question['prompt']}"
+
+
+def _detailed_export_row(judge, competitor, questions, answers):
+    row = {
+        "Judge ID": judge["id"],
+        "Judge Name": judge.get("name"),
+        "Username": judge.get("username"),
+        "Judge Email": judge.get("email"),
+        "Competitor ID": competitor["id"],
+        "Competitor": competitor.get("name"),
+        "Competitor Notes": competitor.get("notes", ""),
+    }
+    vals = []
+    for q in questions:
+        raw = answers.get(q["id"])
+        if raw is None:
+            cell = ""
+        else:
+            try:
+                # stored as multiples of 10 — convert back to 0-10 scale
+                cell = float(raw) / 10.0
+            except Exception:
+                cell = raw
+        row[_question_header(q)] = cell
+        if cell != "":
+            try:
+                vals.append(float(cell))
+            except Exception:
+                pass
+    # avg of question values (0-10), empty if no vals
+    row["Average Score"] = round(sum(vals) / len(vals), 2) if vals else ""
+    return row
+
+
+def iter_detailed_export_rows(
+    backend: Optional[StorageBackend] = None,
+    questions=None,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield one detailed-export row per judge+competitor pair.
+
+    Judges (with usernames), competitors and questions are read once; answers are streamed
+    in (judge_id, competitor_id) order and merge-joined against the judge/competitor
+    order, so only one group of answers is held in memory at a time.
+    """
+    backend = backend if backend is not None else get_backend()
+    judges = backend.get_judges_with_user()
+    competitors = backend.get_competitors()
+    if questions is None:
+        questions = backend.get_questions()
+
+    groups = groupby(
+        backend.iter_answers_sorted(), key=lambda a: (a["judge_id"], a["competitor_id"])
     )
-    return {str(row["question_id"]): row["value"] for row in rows}
+    pending = next(groups, None)
+
+    total = len(judges) * len(competitors)
+    done = 0
+    for judge in judges:
+        for comp in competitors:
+            key = (judge["id"], comp["id"])
+            # Skip answer groups for pairs that sort before this one (orphans)
+            while pending is not None and pending[0] < key:
+                pending = next(groups, None)
+            answers: Dict[Any, Any] = {}
+            if pending is not None and pending[0] == key:
+                answers = {a["question_id"]: a["value"] for a in pending[1]}
+                pending = next(groups, None)
+            yield _detailed_export_row(judge, comp, questions, answers)
+            done += 1
+            if progress:
+                progress(done, total)
+
+
+def get_detailed_export_fieldnames(questions):
+    return DETAILED_EXPORT_BASE_FIELDS + [_question_header(q) for q in questions] + [
+        "Average Score"
+    ]
+
+
+def iter_detailed_export_csv(
+    backend: Optional[StorageBackend] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Iterator[str]:
+    """Yield the detailed submissions CSV as text, header first, one line per row."""
+    backend = backend if backend is not None else get_backend()
+    questions = backend.get_questions()
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=get_detailed_export_fieldnames(questions))
+    writer.writeheader()
+    for row in iter_detailed_export_rows(backend, questions, progress):
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
 
 
 # --- Auth helpers ---
@@ -417,17 +938,12 @@ def get_answers_for_judge_competitor(judge_id, competitor_id):
 def hash_password(password: str) -> str:
     return hashlib.sha256(password.encode("utf-8")).hexdigest()
 
-def create_default_admin_if_missing(db):
-    existing = db.users.count_documents({"role": "admin"})
-    if existing == 0:
-        db.users.insert_one(
-            {"username": "admin", "password_hash": hash_password("admin"), "role": "admin"}
-        )
+def create_default_admin_if_missing(backend: Optional[StorageBackend] = None):
+    backend = backend if backend is not None else get_backend()
+    backend.create_default_admin_if_missing(hash_password("admin"))
 
 def authenticate_user(username, password):
-    db = get_db()
-    row = db.users.find_one({"username": username})
+    row = get_backend().get_user_by_username(username)
     if row and row["password_hash"] == hash_password(password):
-        result = _doc_with_id(row)
-        return result
+        return row
     return None
@@ -0,0 +1,248 @@
+import json
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+from itertools import groupby
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Most recent Mongo commands kept per process (oldest are dropped first)
+COMMAND_LOG_SIZE = 5000
+# Same command shape repeated more than this many times in one rerun is flagged as N+1
+N_PLUS_ONE_THRESHOLD = 5
+# Sessions whose rerun counter is kept; the least recently active are forgotten first
+MAX_TRACKED_SESSIONS = 1000
+
+BACKGROUND_PAGE = "(background)"
+_SCALAR = "?"
+
+
+def _shape(value, depth: int = 0):
+    # Keep keys/operators, drop values: the shape identifies a query without leaking data
+    if depth > 4:
+        return _SCALAR
+    if isinstance(value, dict):
+        return {key: _shape(item, depth + 1) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_shape(value[0], depth + 1)] if value else []
+    return _SCALAR
+
+
+def command_shape(command_name: str, command: Dict[str, Any]) -> str:
+    if command_name == "find":
+        body = command.get("filter", {})
+    elif command_name == "aggregate":
+        # Stage names in order, with only $match filters expanded
+        body = [
+            {name: _shape(spec) if name == "$match" else _SCALAR for name, spec in stage.items()}
+            for stage in command.get("pipeline", [])
+        ]
+        return json.dumps(body, sort_keys=True, default=str)
+    elif command_name in ("update", "delete"):
+        ops = command.get("updates" if command_name == "update" else "deletes") or [{}]
+        body = ops[0].get("q", {})
+    elif command_name in ("findAndModify", "count", "distinct"):
+        body = command.get("query", {})
+    else:
+        body = {}
+    return json.dumps(_shape(body), sort_keys=True, default=str)
+
+
+def _docs_returned(reply: Dict[str, Any]) -> Optional[int]:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if "n" in reply:
+        return reply["n"]
+    if "value" in reply:
+        return 1 if reply["value"] else 0
+    return None
+
+
+class CommandRecorder(monitoring.CommandListener):
+    """
+    Records every Mongo command with the Streamlit session, rerun and page that issued it.
+
+    Events for one command arrive on the thread that ran it, so the script run context
+    (also copied onto fetch_concurrently workers) identifies the session.
+    """
+
+    def __init__(self, maxlen: int = COMMAND_LOG_SIZE):
+        self.records: deque = deque(maxlen=maxlen)
+        self._pending: Dict[Tuple[Any, int], Dict[str, Any]] = {}
+        self._reruns: "OrderedDict[str, Tuple[int, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    # --- Rerun attribution ---
+
+    def start_rerun(self, page: str = "(login)"):
+        ctx = get_script_run_ctx()
+        if ctx is None:
+            return
+        with self._lock:
+            rerun = self._reruns.get(ctx.session_id, (0, page))[0] + 1
+            self._track(ctx.session_id, rerun, page)
+
+    def set_page(self, page: str):
+        ctx = get_script_run_ctx()
+        if ctx is None:
+            return
+        with self._lock:
+            rerun = self._reruns.get(ctx.session_id, (1, page))[0]
+            self._track(ctx.session_id, rerun, page)
+
+    def _track(self, session_id: str, rerun: int, page: str):
+        # Caller holds the lock; ended sessions age out instead of piling up
+        self._reruns[session_id] = (rerun, page)
+        self._reruns.move_to_end(session_id)
+        while len(self._reruns) > MAX_TRACKED_SESSIONS:
+            self._reruns.popitem(last=False)
+
+    def current_page(self) -> str:
+        return self._attribution()[2]
+
+    def _attribution(self) -> Tuple[Optional[str], int, str]:
+        ctx = get_script_run_ctx(suppress_warning=True)
+        if ctx is None:
+            return None, 0, BACKGROUND_PAGE
+        with self._lock:
+            rerun, page = self._reruns.get(ctx.session_id, (0, BACKGROUND_PAGE))
+        return ctx.session_id, rerun, page
+
+    # --- CommandListener ---
+
+    def started(self, event):
+        session, rerun, page = self._attribution()
+        collection = event.command.get(event.command_name)
+        pending = {
+            "at": datetime.utcnow().isoformat(timespec="milliseconds"),
+            "session": session,
+            "rerun": rerun,
+            "page": page,
+            "command": event.command_name,
+            "collection": collection if isinstance(collection, str) else None,
+            "shape": command_shape(event.command_name, event.command),
+        }
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = pending
+
+    def _finish(self, event, ok: bool, docs: Optional[int]):
+        with self._lock:
+            record = self._pending.pop((event.connection_id, event.request_id), None)
+            if record is None:
+                return
+            record.update(duration_ms=event.duration_micros / 1000, docs=docs, ok=ok)
+            self.records.append(record)
+
+    def succeeded(self, event):
+        self._finish(event, True, _docs_returned(event.reply))
+
+    def failed(self, event):
+        self._finish(event, False, None)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self.records)
+
+    def clear(self):
+        with self._lock:
+            self.records.clear()
+
+
+command_recorder = CommandRecorder()
+
+
+# --- Analysis (pure functions over recorded commands) ---
+
+def slowest_commands(records: List[Dict[str, Any]], limit: int = 20) -> List[Dict[str, Any]]:
+    return sorted(records, key=lambda r: r["duration_ms"], reverse=True)[:limit]
+
+
+def _rerun_key(record):
+    return (record["session"] or "", record["rerun"])
+
+
+def commands_per_rerun(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """One row per (session, rerun): page, command count, total ms and docs returned."""
+    rows = []
+    for (session, rerun), group in groupby(sorted(records, key=_rerun_key), key=_rerun_key):
+        group = list(group)
+        rows.append(
+            {
+                "session": session[:8],
+                "rerun": rerun,
+                "page": group[-1]["page"],
+                "commands": len(group),
+                "total_ms": round(sum(r["duration_ms"] for r in group), 3),
+                "docs": sum(r["docs"] or 0 for r in group),
+            }
+        )
+    return rows
+
+
+def commands_per_page(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Per page: reruns seen and average/max commands and ms per rerun."""
+    reruns = commands_per_rerun(records)
+    rows = []
+    for page, group in groupby(sorted(reruns, key=lambda r: r["page"]), key=lambda r: r["page"]):
+        group = list(group)
+        rows.append(
+            {
+                "page": page,
+                "reruns": len(group),
+                "avg_commands": round(sum(r["commands"] for r in group) / len(group), 1),
+                "max_commands": max(r["commands"] for r in group),
+                "avg_ms": round(sum(r["total_ms"] for r in group) / len(group), 3),
+            }
+        )
+    return sorted(rows, key=lambda r: r["avg_commands"], reverse=True)
+
+
+def n_plus_one(
+    records: List[Dict[str, Any]], threshold: int = N_PLUS_ONE_THRESHOLD
+) -> List[Dict[str, Any]]:
+    """Command shapes repeated more than `threshold` times within a single rerun."""
+    counts: Dict[Tuple, Dict[str, Any]] = {}
+    for record in records:
+        if record["session"] is None:
+            continue
+        key = (
+            record["session"],
+            record["rerun"],
+            record["command"],
+            record["collection"],
+            record["shape"],
+        )
+        entry = counts.setdefault(
+            key,
+            {
+                "session": record["session"][:8],
+                "rerun": record["rerun"],
+                "page": record["page"],
+                "command": record["command"],
+                "collection": record["collection"],
+                "shape": record["shape"],
+                "count": 0,
+                "total_ms": 0.0,
+            },
+        )
+        entry["count"] += 1
+        entry["total_ms"] = round(entry["total_ms"] + record["duration_ms"], 3)
+    flagged = [entry for entry in counts.values() if entry["count"] > threshold]
+    return sorted(flagged, key=lambda e: e["count"], reverse=True)
+
+
+def export_json(records: List[Dict[str, Any]], threshold: int = N_PLUS_ONE_THRESHOLD) -> str:
+    return json.dumps(
+        {
+            "exported_at": datetime.utcnow().isoformat(),
+            "commands": records,
+            "per_page": commands_per_page(records),
+            "per_rerun": commands_per_rerun(records),
+            "n_plus_one": n_plus_one(records, threshold),
+        },
+        indent=2,
+        default=str,
+    )
@@ -0,0 +1,84 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+import streamlit as st
+
+from db import get_backend, iter_detailed_export_csv
+
+# Finished exports kept per process; older data versions are evicted first
+MAX_CACHED_EXPORTS = 2
+
+
+class DetailedExportJob:
+    """Builds the detailed submissions CSV for one data version in a worker thread."""
+
+    def __init__(self, version: int):
+        self.version = version
+        self.done = 0
+        self.total = 0
+        self.data: Optional[bytes] = None
+        self.error: Optional[str] = None
+        self.started_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+        self._thread = threading.Thread(
+            target=self._run, name=f"detailed-export-{version}", daemon=True
+        )
+
+    def start(self, backend):
+        self._backend = backend
+        self._thread.start()
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    @property
+    def progress(self) -> float:
+        if self.total <= 0:
+            return 0.0 if self.running else 1.0
+        return min(self.done / self.total, 1.0)
+
+    def _on_progress(self, done: int, total: int):
+        self.done = done
+        self.total = total
+
+    def _run(self):
+        try:
+            parts = list(iter_detailed_export_csv(self._backend, progress=self._on_progress))
+            self.data = "".join(parts).encode("utf-8")
+        except Exception as exc:
+            self.error = str(exc)
+        finally:
+            self.finished_at = datetime.now()
+
+
+@st.cache_resource
+def _job_registry():
+    # Shared by every session in this process
+    return {"lock": threading.Lock(), "jobs": OrderedDict()}
+
+
+def get_detailed_export_job(version: int) -> Optional[DetailedExportJob]:
+    registry = _job_registry()
+    with registry["lock"]:
+        return registry["jobs"].get(version)
+
+
+def start_detailed_export(version: int) -> DetailedExportJob:
+    """Start (or reuse) the export job for `version`; failed jobs are retried."""
+    registry = _job_registry()
+    with registry["lock"]:
+        jobs = registry["jobs"]
+        job = jobs.get(version)
+        if job and not job.error:
+            return job
+        job = DetailedExportJob(version)
+        jobs[version] = job
+        jobs.move_to_end(version)
+        while len(jobs) > MAX_CACHED_EXPORTS:
+            jobs.popitem(last=False)
+    # Resolve the cached backend here; the worker thread has no Streamlit script context
+    job.start(get_backend())
+    return job
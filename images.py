@@ -0,0 +1,57 @@
+import hashlib
+import io
+from typing import Dict, Tuple
+
+from PIL import Image, ImageOps
+
+# Pre-resized banner variants (max width in px), produced once at upload time
+BANNER_VARIANTS = {"display": 1600, "thumb": 480}
+
+
+def image_variants(file_bytes: bytes) -> Dict[str, bytes]:
+    """
+    Downscale and re-encode an image as WebP for each BANNER_VARIANTS entry.
+
+    A variant is only kept when it is smaller than the original upload; images Pillow
+    can't read simply get no variants and are served as uploaded.
+    """
+    try:
+        image = Image.open(io.BytesIO(file_bytes))
+        image.load()
+        # Bake in the EXIF orientation: the WebP variants don't carry the original's EXIF
+        image = ImageOps.exif_transpose(image)
+    except Exception:
+        return {}
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+    variants = {}
+    for name, max_width in BANNER_VARIANTS.items():
+        resized = image.copy()
+        if resized.width > max_width:
+            resized.thumbnail((max_width, resized.height), Image.LANCZOS)
+        out = io.BytesIO()
+        resized.save(out, format="WEBP", quality=85, method=4)
+        if out.tell() < len(file_bytes):
+            variants[name] = out.getvalue()
+    return variants
+
+
+def banner_blobs(file_bytes: bytes, content_type: str) -> Tuple[str, Dict[str, Tuple[bytes, str]]]:
+    """Return (sha256 hex, {variant: (bytes, content_type)}) including the original."""
+    content_hash = hashlib.sha256(file_bytes).hexdigest()
+    blobs = {"original": (file_bytes, content_type)}
+    for name, data in image_variants(file_bytes).items():
+        blobs[name] = (data, "image/webp")
+    return content_hash, blobs
+
+
+def banner_metadata(filename: str, content_type: str, content_hash: str, blobs) -> Dict:
+    return {
+        "filename": filename,
+        "content_type": content_type,
+        "hash": content_hash,
+        "variants": {
+            variant: {"content_type": variant_type, "size": len(data)}
+            for variant, (data, variant_type) in blobs.items()
+        },
+    }
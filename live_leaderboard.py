@@ -0,0 +1,116 @@
+import threading
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+import streamlit as st
+
+from db import get_backend, get_versions
+
+# Collections whose changes move leaderboard rows
+LEADERBOARD_COLLECTIONS = ("competitors", "scores")
+# Row changes remembered for screens catching up; a screen further behind reloads everything
+MAX_RECENT_CHANGES = 1000
+
+
+class LeaderboardFeed:
+    """
+    Process-wide copy of the leaderboard shared by every live screen.
+
+    On Mongo replica sets (Atlas) a change stream pushes changed rows in a worker thread;
+    elsewhere refresh() compares the cheap version counters and only reloads when they
+    move. Every changed row gets a sequence number, so each screen asks for just the rows
+    changed since it last looked.
+    """
+
+    def __init__(self, backend):
+        self._backend = backend
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._rows: Dict[str, Dict[str, Any]] = {}
+        self._seq = 0
+        self._changes: "deque[Tuple[int, str]]" = deque(maxlen=MAX_RECENT_CHANGES)
+        self._version: Optional[Tuple[int, ...]] = None
+        self.mode = "polling"
+        try:
+            # Open the stream before loading so no change falls between the two
+            stream = backend.watch_leaderboard()
+        except Exception:
+            stream = None
+        self._reload()
+        if stream is not None:
+            self.mode = "change stream"
+            threading.Thread(
+                target=self._follow, args=(stream,), name="leaderboard-feed", daemon=True
+            ).start()
+
+    def _apply(self, updates: Dict[str, Optional[Dict[str, Any]]]):
+        with self._lock:
+            for competitor_id, row in updates.items():
+                if self._rows.get(competitor_id) == row:
+                    continue
+                if row is None:
+                    self._rows.pop(competitor_id, None)
+                else:
+                    self._rows[competitor_id] = row
+                self._seq += 1
+                self._changes.append((self._seq, competitor_id))
+
+    def _reload(self):
+        version = get_versions(*LEADERBOARD_COLLECTIONS)
+        rows = {row["competitor_id"]: row for row in self._backend.get_leaderboard()}
+        with self._lock:
+            current = set(self._rows)
+        updates: Dict[str, Optional[Dict[str, Any]]] = dict.fromkeys(current - set(rows))
+        updates.update(rows)
+        self._apply(updates)
+        self._version = version
+
+    def _follow(self, stream):
+        # Runs without a Streamlit script context; only touches the backend it was given
+        try:
+            for competitor_id, row in stream:
+                self._apply({competitor_id: row})
+        except Exception:
+            pass
+        # Stream closed or failed: fall back to polling from the next refresh()
+        self._version = None
+        self.mode = "polling"
+
+    def refresh(self):
+        """Poll the version counters (when there is no change stream) and reload on a change."""
+        if self.mode != "polling":
+            return
+        with self._refresh_lock:
+            if self._version != get_versions(*LEADERBOARD_COLLECTIONS):
+                self._reload()
+
+    def changes_since(
+        self, seq: Optional[int]
+    ) -> Tuple[int, Optional[Dict[str, Optional[Dict[str, Any]]]]]:
+        """
+        (current seq, {competitor_id: row or None if removed}) for rows changed after `seq`.
+        The dict is None when `seq` is unknown or too old; call rows() instead.
+        """
+        with self._lock:
+            if seq is None or seq > self._seq:
+                return self._seq, None
+            if seq == self._seq:
+                return seq, {}
+            if not self._changes or self._changes[0][0] > seq + 1:
+                return self._seq, None
+            changed = {
+                competitor_id: self._rows.get(competitor_id)
+                for change_seq, competitor_id in self._changes
+                if change_seq > seq
+            }
+            return self._seq, changed
+
+    def rows(self) -> Tuple[int, Dict[str, Dict[str, Any]]]:
+        with self._lock:
+            return self._seq, dict(self._rows)
+
+
+@st.cache_resource
+def get_leaderboard_feed() -> LeaderboardFeed:
+    # One feed (and at most one change stream) per process, however many screens watch
+    return LeaderboardFeed(get_backend())
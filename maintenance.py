@@ -0,0 +1,106 @@
+"""
+Maintenance commands for the judging database.
+
+    python maintenance.py verify     # report drift between answers, scores and leaderboard
+    python maintenance.py rebuild    # rebuild scores + leaderboard from answers inside the database
+    python maintenance.py migrate-answers  # move answers into one-per-submission sheets
+    python maintenance.py compact    # snapshot the submissions log (run periodically, e.g. cron)
+"""
+import argparse
+import json
+import sys
+import time
+
+from db import (
+    compact_submissions,
+    migrate_answer_sheets,
+    rebuild_scores_from_answers,
+    verify_scores,
+)
+
+
+def cmd_verify(args) -> int:
+    started = time.perf_counter()
+    drift = verify_scores(tolerance=args.tolerance)
+    elapsed = time.perf_counter() - started
+    for entry in drift[: args.limit]:
+        print(json.dumps(entry, default=str))
+    if len(drift) > args.limit:
+        print(f"... {len(drift) - args.limit} more")
+    print(f"{len(drift)} drifted entries found in {elapsed:.2f}s")
+    return 1 if drift else 0
+
+
+def cmd_rebuild(args) -> int:
+    started = time.perf_counter()
+    result = rebuild_scores_from_answers()
+    elapsed = time.perf_counter() - started
+    print(
+        f"Rebuilt {result['scores']} scores ({result['removed']} stale removed) "
+        f"in {elapsed:.2f}s"
+    )
+    return 0
+
+
+def cmd_migrate_answers(args) -> int:
+    started = time.perf_counter()
+    pairs = rows = 0
+    while True:
+        try:
+            result = migrate_answer_sheets(args.batch_size)
+        except RuntimeError as exc:
+            print(exc)
+            return 2
+        if result["done"]:
+            break
+        pairs += result["pairs"]
+        rows += result["rows"]
+        print(f"Moved {pairs} submissions ({rows} answers) so far")
+    elapsed = time.perf_counter() - started
+    print(f"Answer sheets migration complete: {pairs} submissions moved in {elapsed:.2f}s")
+    return 0
+
+
+def cmd_compact(args) -> int:
+    started = time.perf_counter()
+    result = compact_submissions()
+    elapsed = time.perf_counter() - started
+    if result["snapshot_at"] is None:
+        print("Newest snapshot is already current; nothing to compact")
+    else:
+        print(
+            f"Snapshot at {result['snapshot_at']:%Y-%m-%d %H:%M:%S} UTC: {result['pairs']} scores "
+            f"({result['replayed']} saves replayed) in {elapsed:.2f}s"
+        )
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Judging app maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    verify = sub.add_parser("verify", help="Compare scores with answer averages")
+    verify.add_argument("--tolerance", type=float, default=1e-6)
+    verify.add_argument("--limit", type=int, default=50, help="Max drift entries to print")
+    verify.set_defaults(func=cmd_verify)
+
+    rebuild = sub.add_parser("rebuild", help="Rebuild scores and leaderboard from answers")
+    rebuild.set_defaults(func=cmd_rebuild)
+
+    migrate = sub.add_parser(
+        "migrate-answers",
+        help="Move answers into one-per-submission sheets (needs ANSWERS_LAYOUT=sheets); "
+        "resumable",
+    )
+    migrate.add_argument("--batch-size", type=int, help="Submissions per batch (default 500)")
+    migrate.set_defaults(func=cmd_migrate_answers)
+
+    compact = sub.add_parser("compact", help="Snapshot the submissions log for as-of reads")
+    compact.set_defaults(func=cmd_compact)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from datetime import datetime
+from itertools import count
+from typing import Any, Callable, Dict, List, Optional
+
+from diagnostics import command_recorder
+
+# JUDGING_PROFILE=1 (or "cprofile") profiles every rerun with cProfile; "sample" uses
+# the stack sampler instead. Admins can also switch it on from the Diagnostics page.
+PROFILE_ENV_VAR = "JUDGING_PROFILE"
+PROFILE_MODES = ("cprofile", "sample")
+# Profiles kept per page (oldest dropped first)
+PROFILES_PER_PAGE = 5
+SAMPLE_INTERVAL_SECONDS = 0.005
+SUMMARY_LINES = 40
+
+
+def _mode_from_env() -> Optional[str]:
+    value = os.getenv(PROFILE_ENV_VAR, "").strip().lower()
+    if not value or value in ("0", "false", "off"):
+        return None
+    return value if value in PROFILE_MODES else "cprofile"
+
+
+class _StackSampler:
+    """Samples one thread's Python stack on a timer and counts collapsed stacks."""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                filename = os.path.basename(code.co_filename)
+                frames.append(f"{code.co_name} ({filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            if frames:
+                self.stacks[";".join(reversed(frames))] += 1
+
+    def collapsed(self) -> str:
+        # Brendan Gregg's folded format, readable by flamegraph.pl and speedscope
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+
+class Profiler:
+    """Wraps app.main per rerun when enabled and keeps the last few profiles per page."""
+
+    def __init__(self, per_page: int = PROFILES_PER_PAGE):
+        self.mode = _mode_from_env()
+        self.per_page = per_page
+        self._profiles: "OrderedDict[str, deque]" = OrderedDict()
+        self._ids = count(1)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode is not None
+
+    def set_mode(self, mode: Optional[str]):
+        self.mode = mode if mode in PROFILE_MODES else None
+
+    def run(self, main: Callable[[], Any]):
+        mode = self.mode
+        if mode is None:
+            return main()
+        profile = sampler = None
+        if mode == "cprofile":
+            profile = cProfile.Profile()
+            profile.enable()
+        else:
+            sampler = _StackSampler(threading.get_ident())
+            sampler.start()
+        started = time.perf_counter()
+        try:
+            return main()
+        finally:
+            # st.rerun()/st.stop() raise through here too; their reruns still get recorded
+            seconds = time.perf_counter() - started
+            if profile is not None:
+                profile.disable()
+            if sampler is not None:
+                sampler.stop()
+            self._record(mode, seconds, profile, sampler)
+
+    def _record(self, mode, seconds, profile, sampler):
+        entry: Dict[str, Any] = {
+            "page": command_recorder.current_page(),
+            "at": datetime.now(),
+            "seconds": seconds,
+            "mode": mode,
+        }
+        if profile is not None:
+            profile.create_stats()
+            # Same marshal format as Profile.dump_stats; pstats.Stats below empties .stats
+            entry["data"] = marshal.dumps(profile.stats)
+            summary = io.StringIO()
+            pstats.Stats(profile, stream=summary).sort_stats("cumulative").print_stats(
+                SUMMARY_LINES
+            )
+            entry["summary"] = summary.getvalue()
+            entry["file_ext"] = "prof"
+        else:
+            collapsed = sampler.collapsed()
+            entry["summary"] = "".join(collapsed.splitlines(True)[:SUMMARY_LINES])
+            entry["data"] = collapsed.encode("utf-8")
+            entry["file_ext"] = "collapsed.txt"
+        with self._lock:
+            entry["id"] = next(self._ids)
+            profiles = self._profiles.setdefault(entry["page"], deque(maxlen=self.per_page))
+            profiles.append(entry)
+
+    def profiles(self) -> Dict[str, List[Dict[str, Any]]]:
+        """{page: [profile, ...]} newest first."""
+        with self._lock:
+            return {page: list(reversed(items)) for page, items in self._profiles.items()}
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+
+profiler = Profiler()
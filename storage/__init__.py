@@ -0,0 +1,14 @@
+from storage.base import StorageBackend, new_id
+from storage.memory import MemoryBackend
+from storage.mongo import MongoBackend
+from storage.mongo_sheets import AnswerSheetsMongoBackend
+from storage.sqlite import SQLiteBackend
+
+__all__ = [
+    "StorageBackend",
+    "MongoBackend",
+    "AnswerSheetsMongoBackend",
+    "SQLiteBackend",
+    "MemoryBackend",
+    "new_id",
+]
@@ -0,0 +1,258 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from bson import ObjectId
+# Views catch pymongo's DuplicateKeyError, so every backend raises it on unique conflicts
+from pymongo.errors import DuplicateKeyError  # noqa: F401
+
+
+def new_id() -> str:
+    # ObjectId hex keeps ids time-ordered and interchangeable with the Mongo backend
+    return str(ObjectId())
+
+
+class StorageBackend:
+    """
+    CRUD surface used by db.py. Ids going in and out are strings; documents come back
+    with an "id" key like the Mongo rows always have.
+    """
+
+    name = "base"
+
+    # --- Lifecycle / versions ---
+
+    def init(self) -> Dict[str, Any]:
+        """Create tables/indexes; returns {"schema_version": int, "migrated": bool}."""
+        raise NotImplementedError
+
+    def create_default_admin_if_missing(self, password_hash: str):
+        raise NotImplementedError
+
+    def get_versions(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+    def bump_versions(self, inc: Dict[str, int]) -> Dict[str, int]:
+        """Atomically add `inc` to the change counters and return all counters."""
+        raise NotImplementedError
+
+    # --- Judges / users ---
+
+    def get_judges(self) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def get_judges_with_user(
+        self, skip: int = 0, limit: Optional[int] = None, fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def list_judges_page(
+        self, after_id: Any = None, limit: int = 25, prefix: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Up to `limit` judges (with username) with id > after_id in id order; `prefix`
+        (lowercase) matches the start of name or email.
+        """
+        raise NotImplementedError
+
+    def get_judge_by_id(self, judge_id: Any) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def insert_judge(self, name: str, email: str):
+        raise NotImplementedError
+
+    def create_judge_account(
+        self, name: str, email: str, username: str, password_hash: str
+    ) -> str:
+        raise NotImplementedError
+
+    def update_judge_account(
+        self,
+        judge_id: Any,
+        name: str,
+        email: str,
+        username: str,
+        password_hash: Optional[str] = None,
+    ):
+        raise NotImplementedError
+
+    def delete_judge_account(self, judge_id: Any):
+        raise NotImplementedError
+
+    def get_user_by_username(self, username: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    # --- Competitors ---
+
+    def get_competitors(self) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def list_competitors_page(
+        self, after_id: Any = None, limit: int = 25, prefix: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def search_competitors_for_judge(
+        self, judge_id: Any, prefix: Optional[str] = None, limit: int = 20
+    ) -> List[Dict[str, Any]]:
+        """
+        Up to `limit` competitors {id, name, scored} ordered by lowercase name, where
+        `prefix` (lowercase) matches the start of the name and `scored` says whether this
+        judge has a score for them. One query.
+        """
+        raise NotImplementedError
+
+    def insert_competitor(self, name: str, notes: str = ""):
+        raise NotImplementedError
+
+    def update_competitor(self, competitor_id: Any, name: str, notes: Optional[str] = None):
+        raise NotImplementedError
+
+    def delete_competitor(self, competitor_id: Any):
+        raise NotImplementedError
+
+    # --- Scores / answers ---
+
+    def replace_scores_for_judge(
+        self, judge_id: Any, items: Iterable[Tuple[Any, Any]], batch_size: int
+    ) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def save_answers_for_judge(
+        self,
+        judge_id: Any,
+        competitor_id: Any,
+        answers_dict: Dict[Any, float],
+        use_transaction: Optional[bool] = None,
+    ):
+        raise NotImplementedError
+
+    def save_answers_bulk(
+        self,
+        judge_id: Any,
+        answers_by_competitor: Dict[Any, Dict[Any, float]],
+        use_transaction: Optional[bool] = None,
+        keys: Optional[Dict[Any, str]] = None,
+    ):
+        """
+        save_answers_for_judge for many competitors at once, as one batch per collection.
+
+        `keys` ({competitor_id: idempotency key}) is stored with each submission in the log;
+        a submission whose key is already there is skipped, so retries are safe.
+        """
+        raise NotImplementedError
+
+    def get_scores_for_judge(self, judge_id: Any) -> Dict[str, float]:
+        raise NotImplementedError
+
+    def get_leaderboard(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def watch_leaderboard(self) -> Iterator[Tuple[str, Optional[Dict[str, Any]]]]:
+        """
+        Start following leaderboard changes: yields (competitor_id, row or None when
+        removed) as they happen. Raises NotImplementedError where the store can't push
+        changes; callers then poll get_versions().
+        """
+        raise NotImplementedError
+
+    def get_answers_for_judge_competitor(self, judge_id: Any, competitor_id: Any) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def get_judge_with_answers(
+        self, judge_id: Any
+    ) -> Tuple[Optional[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+        """Judge profile plus {competitor_id: {question_id: value}} for that judge."""
+        raise NotImplementedError
+
+    def iter_answers_sorted(self) -> Iterator[Dict[str, Any]]:
+        """Stream every answer ordered by (judge_id, competitor_id)."""
+        raise NotImplementedError
+
+    def rebuild_scores_from_answers(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+    def verify_scores(self, tolerance: float = 1e-6) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    # --- Submission history ---
+
+    def get_submissions(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        judge_id: Any = None,
+        competitor_id: Any = None,
+        limit: int = 100,
+    ) -> List[Dict[str, Any]]:
+        """
+        Logged score changes newest first: {id, judge_id, competitor_id, answers, score, at},
+        with since < at <= until. `score` is None when the change cleared the score; saves
+        from the write-behind queue also carry their idempotency `key`. Admin changes
+        (deletes, imports, re-averaging) are logged with empty `answers`.
+        """
+        raise NotImplementedError
+
+    def iter_submission_scores(
+        self, after: Optional[datetime], until: datetime
+    ) -> Iterator[Tuple[str, str, Optional[float]]]:
+        """(judge_id, competitor_id, score) for saves with after < at <= until, in log order."""
+        raise NotImplementedError
+
+    def latest_snapshot(self, at: datetime) -> Optional[Dict[str, Any]]:
+        """Newest snapshot {id, at, pairs} taken as of `at` or earlier."""
+        raise NotImplementedError
+
+    def iter_snapshot_scores(self, snapshot_id: Any) -> Iterator[Tuple[str, str, float]]:
+        raise NotImplementedError
+
+    def insert_snapshot(self, at: datetime, scores: Dict[Tuple[str, str], float]) -> str:
+        """Store the {(judge_id, competitor_id): score} state as of `at`; returns its id."""
+        raise NotImplementedError
+
+    def snapshot_scores(self) -> str:
+        """
+        Snapshot the live scores as of now; returns its id. Taken where the log alone can't
+        reconstruct the state (schema upgrade, rebuild), so history continues from it.
+        """
+        raise NotImplementedError
+
+    # --- Questions ---
+
+    def get_questions(self) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def list_questions_page(self, after_id: Any = None, limit: int = 25) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def insert_question(self, prompt: str):
+        raise NotImplementedError
+
+    def update_question(self, question_id: Any, prompt: str):
+        raise NotImplementedError
+
+    def delete_question(self, question_id: Any):
+        raise NotImplementedError
+
+    # --- Assets ---
+
+    def get_asset(self, key: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def set_asset(self, key: str, fields: Dict[str, Any]):
+        """Replace the asset/setting document stored under `key`."""
+        raise NotImplementedError
+
+    def delete_asset(self, key: str):
+        raise NotImplementedError
+
+    def put_asset_blobs(
+        self, owner: str, content_hash: str, blobs: Dict[str, Tuple[bytes, str]]
+    ):
+        """Store {variant: (bytes, content_type)} under content_hash:variant."""
+        raise NotImplementedError
+
+    def load_asset_blob(self, content_hash: str, variant: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def delete_asset_blobs(self, owner: str, keep_hash: Optional[str] = None):
+        raise NotImplementedError
@@ -0,0 +1,13 @@
+from storage.sqlite import SQLiteBackend
+
+
+class MemoryBackend(SQLiteBackend):
+    """
+    Throwaway in-process storage (SQLite ":memory:"), for tests and demos. Data lives as
+    long as the process and is never written to disk.
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        super().__init__(":memory:")
@@ -0,0 +1,1273 @@
+from datetime import datetime
+from itertools import groupby, islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from bson import ObjectId
+from bson.binary import Binary
+from bson.errors import InvalidId
+from pymongo import (
+    ASCENDING,
+    DESCENDING,
+    DeleteMany,
+    DeleteOne,
+    ReplaceOne,
+    ReturnDocument,
+    UpdateOne,
+)
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from images import banner_blobs, banner_metadata
+from storage.base import StorageBackend
+
+# Bump when indexes or stored layouts change so running databases get migrated
+SCHEMA_VERSION = 8
+# Unstamped scores checked against answers per round trip during a rebuild
+REBUILD_BATCH_SIZE = 500
+# Idempotency keys remembered per leaderboard row, so a retried save's delta applies once
+APPLIED_KEYS_KEPT = 100
+
+
+def _hide_search_keys() -> Dict[str, int]:
+    # Projection hiding the lowercase search keys; fresh each call as drivers may add to it
+    return {"name_lower": 0, "email_lower": 0}
+
+
+def _oid(value: Any) -> ObjectId:
+    if isinstance(value, ObjectId):
+        return value
+    return ObjectId(str(value))
+
+
+def _doc_with_id(doc: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if not doc:
+        return None
+    clean = dict(doc)
+    clean["id"] = str(clean.pop("_id"))
+    # Normalize nested ids if present
+    for key in ("judge_id", "competitor_id", "question_id"):
+        if key in clean and isinstance(clean[key], ObjectId):
+            clean[key] = str(clean[key])
+    return clean
+
+
+# --- Materialized leaderboard ---
+
+def _leaderboard_delta(
+    competitor_oid: ObjectId, count_delta: int, sum_delta: float, key: Optional[str] = None
+) -> UpdateOne:
+    # Apply count/sum deltas and recompute avg from the new totals in a single atomic update.
+    # Upserts, so a competitor missing its row shows up in upserted_ids instead of being lost.
+    # With a key the delta is skipped when the row already lists it, and the key recorded.
+    totals: Dict[str, Any] = {
+        "num_scores": {"$add": [{"$ifNull": ["$num_scores", 0]}, count_delta]},
+        "total_score": {"$add": [{"$ifNull": ["$total_score", 0]}, sum_delta]},
+    }
+    if key is not None:
+        applied = {"$ifNull": ["$applied_keys", []]}
+        seen = {"$in": [key, applied]}
+        totals = {
+            field: {"$cond": [seen, {"$ifNull": [f"${field}", 0]}, expr]}
+            for field, expr in totals.items()
+        }
+        totals["applied_keys"] = {
+            "$cond": [
+                seen,
+                applied,
+                {"$slice": [{"$concatArrays": [applied, [key]]}, -APPLIED_KEYS_KEPT]},
+            ]
+        }
+    return UpdateOne(
+        {"_id": competitor_oid},
+        [
+            {"$set": totals},
+            {
+                "$set": {
+                    # Reset the sum at zero scores so float error doesn't accumulate
+                    "total_score": {
+                        "$cond": [{"$gt": ["$num_scores", 0]}, "$total_score", 0]
+                    },
+                    "avg_score": {
+                        "$cond": [
+                            {"$gt": ["$num_scores", 0]},
+                            {"$divide": ["$total_score", "$num_scores"]},
+                            0,
+                        ]
+                    },
+                }
+            },
+        ],
+        upsert=True,
+    )
+
+
+def _leaderboard_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "competitor_id": str(row["_id"]),
+        "competitor_name": row.get("name"),
+        "name": row.get("name"),
+        "num_scores": row.get("num_scores", 0),
+        "total_score": row.get("total_score", 0),
+        "avg_score": row.get("avg_score", 0),
+    }
+
+
+def _apply_leaderboard_deltas(
+    db, deltas: Dict[ObjectId, list], session=None, keys=None, refresh: bool = True
+) -> List[ObjectId]:
+    """
+    Apply {competitor_oid: [count_delta, sum_delta]} to the leaderboard collection, each
+    guarded by keys[competitor_oid] when given. Rows that were missing are recounted from
+    scores, or with refresh=False returned for the caller to recount once scores are written.
+    """
+    keys = keys or {}
+    ops = [
+        _leaderboard_delta(comp_oid, count, total, keys.get(comp_oid))
+        for comp_oid, (count, total) in deltas.items()
+        if count or total
+    ]
+    if not ops:
+        return []
+    result = db.leaderboard.bulk_write(ops, ordered=False, session=session)
+    missing = list(result.upserted_ids.values())
+    if missing and refresh:
+        # The row was missing, so the delta alone is wrong: recount those from scores
+        _refresh_leaderboard_rows(db, missing, session=session)
+        return []
+    return missing
+
+
+def _refresh_leaderboard_rows(db, competitor_oids: List[ObjectId], session=None):
+    """
+    Recompute the leaderboard rows of `competitor_oids` from the scores collection,
+    dropping rows of competitors that no longer exist.
+    """
+    if not competitor_oids:
+        return
+    names = {
+        row["_id"]: row["name"]
+        for row in db.competitors.find(
+            {"_id": {"$in": competitor_oids}}, {"name": 1}, session=session
+        )
+    }
+    totals = {
+        row["_id"]: (row["num_scores"], row["total_score"])
+        for row in db.scores.aggregate(
+            [
+                {"$match": {"competitor_id": {"$in": competitor_oids}}},
+                {
+                    "$group": {
+                        "_id": "$competitor_id",
+                        "num_scores": {"$sum": 1},
+                        "total_score": {"$sum": "$value"},
+                    }
+                },
+            ],
+            session=session,
+        )
+    }
+    ops = []
+    for comp_oid in competitor_oids:
+        if comp_oid not in names:
+            ops.append(DeleteOne({"_id": comp_oid}))
+            continue
+        count, total = totals.get(comp_oid, (0, 0))
+        ops.append(
+            ReplaceOne(
+                {"_id": comp_oid},
+                {
+                    "name": names[comp_oid],
+                    "num_scores": count,
+                    "total_score": total if count else 0,
+                    "avg_score": total / count if count else 0,
+                },
+                upsert=True,
+            )
+        )
+    db.leaderboard.bulk_write(ops, ordered=False, session=session)
+
+
+def _judge_fields(name: str, email: str) -> Dict[str, Any]:
+    # Lowercase copies back the case-insensitive prefix search indexes
+    return {"name": name, "email": email, "name_lower": name.lower(), "email_lower": email.lower()}
+
+
+def _backfill_lowercase(collection, fields: Tuple[str, ...]):
+    # In Python rather than $toLower, which only lowercases ASCII: the stored keys have to
+    # match the str.lower() that new writes and search prefixes use
+    projection = {field: 1 for field in fields}
+    projection.update({f"{field}_lower": 1 for field in fields})
+    ops = []
+    for doc in collection.find({}, projection):
+        lowered = {f"{field}_lower": (doc.get(field) or "").lower() for field in fields}
+        if any(doc.get(key) != value for key, value in lowered.items()):
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": lowered}))
+        if len(ops) >= REBUILD_BATCH_SIZE:
+            collection.bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        collection.bulk_write(ops, ordered=False)
+
+
+def _prefix_range(prefix: str) -> Dict[str, str]:
+    # Index range covering every string that starts with `prefix`
+    return {"$gte": prefix, "$lt": prefix + "\U0010ffff"}
+
+
+def _page_query(after_id, extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    query = dict(extra or {})
+    if after_id:
+        query["_id"] = {"$gt": _oid(after_id)}
+    return query
+
+
+def _score_change(deltas: Dict[ObjectId, list], comp_oid: ObjectId, old=None, new=None):
+    entry = deltas.setdefault(comp_oid, [0, 0.0])
+    if old is not None:
+        entry[0] -= 1
+        entry[1] -= old
+    if new is not None:
+        entry[0] += 1
+        entry[1] += new
+
+
+def _rebuild_leaderboard(db):
+    """
+    Recompute every leaderboard row from the scores collection.
+    """
+    db.competitors.aggregate(
+        [
+            {
+                "$lookup": {
+                    "from": "scores",
+                    "localField": "_id",
+                    "foreignField": "competitor_id",
+                    "as": "score_docs",
+                }
+            },
+            {
+                "$project": {
+                    "name": 1,
+                    "num_scores": {"$size": "$score_docs"},
+                    "total_score": {"$sum": "$score_docs.value"},
+                    "avg_score": {
+                        "$cond": [
+                            {"$gt": [{"$size": "$score_docs"}, 0]},
+                            {"$avg": "$score_docs.value"},
+                            0,
+                        ]
+                    },
+                }
+            },
+            {
+                "$merge": {
+                    "into": "leaderboard",
+                    "on": "_id",
+                    "whenMatched": "replace",
+                    "whenNotMatched": "insert",
+                }
+            },
+        ]
+    )
+    # Drop rows whose competitor no longer exists
+    db.leaderboard.delete_many({"_id": {"$nin": db.competitors.distinct("_id")}})
+
+
+class MongoBackend(StorageBackend):
+    """MongoDB/Atlas storage: the original layout plus the materialized leaderboard."""
+
+    name = "mongo"
+    # One answers document per question; see storage.mongo_sheets for the compact layout
+    answers_layout = "rows"
+
+    def __init__(self, db, transactions: Optional[bool] = None):
+        self.db = db
+        # None means detect from the server on first write
+        self._transactions_supported = transactions
+
+    # --- Lifecycle / versions ---
+
+    def _ensure_schema(self):
+        db = self.db
+        db.judges.create_index("email", unique=True)
+        db.users.create_index("username", unique=True)
+        db.users.create_index("judge_id", unique=True, sparse=True)
+        db.scores.create_index(
+            [("judge_id", ASCENDING), ("competitor_id", ASCENDING)], unique=True
+        )
+        db.answers.create_index(
+            [("judge_id", ASCENDING), ("competitor_id", ASCENDING), ("question_id", ASCENDING)],
+            unique=True,
+        )
+        db.answers.create_index("question_id")
+        db.leaderboard.create_index([("avg_score", DESCENDING), ("_id", ASCENDING)])
+        # Prefix search on admin pages; backfill the lowercase keys on older databases
+        db.judges.create_index("name_lower")
+        db.judges.create_index("email_lower")
+        # (name_lower, _id) also gives the typeahead picker its sort order
+        db.competitors.create_index([("name_lower", ASCENDING), ("_id", ASCENDING)])
+        if "name_lower_1" in db.competitors.index_information():
+            db.competitors.drop_index("name_lower_1")
+        db.scores.create_index([("competitor_id", ASCENDING), ("judge_id", ASCENDING)])
+        # Submission history: audits by time/judge/competitor, snapshots by time
+        db.submissions.create_index([("at", ASCENDING), ("_id", ASCENDING)])
+        db.submissions.create_index([("judge_id", ASCENDING), ("at", ASCENDING)])
+        db.submissions.create_index([("competitor_id", ASCENDING), ("at", ASCENDING)])
+        # Idempotency keys from the write-behind queue; a retried submission can't apply twice
+        db.submissions.create_index("key", unique=True, sparse=True)
+        db.snapshots.create_index("at")
+        db.snapshot_scores.create_index("snapshot_id")
+        _backfill_lowercase(db.judges, ("name", "email"))
+        _backfill_lowercase(db.competitors, ("name",))
+        if (
+            db.leaderboard.estimated_document_count() == 0
+            and db.competitors.estimated_document_count() > 0
+        ):
+            # Backfill the materialized leaderboard for databases created before it existed
+            _rebuild_leaderboard(db)
+        else:
+            # ...and fill in any competitor whose row went missing since
+            missing = set(db.competitors.distinct("_id")) - set(db.leaderboard.distinct("_id"))
+            _refresh_leaderboard_rows(db, list(missing))
+        legacy_banner = db.assets.find_one({"key": "banner", "data": {"$exists": True}})
+        if legacy_banner:
+            # Move inline banner bytes into content-addressed blobs with variants
+            content_hash, blobs = banner_blobs(
+                bytes(legacy_banner["data"]), legacy_banner.get("content_type")
+            )
+            self.put_asset_blobs("banner", content_hash, blobs)
+            self.set_asset(
+                "banner",
+                banner_metadata(
+                    legacy_banner.get("filename"),
+                    legacy_banner.get("content_type"),
+                    content_hash,
+                    blobs,
+                ),
+            )
+            self.bump_versions({"assets": 1})
+
+    def init(self) -> Dict[str, Any]:
+        """
+        Create indexes unless the schema marker in `meta` already matches SCHEMA_VERSION.
+        """
+        db = self.db
+        marker = db.meta.find_one({"_id": "schema"}) or {}
+        stored_version = marker.get("version", 0)
+        migrated = stored_version < SCHEMA_VERSION
+        if migrated:
+            self._ensure_schema()
+            if stored_version < 7:
+                # Scores from before the log was complete: history starts from here
+                self.snapshot_scores()
+            db.meta.update_one(
+                {"_id": "schema"},
+                {"$max": {"version": SCHEMA_VERSION}, "$set": {"updated_at": datetime.utcnow()}},
+                upsert=True,
+            )
+        return {"schema_version": max(stored_version, SCHEMA_VERSION), "migrated": migrated}
+
+    def create_default_admin_if_missing(self, password_hash: str):
+        existing = self.db.users.count_documents({"role": "admin"})
+        if existing == 0:
+            self.db.users.insert_one(
+                {"username": "admin", "password_hash": password_hash, "role": "admin"}
+            )
+
+    def get_versions(self) -> Dict[str, int]:
+        row = self.db.meta.find_one({"_id": "versions"}) or {}
+        return {k: v for k, v in row.items() if k != "_id"}
+
+    def bump_versions(self, inc: Dict[str, int]) -> Dict[str, int]:
+        row = self.db.meta.find_one_and_update(
+            {"_id": "versions"}, {"$inc": inc}, upsert=True, return_document=ReturnDocument.AFTER
+        )
+        return {k: v for k, v in row.items() if k != "_id"}
+
+    def _supports_transactions(self) -> bool:
+        # Multi-document transactions need a replica set or sharded cluster (Atlas is both)
+        if self._transactions_supported is None:
+            hello = self.db.command("hello")
+            self._transactions_supported = bool(
+                hello.get("setName") or hello.get("msg") == "isdbgrid"
+            )
+        return self._transactions_supported
+
+    def _run_write(self, callback: Callable[[Any], Any], use_transaction: Optional[bool] = None):
+        """
+        Run callback(session) inside a transaction when requested/supported, else callback(None).
+        """
+        if use_transaction is None:
+            use_transaction = self._supports_transactions()
+        if not use_transaction:
+            return callback(None)
+        with self.db.client.start_session() as session:
+            return session.with_transaction(callback)
+
+    # --- Judges / users ---
+
+    def get_judges(self):
+        rows = self.db.judges.find({}, _hide_search_keys()).sort("_id", ASCENDING)
+        return [_doc_with_id(r) for r in rows]
+
+    def _usernames_for_judges(self, judge_oids) -> Dict[ObjectId, Optional[str]]:
+        # One batched users query on the unique judge_id index
+        rows = self.db.users.find(
+            {"role": "judge", "judge_id": {"$in": list(judge_oids)}},
+            {"_id": 0, "judge_id": 1, "username": 1},
+        )
+        return {row["judge_id"]: row.get("username") for row in rows}
+
+    def get_judges_with_user(self, skip=0, limit=None, fields=None):
+        projection = {field: 1 for field in fields} if fields else _hide_search_keys()
+        cursor = self.db.judges.find({}, projection).sort("_id", ASCENDING).skip(skip)
+        if limit:
+            cursor = cursor.limit(limit)
+        judges = list(cursor)
+        usernames = self._usernames_for_judges(judge["_id"] for judge in judges)
+        results = []
+        for judge in judges:
+            merged = _doc_with_id(judge)
+            merged["username"] = usernames.get(judge["_id"])
+            results.append(merged)
+        return results
+
+    def list_judges_page(self, after_id=None, limit=25, prefix=None):
+        extra = None
+        if prefix:
+            extra = {
+                "$or": [
+                    {"name_lower": _prefix_range(prefix)},
+                    {"email_lower": _prefix_range(prefix)},
+                ]
+            }
+        judges = list(
+            self.db.judges.find(_page_query(after_id, extra), _hide_search_keys())
+            .sort("_id", ASCENDING)
+            .limit(limit)
+        )
+        usernames = self._usernames_for_judges(judge["_id"] for judge in judges)
+        results = []
+        for judge in judges:
+            merged = _doc_with_id(judge)
+            merged["username"] = usernames.get(judge["_id"])
+            results.append(merged)
+        return results
+
+    def get_judge_by_id(self, judge_id):
+        row = self.db.judges.find_one({"_id": _oid(judge_id)}, _hide_search_keys())
+        return _doc_with_id(row)
+
+    def insert_judge(self, name, email):
+        self.db.judges.insert_one(_judge_fields(name, email))
+
+    def create_judge_account(self, name, email, username, password_hash):
+        db = self.db
+        result = db.judges.insert_one(_judge_fields(name, email))
+        judge_id = result.inserted_id
+        try:
+            db.users.insert_one(
+                {
+                    "username": username,
+                    "password_hash": password_hash,
+                    "role": "judge",
+                    "judge_id": judge_id,
+                }
+            )
+        except DuplicateKeyError:
+            # Roll back the judge if username or email collides
+            db.judges.delete_one({"_id": judge_id})
+            raise
+        return str(judge_id)
+
+    def update_judge_account(self, judge_id, name, email, username, password_hash=None):
+        db = self.db
+        judge_oid = _oid(judge_id)
+        db.judges.update_one({"_id": judge_oid}, {"$set": _judge_fields(name, email)})
+        update_fields: Dict[str, Any] = {"username": username}
+        if password_hash:
+            update_fields["password_hash"] = password_hash
+        db.users.update_one(
+            {"judge_id": judge_oid, "role": "judge"},
+            {"$set": update_fields},
+            upsert=True,
+        )
+
+    def delete_judge_account(self, judge_id):
+        db = self.db
+        judge_oid = _oid(judge_id)
+        deltas: Dict[ObjectId, list] = {}
+        for row in db.scores.find({"judge_id": judge_oid}, {"competitor_id": 1, "value": 1}):
+            _score_change(deltas, row["competitor_id"], old=row["value"])
+        db.scores.delete_many({"judge_id": judge_oid})
+        _apply_leaderboard_deltas(db, deltas)
+        self._log_score_changes({(judge_oid, comp_oid): None for comp_oid in deltas})
+        db.answers.delete_many({"judge_id": judge_oid})
+        db.users.delete_many({"judge_id": judge_oid})
+        db.judges.delete_one({"_id": judge_oid})
+
+    def get_user_by_username(self, username):
+        return _doc_with_id(self.db.users.find_one({"username": username}))
+
+    # --- Competitors ---
+
+    def get_competitors(self):
+        rows = self.db.competitors.find({}, _hide_search_keys()).sort("_id", ASCENDING)
+        return [_doc_with_id(r) for r in rows]
+
+    def list_competitors_page(self, after_id=None, limit=25, prefix=None):
+        extra = {"name_lower": _prefix_range(prefix)} if prefix else None
+        rows = (
+            self.db.competitors.find(_page_query(after_id, extra), _hide_search_keys())
+            .sort("_id", ASCENDING)
+            .limit(limit)
+        )
+        return [_doc_with_id(r) for r in rows]
+
+    def search_competitors_for_judge(self, judge_id, prefix=None, limit=20):
+        match = {"name_lower": _prefix_range(prefix)} if prefix else {}
+        rows = self.db.competitors.aggregate(
+            [
+                {"$match": match},
+                {"$sort": {"name_lower": ASCENDING, "_id": ASCENDING}},
+                {"$limit": limit},
+                # Per competitor this reads at most one score per judge, on the
+                # (competitor_id, judge_id) index
+                {
+                    "$lookup": {
+                        "from": "scores",
+                        "localField": "_id",
+                        "foreignField": "competitor_id",
+                        "as": "score_docs",
+                    }
+                },
+                {
+                    "$project": {
+                        "name": 1,
+                        "scored": {"$in": [_oid(judge_id), "$score_docs.judge_id"]},
+                    }
+                },
+            ]
+        )
+        return [
+            {"id": str(row["_id"]), "name": row["name"], "scored": bool(row["scored"])}
+            for row in rows
+        ]
+
+    def insert_competitor(self, name, notes=""):
+        db = self.db
+        result = db.competitors.insert_one(
+            {"name": name, "notes": notes, "name_lower": name.lower()}
+        )
+        db.leaderboard.insert_one(
+            {
+                "_id": result.inserted_id,
+                "name": name,
+                "num_scores": 0,
+                "total_score": 0,
+                "avg_score": 0,
+            }
+        )
+
+    def update_competitor(self, competitor_id, name, notes=None):
+        db = self.db
+        update_fields: Dict[str, Any] = {"name": name, "name_lower": name.lower()}
+        if notes is not None:
+            update_fields["notes"] = notes
+        db.competitors.update_one({"_id": _oid(competitor_id)}, {"$set": update_fields})
+        db.leaderboard.update_one({"_id": _oid(competitor_id)}, {"$set": {"name": name}})
+
+    def delete_competitor(self, competitor_id):
+        db = self.db
+        comp_oid = _oid(competitor_id)
+        judge_oids = db.scores.distinct("judge_id", {"competitor_id": comp_oid})
+        db.scores.delete_many({"competitor_id": comp_oid})
+        self._log_score_changes({(judge_oid, comp_oid): None for judge_oid in judge_oids})
+        db.answers.delete_many({"competitor_id": comp_oid})
+        db.competitors.delete_one({"_id": comp_oid})
+        db.leaderboard.delete_one({"_id": comp_oid})
+
+    # --- Scores / answers ---
+
+    def replace_scores_for_judge(self, judge_id, items, batch_size):
+        """
+        Insert scores with unordered insert_many batches, so a load costs O(batches) round
+        trips; rejected rows are reported per item. The leaderboard and history follow each
+        write as it lands (the deletion, then every batch), so a load cut short by an error
+        leaves them matching whatever scores it did write.
+        """
+        db = self.db
+        judge_oid = _oid(judge_id)
+        known_competitors = set(db.competitors.distinct("_id"))
+
+        deltas: Dict[ObjectId, list] = {}
+        for row in db.scores.find({"judge_id": judge_oid}, {"competitor_id": 1, "value": 1}):
+            _score_change(deltas, row["competitor_id"], old=row["value"])
+        db.scores.delete_many({"judge_id": judge_oid})
+        _apply_leaderboard_deltas(db, deltas)
+        self._log_score_changes({(judge_oid, comp_oid): None for comp_oid in deltas})
+
+        written = 0
+        failed: List[Dict[str, Any]] = []
+        batch: List[Tuple[Any, Dict[str, Any]]] = []
+
+        def flush():
+            nonlocal written
+            if not batch:
+                return
+            errors: Dict[int, str] = {}
+            try:
+                db.scores.insert_many([doc for _, doc in batch], ordered=False)
+            except BulkWriteError as exc:
+                errors = {
+                    err["index"]: err.get("errmsg", "") for err in exc.details["writeErrors"]
+                }
+            batch_deltas: Dict[ObjectId, list] = {}
+            changes: Dict[Tuple[ObjectId, ObjectId], Optional[float]] = {}
+            for index, (raw_id, doc) in enumerate(batch):
+                if index in errors:
+                    failed.append({"competitor_id": raw_id, "error": errors[index]})
+                else:
+                    written += 1
+                    _score_change(batch_deltas, doc["competitor_id"], new=doc["value"])
+                    changes[(judge_oid, doc["competitor_id"])] = doc["value"]
+            batch.clear()
+            _apply_leaderboard_deltas(db, batch_deltas)
+            self._log_score_changes(changes)
+
+        for competitor_id, value in items:
+            try:
+                comp_oid = _oid(competitor_id)
+                numeric = float(value)
+            except (InvalidId, TypeError, ValueError) as exc:
+                failed.append({"competitor_id": competitor_id, "error": str(exc)})
+                continue
+            if comp_oid not in known_competitors:
+                failed.append({"competitor_id": competitor_id, "error": "Unknown competitor"})
+                continue
+            batch.append(
+                (
+                    competitor_id,
+                    {"judge_id": judge_oid, "competitor_id": comp_oid, "value": numeric},
+                )
+            )
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+        return {"written": written, "failed": failed}
+
+    def _save_answer_docs(self, judge_oid, answers_by_comp, session=None):
+        """
+        Replace the stored answers of each {competitor_oid: answers_dict} for one judge.
+        """
+        # One ordered batch: upsert each answer on the unique (judge, competitor, question)
+        # index, then drop answers for questions that are not part of the submission
+        ops = []
+        for comp_oid, answers_dict in answers_by_comp.items():
+            key = {"judge_id": judge_oid, "competitor_id": comp_oid}
+            question_oids = [_oid(question_id) for question_id in answers_dict]
+            ops += [
+                UpdateOne(
+                    {**key, "question_id": question_oid}, {"$set": {"value": value}}, upsert=True
+                )
+                for question_oid, value in zip(question_oids, answers_dict.values())
+            ]
+            ops.append(DeleteMany({**key, "question_id": {"$nin": question_oids}}))
+        if ops:
+            self.db.answers.bulk_write(ops, ordered=True, session=session)
+
+    def _log_score_changes(self, changes: Dict[Tuple[ObjectId, ObjectId], Optional[float]]):
+        """
+        Log score changes made outside a judge's save, {(judge_oid, competitor_oid): new
+        score or None where it was removed}, so as-of reads replay them too.
+        """
+        if not changes:
+            return
+        at = datetime.utcnow()
+        self.db.submissions.insert_many(
+            [
+                {"judge_id": j, "competitor_id": c, "answers": {}, "score": score, "at": at}
+                for (j, c), score in changes.items()
+            ],
+            ordered=False,
+        )
+
+    def _log_submissions(self, judge_oid, answers_by_comp, session=None, keys=None):
+        # Append-only history; the answers/scores collections stay the current state.
+        # Written after them: without a transaction, a retry re-applies the state writes
+        # (answers and scores are upserts, and keyed leaderboard deltas apply once per key)
+        # and only then records the key that marks it done.
+        at = datetime.utcnow()
+        docs = []
+        for comp_oid, answers_dict in answers_by_comp.items():
+            doc = {
+                "judge_id": judge_oid,
+                "competitor_id": comp_oid,
+                "answers": {str(q): value for q, value in answers_dict.items()},
+                "score": sum(answers_dict.values()) / len(answers_dict) if answers_dict else None,
+                "at": at,
+            }
+            if keys and comp_oid in keys:
+                doc["key"] = keys[comp_oid]
+            docs.append(doc)
+        self.db.submissions.insert_many(docs, ordered=False, session=session)
+
+    def _write_submission(self, judge_oid, comp_oid, answers_dict, session=None):
+        db = self.db
+        key = {"judge_id": judge_oid, "competitor_id": comp_oid}
+        self._save_answer_docs(judge_oid, {comp_oid: answers_dict}, session)
+
+        new_value = None
+        if answers_dict:
+            new_value = sum(answers_dict.values()) / len(answers_dict)
+            old_score = db.scores.find_one_and_update(
+                key,
+                {"$set": {"value": new_value}},
+                upsert=True,
+                return_document=ReturnDocument.BEFORE,
+                session=session,
+            )
+        else:
+            # No answers, ensure scores entry is removed
+            old_score = db.scores.find_one_and_delete(key, session=session)
+
+        deltas: Dict[ObjectId, list] = {}
+        old_value = old_score["value"] if old_score else None
+        _score_change(deltas, comp_oid, old=old_value, new=new_value)
+        _apply_leaderboard_deltas(db, deltas, session=session)
+        self._log_submissions(judge_oid, {comp_oid: answers_dict}, session)
+
+    def save_answers_for_judge(self, judge_id, competitor_id, answers_dict, use_transaction=None):
+        """
+        Answers are written as one bulk upsert and the score with one upsert that returns
+        the previous value for the leaderboard delta. On replica sets (Atlas) the writes
+        share a transaction, so readers never see a half-written submission.
+
+        That is one write per collection touched (answers, scores, leaderboard, submissions),
+        the floor: Mongo can't batch across collections, and the leaderboard delta needs the
+        score write's previous value. Standalone servers have no multi-document atomicity;
+        a save cut short there leaves a leaderboard drift that verify_scores reports.
+        """
+        judge_oid = _oid(judge_id)
+        comp_oid = _oid(competitor_id)
+        self._run_write(
+            lambda session: self._write_submission(judge_oid, comp_oid, answers_dict, session),
+            use_transaction,
+        )
+
+    def _write_submissions(self, judge_oid, answers_by_comp, session=None, keys=None):
+        db = self.db
+        if keys:
+            # Submissions already logged under their key were applied by an earlier attempt
+            applied = set(
+                db.submissions.distinct(
+                    "key", {"key": {"$in": list(keys.values())}}, session=session
+                )
+            )
+            answers_by_comp = {
+                comp_oid: answers_dict
+                for comp_oid, answers_dict in answers_by_comp.items()
+                if keys.get(comp_oid) not in applied
+            }
+        score_ops = []
+        new_values = {}
+        for comp_oid, answers_dict in answers_by_comp.items():
+            key = {"judge_id": judge_oid, "competitor_id": comp_oid}
+            if answers_dict:
+                new_values[comp_oid] = sum(answers_dict.values()) / len(answers_dict)
+                score_ops.append(
+                    UpdateOne(key, {"$set": {"value": new_values[comp_oid]}}, upsert=True)
+                )
+            else:
+                new_values[comp_oid] = None
+                score_ops.append(DeleteOne(key))
+        if not score_ops:
+            return
+
+        # Previous scores for the leaderboard deltas; only this judge writes these rows
+        old_values = {
+            row["competitor_id"]: row["value"]
+            for row in db.scores.find(
+                {"judge_id": judge_oid, "competitor_id": {"$in": list(answers_by_comp)}},
+                {"_id": 0, "competitor_id": 1, "value": 1},
+                session=session,
+            )
+        }
+        deltas: Dict[ObjectId, list] = {}
+        for comp_oid, new_value in new_values.items():
+            _score_change(deltas, comp_oid, old=old_values.get(comp_oid), new=new_value)
+
+        missing: List[ObjectId] = []
+        if keys:
+            # A keyed save may be retried after a partial write. Its deltas go first, each
+            # guarded by its key: a retry that finds the key applied skips the delta it
+            # would compute from the already-updated scores
+            missing = _apply_leaderboard_deltas(
+                db, deltas, session=session, keys=keys, refresh=False
+            )
+        self._save_answer_docs(judge_oid, answers_by_comp, session)
+        db.scores.bulk_write(score_ops, ordered=False, session=session)
+        if keys:
+            _refresh_leaderboard_rows(db, missing, session=session)
+        else:
+            _apply_leaderboard_deltas(db, deltas, session=session)
+        self._log_submissions(judge_oid, answers_by_comp, session, keys)
+
+    def save_answers_bulk(self, judge_id, answers_by_competitor, use_transaction=None, keys=None):
+        """
+        Three bulk writes (answers, scores, leaderboard) whatever the number of
+        competitors, sharing a transaction on replica sets like single submissions.
+        Keyed saves apply their leaderboard deltas first, guarded by key, so a retry after
+        a partial write without a transaction still applies each exactly once.
+        """
+        judge_oid = _oid(judge_id)
+        answers_by_comp = {
+            _oid(competitor_id): answers for competitor_id, answers in answers_by_competitor.items()
+        }
+        comp_keys = {_oid(competitor_id): key for competitor_id, key in (keys or {}).items()}
+        self._run_write(
+            lambda session: self._write_submissions(
+                judge_oid, answers_by_comp, session, comp_keys
+            ),
+            use_transaction,
+        )
+
+    def get_scores_for_judge(self, judge_id):
+        rows = self.db.scores.find({"judge_id": _oid(judge_id)})
+        return {str(row["competitor_id"]): row["value"] for row in rows}
+
+    def get_leaderboard(self, limit=None):
+        """
+        Read the materialized leaderboard, best average first (optionally top-N only).
+        """
+        cursor = self.db.leaderboard.find({}, {"applied_keys": 0}).sort(
+            [("avg_score", DESCENDING), ("_id", ASCENDING)]
+        )
+        if limit:
+            cursor = cursor.limit(limit)
+        return [_leaderboard_row(row) for row in cursor]
+
+    def watch_leaderboard(self):
+        # Change streams need a replica set or sharded cluster, the same as transactions
+        if not self._supports_transactions():
+            raise NotImplementedError("change streams need a replica set")
+        # Opened here so the caller knows it works; full documents spare a read per event
+        stream = self.db.leaderboard.watch(full_document="updateLookup")
+
+        def changes():
+            with stream:
+                for change in stream:
+                    row = change.get("fullDocument")
+                    if change["operationType"] == "delete" or not row:
+                        yield str(change["documentKey"]["_id"]), None
+                    else:
+                        yield str(row["_id"]), _leaderboard_row(row)
+
+        return changes()
+
+    def get_answers_for_judge_competitor(self, judge_id, competitor_id):
+        rows = self.db.answers.find(
+            {"judge_id": _oid(judge_id), "competitor_id": _oid(competitor_id)}
+        )
+        return {str(row["question_id"]): row["value"] for row in rows}
+
+    def get_judge_with_answers(self, judge_id):
+        # Judge profile plus every answer they gave, in one aggregation
+        rows = list(
+            self.db.judges.aggregate(
+                [
+                    {"$match": {"_id": _oid(judge_id)}},
+                    {"$project": _hide_search_keys()},
+                    {
+                        "$lookup": {
+                            "from": "answers",
+                            "localField": "_id",
+                            "foreignField": "judge_id",
+                            "as": "answer_docs",
+                        }
+                    },
+                ]
+            )
+        )
+        if not rows:
+            return None, {}
+        judge_row = rows[0]
+        answers_by_competitor: Dict[str, Dict[str, Any]] = {}
+        for answer in judge_row.pop("answer_docs"):
+            answers_by_competitor.setdefault(str(answer["competitor_id"]), {})[
+                str(answer["question_id"])
+            ] = answer["value"]
+        return _doc_with_id(judge_row), answers_by_competitor
+
+    def iter_answers_sorted(self) -> Iterator[Dict[str, Any]]:
+        # Sorted on the unique answers index prefix, streamed from one cursor
+        cursor = self.db.answers.find(
+            {}, {"_id": 0, "judge_id": 1, "competitor_id": 1, "question_id": 1, "value": 1}
+        ).sort([("judge_id", ASCENDING), ("competitor_id", ASCENDING)])
+        for row in cursor:
+            yield {
+                "judge_id": str(row["judge_id"]),
+                "competitor_id": str(row["competitor_id"]),
+                "question_id": str(row["question_id"]),
+                "value": row["value"],
+            }
+
+    def _averages_for_pairs(self, match) -> Dict[Tuple[ObjectId, ObjectId], float]:
+        # {(judge_oid, competitor_oid): mean answer} for the pairs selected by `match`
+        return {
+            (row["_id"]["judge_id"], row["_id"]["competitor_id"]): row["avg_value"]
+            for row in self.db.answers.aggregate(
+                [
+                    {"$match": match},
+                    {
+                        "$group": {
+                            "_id": {"judge_id": "$judge_id", "competitor_id": "$competitor_id"},
+                            "avg_value": {"$avg": "$value"},
+                        }
+                    },
+                ]
+            )
+        }
+
+    def _recompute_scores_for_pairs(self, pairs, chunk_size: int = 500):
+        """
+        Re-average answers for the given (judge_oid, competitor_oid) pairs only.
+
+        Scores are rewritten in place with bulk upserts (or removed when no answers remain),
+        so the rest of the scores collection is never touched or left empty.
+        """
+        db = self.db
+        pairs = list(pairs)
+        for start in range(0, len(pairs), chunk_size):
+            chunk = pairs[start : start + chunk_size]
+            match = {"$or": [{"judge_id": j, "competitor_id": c} for j, c in chunk]}
+            averages = self._averages_for_pairs(match)
+            old_scores = {
+                (row["judge_id"], row["competitor_id"]): row["value"]
+                for row in db.scores.find(
+                    match, {"_id": 0, "judge_id": 1, "competitor_id": 1, "value": 1}
+                )
+            }
+
+            ops = []
+            deltas: Dict[ObjectId, list] = {}
+            changes = {}
+            for judge_oid, comp_oid in chunk:
+                key = {"judge_id": judge_oid, "competitor_id": comp_oid}
+                new_value = averages.get((judge_oid, comp_oid))
+                changes[(judge_oid, comp_oid)] = new_value
+                if new_value is None:
+                    ops.append(DeleteOne(key))
+                else:
+                    ops.append(UpdateOne(key, {"$set": {"value": new_value}}, upsert=True))
+                old_value = old_scores.get((judge_oid, comp_oid))
+                _score_change(deltas, comp_oid, old=old_value, new=new_value)
+            if ops:
+                db.scores.bulk_write(ops, ordered=False)
+            _apply_leaderboard_deltas(db, deltas)
+            self._log_score_changes(changes)
+
+    def rebuild_scores_from_answers(self):
+        """
+        Averages are $merge'd over the existing score docs inside Mongo and stamped with a
+        rebuild id. Unstamped scores are only removed when their pair has no answers:
+        a judge saving during the rebuild writes an unstamped score that must stay.
+        """
+        db = self.db
+        rebuild_id = ObjectId()
+        self._merge_scores_from_answers(rebuild_id)
+        removed = 0
+        unstamped = db.scores.find(
+            {"rebuild_id": {"$ne": rebuild_id}}, {"judge_id": 1, "competitor_id": 1, "value": 1}
+        )
+        while True:
+            batch = list(islice(unstamped, REBUILD_BATCH_SIZE))
+            if not batch:
+                break
+            answered = self._pairs_with_answers(
+                [(row["judge_id"], row["competitor_id"]) for row in batch]
+            )
+            ops = [
+                # Matching the value read keeps a score rewritten since then
+                DeleteOne({"_id": row["_id"], "value": row["value"]})
+                for row in batch
+                if (row["judge_id"], row["competitor_id"]) not in answered
+            ]
+            if ops:
+                removed += db.scores.bulk_write(ops, ordered=False).deleted_count
+        _rebuild_leaderboard(db)
+        # Any score may have moved, so history continues from a fresh snapshot
+        self.snapshot_scores()
+        return {"scores": db.scores.count_documents({}), "removed": removed}
+
+    def _pairs_with_answers(self, pairs: List[Tuple[ObjectId, ObjectId]]) -> set:
+        """The (judge_oid, competitor_oid) pairs among `pairs` that have any answers."""
+        rows = self.db.answers.find(
+            {"$or": [{"judge_id": j, "competitor_id": c} for j, c in pairs]},
+            {"_id": 0, "judge_id": 1, "competitor_id": 1},
+        )
+        return {(row["judge_id"], row["competitor_id"]) for row in rows}
+
+    def _merge_scores_from_answers(self, rebuild_id: ObjectId):
+        self.db.answers.aggregate(
+            [
+                {
+                    "$group": {
+                        "_id": {"judge_id": "$judge_id", "competitor_id": "$competitor_id"},
+                        "value": {"$avg": "$value"},
+                    }
+                },
+                {
+                    "$project": {
+                        "_id": 0,
+                        "judge_id": "$_id.judge_id",
+                        "competitor_id": "$_id.competitor_id",
+                        "value": 1,
+                        "rebuild_id": {"$literal": rebuild_id},
+                    }
+                },
+                {
+                    "$merge": {
+                        "into": "scores",
+                        "on": ["judge_id", "competitor_id"],
+                        "whenMatched": "merge",
+                        "whenNotMatched": "insert",
+                    }
+                },
+            ],
+            allowDiskUse=True,
+        )
+
+    def _expected_scores(self) -> Iterator[Dict[str, Any]]:
+        # {judge_id, competitor_id, value} answer averages sorted by (judge_id, competitor_id)
+        return self.db.answers.aggregate(
+            [
+                {
+                    "$group": {
+                        "_id": {"judge_id": "$judge_id", "competitor_id": "$competitor_id"},
+                        "value": {"$avg": "$value"},
+                    }
+                },
+                {
+                    "$project": {
+                        "_id": 0,
+                        "judge_id": "$_id.judge_id",
+                        "competitor_id": "$_id.competitor_id",
+                        "value": 1,
+                    }
+                },
+                {"$sort": {"judge_id": 1, "competitor_id": 1}},
+            ],
+            allowDiskUse=True,
+        )
+
+    def verify_scores(self, tolerance=1e-6):
+        db = self.db
+        drift: List[Dict[str, Any]] = []
+
+        # Merge-join two streams sorted by (judge_id, competitor_id)
+        expected = self._expected_scores()
+        actual = db.scores.find(
+            {}, {"_id": 0, "judge_id": 1, "competitor_id": 1, "value": 1}
+        ).sort([("judge_id", ASCENDING), ("competitor_id", ASCENDING)])
+
+        def _entry(kind, key, expected_value, actual_value):
+            return {
+                "kind": kind,
+                "judge_id": str(key[0]) if key[0] is not None else None,
+                "competitor_id": str(key[1]),
+                "expected": expected_value,
+                "actual": actual_value,
+            }
+
+        exp_row = next(expected, None)
+        act_row = next(actual, None)
+        while exp_row is not None or act_row is not None:
+            exp_key = (exp_row["judge_id"], exp_row["competitor_id"]) if exp_row else None
+            act_key = (act_row["judge_id"], act_row["competitor_id"]) if act_row else None
+            if act_key is None or (exp_key is not None and exp_key < act_key):
+                drift.append(_entry("missing_score", exp_key, exp_row["value"], None))
+                exp_row = next(expected, None)
+            elif exp_key is None or act_key < exp_key:
+                drift.append(_entry("orphan_score", act_key, None, act_row["value"]))
+                act_row = next(actual, None)
+            else:
+                if abs(exp_row["value"] - act_row["value"]) > tolerance:
+                    drift.append(
+                        _entry("value_mismatch", exp_key, exp_row["value"], act_row["value"])
+                    )
+                exp_row = next(expected, None)
+                act_row = next(actual, None)
+
+        # Leaderboard rows must match count/sum of scores per competitor
+        totals = {
+            row["_id"]: {"num_scores": row["count"], "total_score": row["total"]}
+            for row in db.scores.aggregate(
+                [
+                    {
+                        "$group": {
+                            "_id": "$competitor_id",
+                            "count": {"$sum": 1},
+                            "total": {"$sum": "$value"},
+                        }
+                    }
+                ]
+            )
+        }
+        leaderboard = {
+            row["_id"]: {"num_scores": row.get("num_scores"), "total_score": row.get("total_score")}
+            for row in db.leaderboard.find({}, {"num_scores": 1, "total_score": 1})
+        }
+        for comp_oid in db.competitors.distinct("_id"):
+            want = totals.get(comp_oid, {"num_scores": 0, "total_score": 0})
+            have = leaderboard.pop(comp_oid, None)
+            if (
+                have is None
+                or have["num_scores"] != want["num_scores"]
+                or abs((have["total_score"] or 0) - want["total_score"]) > tolerance
+            ):
+                drift.append(_entry("leaderboard_mismatch", (None, comp_oid), want, have))
+        for comp_oid, have in leaderboard.items():
+            drift.append(_entry("leaderboard_orphan", (None, comp_oid), None, have))
+        return drift
+
+    # --- Submission history ---
+
+    def get_submissions(
+        self, since=None, until=None, judge_id=None, competitor_id=None, limit=100
+    ):
+        query: Dict[str, Any] = {}
+        at_range = {}
+        if since:
+            at_range["$gt"] = since
+        if until:
+            at_range["$lte"] = until
+        if at_range:
+            query["at"] = at_range
+        if judge_id:
+            query["judge_id"] = _oid(judge_id)
+        if competitor_id:
+            query["competitor_id"] = _oid(competitor_id)
+        rows = (
+            self.db.submissions.find(query)
+            .sort([("at", DESCENDING), ("_id", DESCENDING)])
+            .limit(limit)
+        )
+        return [_doc_with_id(row) for row in rows]
+
+    def iter_submission_scores(self, after, until):
+        at_range = {"$gt": after, "$lte": until} if after else {"$lte": until}
+        rows = self.db.submissions.find(
+            {"at": at_range}, {"_id": 0, "judge_id": 1, "competitor_id": 1, "score": 1}
+        ).sort([("at", ASCENDING), ("_id", ASCENDING)])
+        for row in rows:
+            yield str(row["judge_id"]), str(row["competitor_id"]), row["score"]
+
+    def latest_snapshot(self, at):
+        row = self.db.snapshots.find_one({"at": {"$lte": at}}, sort=[("at", DESCENDING)])
+        return _doc_with_id(row)
+
+    def iter_snapshot_scores(self, snapshot_id):
+        rows = self.db.snapshot_scores.find(
+            {"snapshot_id": _oid(snapshot_id)},
+            {"_id": 0, "judge_id": 1, "competitor_id": 1, "value": 1},
+        )
+        for row in rows:
+            yield str(row["judge_id"]), str(row["competitor_id"]), row["value"]
+
+    def insert_snapshot(self, at, scores):
+        # Rows first, header last: a snapshot is only visible once it is complete
+        snapshot_oid = ObjectId()
+        items = list(scores.items())
+        for start in range(0, len(items), 1000):
+            self.db.snapshot_scores.insert_many(
+                [
+                    {
+                        "snapshot_id": snapshot_oid,
+                        "judge_id": _oid(j),
+                        "competitor_id": _oid(c),
+                        "value": value,
+                    }
+                    for (j, c), value in items[start : start + 1000]
+                ],
+                ordered=False,
+            )
+        self.db.snapshots.insert_one({"_id": snapshot_oid, "at": at, "pairs": len(items)})
+        return str(snapshot_oid)
+
+    def snapshot_scores(self):
+        # Stamped before reading (at Mongo's millisecond precision): a save logged after
+        # the stamp is replayed on top
+        at = datetime.utcnow()
+        at = at.replace(microsecond=at.microsecond // 1000 * 1000)
+        rows = self.db.scores.find({}, {"_id": 0, "judge_id": 1, "competitor_id": 1, "value": 1})
+        return self.insert_snapshot(
+            at, {(row["judge_id"], row["competitor_id"]): row["value"] for row in rows}
+        )
+
+    # --- Questions ---
+
+    def get_questions(self):
+        rows = self.db.questions.find().sort("_id", ASCENDING)
+        return [_doc_with_id(r) for r in rows]
+
+    def list_questions_page(self, after_id=None, limit=25):
+        rows = self.db.questions.find(_page_query(after_id)).sort("_id", ASCENDING).limit(limit)
+        return [_doc_with_id(r) for r in rows]
+
+    def insert_question(self, prompt):
+        self.db.questions.insert_one({"prompt": prompt})
+
+    def update_question(self, question_id, prompt):
+        self.db.questions.update_one({"_id": _oid(question_id)}, {"$set": {"prompt": prompt}})
+
+    def delete_question(self, question_id):
+        db = self.db
+        question_oid = _oid(question_id)
+        # Only judge+competitor pairs that answered this question need a new average
+        affected = {
+            (row["judge_id"], row["competitor_id"])
+            for row in db.answers.find(
+                {"question_id": question_oid}, {"_id": 0, "judge_id": 1, "competitor_id": 1}
+            )
+        }
+        db.answers.delete_many({"question_id": question_oid})
+        db.questions.delete_one({"_id": question_oid})
+        self._recompute_scores_for_pairs(affected)
+
+    # --- Assets ---
+
+    def get_asset(self, key):
+        return self.db.assets.find_one({"key": key}, {"_id": 0, "data": 0})
+
+    def set_asset(self, key, fields):
+        doc = {**fields, "key": key, "updated_at": datetime.utcnow()}
+        self.db.assets.replace_one({"key": key}, doc, upsert=True)
+
+    def delete_asset(self, key):
+        self.db.assets.delete_many({"key": key})
+
+    def put_asset_blobs(self, owner, content_hash, blobs):
+        for variant, (data, content_type) in blobs.items():
+            self.db.asset_blobs.update_one(
+                {"_id": f"{content_hash}:{variant}"},
+                {
+                    "$set": {
+                        "owner": owner,
+                        "hash": content_hash,
+                        "variant": variant,
+                        "content_type": content_type,
+                        "data": Binary(data),
+                    }
+                },
+                upsert=True,
+            )
+
+    def load_asset_blob(self, content_hash, variant):
+        row = self.db.asset_blobs.find_one({"_id": f"{content_hash}:{variant}"}, {"data": 1})
+        return bytes(row["data"]) if row else None
+
+    def delete_asset_blobs(self, owner, keep_hash=None):
+        query: Dict[str, Any] = {"owner": owner}
+        if keep_hash:
+            query["hash"] = {"$ne": keep_hash}
+        self.db.asset_blobs.delete_many(query)
@@ -0,0 +1,358 @@
+import time
+from datetime import datetime
+from itertools import groupby
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ASCENDING, DeleteOne, UpdateOne
+
+from storage.mongo import MongoBackend, _doc_with_id, _hide_search_keys, _oid
+
+# meta document tracking the move from `answers` rows to `answer_sheets`
+MIGRATION_ID = "answer_sheets_migration"
+# (judge, competitor) pairs moved per migration batch
+MIGRATION_BATCH_SIZE = 500
+# While the migration is unfinished, its marker is re-read at most this often
+MIGRATION_CHECK_SECONDS = 30.0
+# Sheets rewritten per bulk_write when a question is deleted
+QUESTION_DELETE_BATCH_SIZE = 500
+
+
+def _sheet_fields(answers_dict: Dict[Any, float]) -> Dict[str, Any]:
+    # Packed {question_id: value} map, its keys as an indexed array, and the mean score
+    answers = {str(question_id): value for question_id, value in answers_dict.items()}
+    return {
+        "answers": answers,
+        "question_ids": list(answers),
+        "count": len(answers),
+        "mean": sum(answers.values()) / len(answers),
+    }
+
+
+def _pair_key(row) -> Tuple[ObjectId, ObjectId]:
+    return row["judge_id"], row["competitor_id"]
+
+
+class AnswerSheetsMongoBackend(MongoBackend):
+    """
+    Mongo storage with one `answer_sheets` document per (judge, competitor) instead of one
+    `answers` document per question.
+
+    Until migrate_answer_sheets() has moved every legacy row, reads also look at `answers`
+    (a sheet wins over rows for the same pair) and writes drop the pair's legacy rows.
+    """
+
+    answers_layout = "sheets"
+
+    def __init__(self, db, transactions: Optional[bool] = None):
+        super().__init__(db, transactions)
+        self._migrated = False
+        self._migration_checked_at: Optional[float] = None
+
+    def init(self) -> Dict[str, Any]:
+        result = super().init()
+        # Outside the schema marker: the layout can be switched on for an existing database
+        self.db.answer_sheets.create_index(
+            [("judge_id", ASCENDING), ("competitor_id", ASCENDING)], unique=True
+        )
+        self.db.answer_sheets.create_index("question_ids")
+        return result
+
+    def _legacy_rows(self) -> bool:
+        # Once the migration has finished it stays finished, so stop asking; until then
+        # assume rows remain between checks (reading them too is only slower, never wrong)
+        if self._migrated:
+            return False
+        now = time.monotonic()
+        checked_at = self._migration_checked_at
+        if checked_at is None or now - checked_at >= MIGRATION_CHECK_SECONDS:
+            marker = self.db.meta.find_one({"_id": MIGRATION_ID}, {"done": 1}) or {}
+            self._migrated = bool(marker.get("done"))
+            self._migration_checked_at = now
+        return not self._migrated
+
+    # --- Writes ---
+
+    def _save_answer_docs(self, judge_oid, answers_by_comp, session=None):
+        ops = []
+        for comp_oid, answers_dict in answers_by_comp.items():
+            key = {"judge_id": judge_oid, "competitor_id": comp_oid}
+            if answers_dict:
+                ops.append(UpdateOne(key, {"$set": _sheet_fields(answers_dict)}, upsert=True))
+            else:
+                ops.append(DeleteOne(key))
+        if not ops:
+            return
+        self.db.answer_sheets.bulk_write(ops, ordered=False, session=session)
+        if self._legacy_rows():
+            self.db.answers.delete_many(
+                {"judge_id": judge_oid, "competitor_id": {"$in": list(answers_by_comp)}},
+                session=session,
+            )
+
+    def delete_judge_account(self, judge_id):
+        super().delete_judge_account(judge_id)
+        self.db.answer_sheets.delete_many({"judge_id": _oid(judge_id)})
+
+    def delete_competitor(self, competitor_id):
+        super().delete_competitor(competitor_id)
+        self.db.answer_sheets.delete_many({"competitor_id": _oid(competitor_id)})
+
+    def delete_question(self, question_id):
+        db = self.db
+        qid = str(question_id)
+        affected = set()
+        ops = []
+        missed = 0
+
+        def flush():
+            nonlocal missed
+            if ops:
+                result = db.answer_sheets.bulk_write(ops, ordered=False)
+                missed += len(ops) - result.matched_count - result.deleted_count
+                ops.clear()
+
+        # Each rewrite only applies to the answers it was computed from: a judge saving in
+        # between makes it miss, and the next pass re-reads that sheet
+        projection = {"judge_id": 1, "competitor_id": 1, "answers": 1}
+        while True:
+            for sheet in db.answer_sheets.find({"question_ids": qid}, projection):
+                affected.add(_pair_key(sheet))
+                read = {"_id": sheet["_id"], "answers": sheet["answers"]}
+                answers = {q: v for q, v in sheet["answers"].items() if q != qid}
+                if answers:
+                    ops.append(UpdateOne(read, {"$set": _sheet_fields(answers)}))
+                else:
+                    ops.append(DeleteOne(read))
+                if len(ops) >= QUESTION_DELETE_BATCH_SIZE:
+                    flush()
+            flush()
+            if not missed:
+                break
+            missed = 0
+        if self._legacy_rows():
+            question_oid = _oid(question_id)
+            affected.update(
+                _pair_key(row)
+                for row in db.answers.find(
+                    {"question_id": question_oid}, {"_id": 0, "judge_id": 1, "competitor_id": 1}
+                )
+            )
+            db.answers.delete_many({"question_id": question_oid})
+        db.questions.delete_one({"_id": _oid(question_id)})
+        self._recompute_scores_for_pairs(affected)
+
+    # --- Reads ---
+
+    def get_answers_for_judge_competitor(self, judge_id, competitor_id):
+        sheet = self.db.answer_sheets.find_one(
+            {"judge_id": _oid(judge_id), "competitor_id": _oid(competitor_id)}, {"answers": 1}
+        )
+        if sheet:
+            return dict(sheet["answers"])
+        if self._legacy_rows():
+            return super().get_answers_for_judge_competitor(judge_id, competitor_id)
+        return {}
+
+    def get_judge_with_answers(self, judge_id):
+        lookups = [("answer_sheets", "sheet_docs")]
+        if self._legacy_rows():
+            lookups.append(("answers", "answer_docs"))
+        rows = list(
+            self.db.judges.aggregate(
+                [
+                    {"$match": {"_id": _oid(judge_id)}},
+                    {"$project": _hide_search_keys()},
+                ]
+                + [
+                    {
+                        "$lookup": {
+                            "from": source,
+                            "localField": "_id",
+                            "foreignField": "judge_id",
+                            "as": target,
+                        }
+                    }
+                    for source, target in lookups
+                ]
+            )
+        )
+        if not rows:
+            return None, {}
+        judge_row = rows[0]
+        answers_by_competitor: Dict[str, Dict[str, Any]] = {}
+        for answer in judge_row.pop("answer_docs", []):
+            answers_by_competitor.setdefault(str(answer["competitor_id"]), {})[
+                str(answer["question_id"])
+            ] = answer["value"]
+        for sheet in judge_row.pop("sheet_docs"):
+            answers_by_competitor[str(sheet["competitor_id"])] = dict(sheet["answers"])
+        return _doc_with_id(judge_row), answers_by_competitor
+
+    def _iter_pairs(self) -> Iterator[Tuple[ObjectId, ObjectId, Dict[str, Any]]]:
+        """
+        (judge_oid, competitor_oid, {question_id: value}) sorted by pair, merged from
+        sheets and any legacy rows.
+        """
+        sort = [("judge_id", ASCENDING), ("competitor_id", ASCENDING)]
+        sheets = (
+            (sheet["judge_id"], sheet["competitor_id"], sheet["answers"])
+            for sheet in self.db.answer_sheets.find(
+                {}, {"_id": 0, "judge_id": 1, "competitor_id": 1, "answers": 1}
+            ).sort(sort)
+        )
+        if not self._legacy_rows():
+            yield from sheets
+            return
+        rows = (
+            (judge_oid, comp_oid, {str(row["question_id"]): row["value"] for row in group})
+            for (judge_oid, comp_oid), group in groupby(
+                self.db.answers.find(
+                    {}, {"_id": 0, "judge_id": 1, "competitor_id": 1, "question_id": 1, "value": 1}
+                ).sort(sort),
+                key=_pair_key,
+            )
+        )
+        sheet = next(sheets, None)
+        row = next(rows, None)
+        while sheet is not None or row is not None:
+            if row is None or (sheet is not None and sheet[:2] <= row[:2]):
+                if row is not None and sheet[:2] == row[:2]:
+                    row = next(rows, None)
+                yield sheet
+                sheet = next(sheets, None)
+            else:
+                yield row
+                row = next(rows, None)
+
+    def iter_answers_sorted(self) -> Iterator[Dict[str, Any]]:
+        for judge_oid, comp_oid, answers in self._iter_pairs():
+            for question_id, value in answers.items():
+                yield {
+                    "judge_id": str(judge_oid),
+                    "competitor_id": str(comp_oid),
+                    "question_id": question_id,
+                    "value": value,
+                }
+
+    def _averages_for_pairs(self, match):
+        averages = {}
+        if self._legacy_rows():
+            averages.update(super()._averages_for_pairs(match))
+        for sheet in self.db.answer_sheets.find(
+            match, {"_id": 0, "judge_id": 1, "competitor_id": 1, "mean": 1}
+        ):
+            averages[_pair_key(sheet)] = sheet["mean"]
+        return averages
+
+    def _pairs_with_answers(self, pairs):
+        answered = super()._pairs_with_answers(pairs) if self._legacy_rows() else set()
+        answered.update(
+            _pair_key(sheet)
+            for sheet in self.db.answer_sheets.find(
+                {"$or": [{"judge_id": j, "competitor_id": c} for j, c in pairs]},
+                {"_id": 0, "judge_id": 1, "competitor_id": 1},
+            )
+        )
+        return answered
+
+    def _merge_scores_from_answers(self, rebuild_id: ObjectId):
+        if self._legacy_rows():
+            super()._merge_scores_from_answers(rebuild_id)
+        # Sheets run second so they win over rows for the same pair
+        self.db.answer_sheets.aggregate(
+            [
+                {
+                    "$project": {
+                        "_id": 0,
+                        "judge_id": 1,
+                        "competitor_id": 1,
+                        "value": "$mean",
+                        "rebuild_id": {"$literal": rebuild_id},
+                    }
+                },
+                {
+                    "$merge": {
+                        "into": "scores",
+                        "on": ["judge_id", "competitor_id"],
+                        "whenMatched": "merge",
+                        "whenNotMatched": "insert",
+                    }
+                },
+            ],
+            allowDiskUse=True,
+        )
+
+    def _expected_scores(self) -> Iterator[Dict[str, Any]]:
+        # Averaged from the packed values, so a stale stored mean shows up as drift
+        for judge_oid, comp_oid, answers in self._iter_pairs():
+            if answers:
+                yield {
+                    "judge_id": judge_oid,
+                    "competitor_id": comp_oid,
+                    "value": sum(answers.values()) / len(answers),
+                }
+
+    # --- Migration ---
+
+    def migrate_answer_sheets(self, batch_size: int = MIGRATION_BATCH_SIZE) -> Dict[str, Any]:
+        """
+        Move one batch of legacy `answers` rows into sheets.
+
+        Each batch inserts sheets for up to `batch_size` pairs (never overwriting a sheet a
+        judge saved meanwhile) and then deletes those rows, so an interrupted migration just
+        resumes from whatever rows remain. Returns {"pairs", "rows", "done"}.
+        """
+        db = self.db
+        # A pair has at most one row per question, so this many rows covers batch_size pairs
+        row_limit = batch_size * max(1, db.questions.estimated_document_count())
+        heads = db.answers.find({}, {"_id": 0, "judge_id": 1, "competitor_id": 1}).sort(
+            [("judge_id", ASCENDING), ("competitor_id", ASCENDING)]
+        ).limit(row_limit)
+        pairs = list(dict.fromkeys(_pair_key(row) for row in heads))[:batch_size]
+        if not pairs:
+            db.meta.update_one(
+                {"_id": MIGRATION_ID},
+                {"$set": {"done": True, "finished_at": datetime.utcnow()}},
+                upsert=True,
+            )
+            self._migrated = True
+            return {"pairs": 0, "rows": 0, "done": True}
+
+        match = {"$or": [{"judge_id": j, "competitor_id": c} for j, c in pairs]}
+
+        def move(session):
+            rows = list(
+                db.answers.find(
+                    match,
+                    {"_id": 0, "judge_id": 1, "competitor_id": 1, "question_id": 1, "value": 1},
+                    session=session,
+                )
+            )
+            grouped: Dict[Tuple[ObjectId, ObjectId], Dict[str, Any]] = {}
+            for row in rows:
+                grouped.setdefault(_pair_key(row), {})[str(row["question_id"])] = row["value"]
+            ops = [
+                UpdateOne(
+                    {"judge_id": judge_oid, "competitor_id": comp_oid},
+                    {"$setOnInsert": _sheet_fields(answers)},
+                    upsert=True,
+                )
+                for (judge_oid, comp_oid), answers in grouped.items()
+            ]
+            if ops:
+                db.answer_sheets.bulk_write(ops, ordered=False, session=session)
+            db.answers.delete_many(match, session=session)
+            return len(rows)
+
+        moved_rows = self._run_write(move)
+        db.meta.update_one(
+            {"_id": MIGRATION_ID},
+            {
+                "$inc": {"pairs": len(pairs), "rows": moved_rows},
+                "$setOnInsert": {"started_at": datetime.utcnow()},
+                "$set": {"done": False},
+            },
+            upsert=True,
+        )
+        return {"pairs": len(pairs), "rows": moved_rows, "done": False}
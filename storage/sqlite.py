@@ -0,0 +1,867 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from storage.base import DuplicateKeyError, StorageBackend, new_id
+
+# Stored in PRAGMA user_version; bump when tables or indexes change
+SCHEMA_VERSION = 6
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS judges (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    email TEXT UNIQUE
+);
+CREATE INDEX IF NOT EXISTS judges_name_lower ON judges (lower(name));
+CREATE INDEX IF NOT EXISTS judges_email_lower ON judges (lower(email));
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL UNIQUE,
+    password_hash TEXT,
+    role TEXT NOT NULL,
+    judge_id TEXT UNIQUE
+);
+CREATE TABLE IF NOT EXISTS competitors (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    notes TEXT
+);
+DROP INDEX IF EXISTS competitors_name_lower;
+CREATE INDEX IF NOT EXISTS competitors_name_lower_id ON competitors (lower(name), id);
+CREATE TABLE IF NOT EXISTS questions (
+    id TEXT PRIMARY KEY,
+    prompt TEXT
+);
+CREATE TABLE IF NOT EXISTS answers (
+    judge_id TEXT NOT NULL,
+    competitor_id TEXT NOT NULL,
+    question_id TEXT NOT NULL,
+    value NUMERIC,
+    PRIMARY KEY (judge_id, competitor_id, question_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS answers_question ON answers (question_id);
+CREATE TABLE IF NOT EXISTS scores (
+    judge_id TEXT NOT NULL,
+    competitor_id TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (judge_id, competitor_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS scores_competitor ON scores (competitor_id, value);
+CREATE TABLE IF NOT EXISTS assets (
+    key TEXT PRIMARY KEY,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS asset_blobs (
+    id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    content_type TEXT,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS asset_blobs_owner ON asset_blobs (owner, hash);
+CREATE TABLE IF NOT EXISTS submissions (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    judge_id TEXT NOT NULL,
+    competitor_id TEXT NOT NULL,
+    answers TEXT NOT NULL,
+    score REAL,
+    at TEXT NOT NULL,
+    key TEXT
+);
+CREATE INDEX IF NOT EXISTS submissions_at ON submissions (at);
+CREATE INDEX IF NOT EXISTS submissions_judge ON submissions (judge_id, at);
+CREATE INDEX IF NOT EXISTS submissions_competitor ON submissions (competitor_id, at);
+CREATE TABLE IF NOT EXISTS snapshots (
+    id TEXT PRIMARY KEY,
+    at TEXT NOT NULL,
+    pairs INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_at ON snapshots (at);
+CREATE TABLE IF NOT EXISTS snapshot_scores (
+    snapshot_id TEXT NOT NULL,
+    judge_id TEXT NOT NULL,
+    competitor_id TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (snapshot_id, judge_id, competitor_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS versions (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# Answers streamed per keyset page by iter_answers_sorted
+ANSWER_PAGE_SIZE = 5000
+
+# Leaderboard aggregated in SQL on the scores (competitor_id, value) index
+LEADERBOARD_SQL = """
+SELECT c.id, c.name, COUNT(s.value), COALESCE(SUM(s.value), 0), COALESCE(AVG(s.value), 0) AS avg
+FROM competitors c LEFT JOIN scores s ON s.competitor_id = c.id
+GROUP BY c.id
+ORDER BY avg DESC, c.id
+"""
+
+
+def _prefix_bounds(prefix: str):
+    # Range form of a prefix match, so the lower(...) expression indexes are used
+    return prefix, prefix + "\U0010ffff"
+
+
+def _ts(value: datetime) -> str:
+    # Fixed-width ISO text, so timestamps compare correctly as strings
+    return value.isoformat(timespec="microseconds")
+
+
+def _row(cursor, values) -> Dict[str, Any]:
+    return {col[0]: value for col, value in zip(cursor.description, values) if value is not None}
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Embedded single-file storage for offline venues. One connection is shared by every
+    session; an RLock serializes access, which is plenty for local query times.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.RLock()
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+
+    def _query(self, sql: str, params=()) -> List[Dict[str, Any]]:
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            return [_row(cursor, values) for values in cursor.fetchall()]
+
+    @staticmethod
+    def _log_score_changes(conn, select_sql: str, params=()):
+        """
+        Log score changes made outside a judge's save: `select_sql` yields (judge_id,
+        competitor_id, score), score being NULL where the score was removed.
+        """
+        conn.execute(
+            "INSERT INTO submissions (judge_id, competitor_id, answers, score, at) "
+            f"SELECT judge_id, competitor_id, '{{}}', score, ? FROM ({select_sql})",
+            (_ts(datetime.utcnow()), *params),
+        )
+
+    def _write(self, callback):
+        # One transaction per call; unique violations surface like Mongo's
+        with self._lock:
+            try:
+                with self._conn:
+                    return callback(self._conn)
+            except sqlite3.IntegrityError as exc:
+                raise DuplicateKeyError(str(exc)) from exc
+
+    # --- Lifecycle / versions ---
+
+    def init(self) -> Dict[str, Any]:
+        with self._lock:
+            stored_version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            migrated = stored_version < SCHEMA_VERSION
+            if migrated:
+                self._conn.executescript(SCHEMA)
+                columns = {row[1] for row in self._conn.execute("PRAGMA table_info(submissions)")}
+                if "key" not in columns:
+                    # Idempotency keys arrived in schema 5, after the submissions table
+                    self._conn.execute("ALTER TABLE submissions ADD COLUMN key TEXT")
+                self._conn.execute(
+                    "CREATE UNIQUE INDEX IF NOT EXISTS submissions_key ON submissions (key)"
+                )
+                if stored_version < 6:
+                    # Scores from before the log was complete: history starts from here
+                    self.snapshot_scores()
+                self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        return {"schema_version": max(stored_version, SCHEMA_VERSION), "migrated": migrated}
+
+    def create_default_admin_if_missing(self, password_hash: str):
+        def write(conn):
+            if not conn.execute("SELECT 1 FROM users WHERE role = 'admin' LIMIT 1").fetchone():
+                conn.execute(
+                    "INSERT INTO users (id, username, password_hash, role) VALUES (?, ?, ?, ?)",
+                    (new_id(), "admin", password_hash, "admin"),
+                )
+
+        self._write(write)
+
+    def get_versions(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT name, value FROM versions").fetchall())
+
+    def bump_versions(self, inc: Dict[str, int]) -> Dict[str, int]:
+        def write(conn):
+            conn.executemany(
+                "INSERT INTO versions (name, value) VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                list(inc.items()),
+            )
+            return dict(conn.execute("SELECT name, value FROM versions").fetchall())
+
+        return self._write(write)
+
+    # --- Judges / users ---
+
+    def get_judges(self):
+        return self._query("SELECT id, name, email FROM judges ORDER BY id")
+
+    def get_judges_with_user(self, skip=0, limit=None, fields=None):
+        columns = ["j.id"] + [
+            f"j.{field}" for field in (fields or ["name", "email"]) if field in ("name", "email")
+        ]
+        rows = self._query(
+            f"SELECT {', '.join(columns)}, u.username FROM judges j "
+            "LEFT JOIN users u ON u.judge_id = j.id AND u.role = 'judge' "
+            "ORDER BY j.id LIMIT ? OFFSET ?",
+            (limit or -1, skip),
+        )
+        for row in rows:
+            row.setdefault("username", None)
+        return rows
+
+    def list_judges_page(self, after_id=None, limit=25, prefix=None):
+        where, params = ["j.id > ?"], [str(after_id or "")]
+        if prefix:
+            low, high = _prefix_bounds(prefix)
+            where.append(
+                "((lower(j.name) >= ? AND lower(j.name) < ?) "
+                "OR (lower(j.email) >= ? AND lower(j.email) < ?))"
+            )
+            params += [low, high, low, high]
+        rows = self._query(
+            "SELECT j.id, j.name, j.email, u.username FROM judges j "
+            "LEFT JOIN users u ON u.judge_id = j.id AND u.role = 'judge' "
+            f"WHERE {' AND '.join(where)} ORDER BY j.id LIMIT ?",
+            (*params, limit),
+        )
+        for row in rows:
+            row.setdefault("username", None)
+        return rows
+
+    def get_judge_by_id(self, judge_id):
+        rows = self._query("SELECT id, name, email FROM judges WHERE id = ?", (str(judge_id),))
+        return rows[0] if rows else None
+
+    def insert_judge(self, name, email):
+        self._write(
+            lambda conn: conn.execute(
+                "INSERT INTO judges (id, name, email) VALUES (?, ?, ?)", (new_id(), name, email)
+            )
+        )
+
+    def create_judge_account(self, name, email, username, password_hash):
+        judge_id = new_id()
+
+        def write(conn):
+            conn.execute(
+                "INSERT INTO judges (id, name, email) VALUES (?, ?, ?)", (judge_id, name, email)
+            )
+            conn.execute(
+                "INSERT INTO users (id, username, password_hash, role, judge_id) "
+                "VALUES (?, ?, ?, 'judge', ?)",
+                (new_id(), username, password_hash, judge_id),
+            )
+
+        self._write(write)
+        return judge_id
+
+    def update_judge_account(self, judge_id, name, email, username, password_hash=None):
+        judge_id = str(judge_id)
+
+        def write(conn):
+            conn.execute(
+                "UPDATE judges SET name = ?, email = ? WHERE id = ?", (name, email, judge_id)
+            )
+            updated = conn.execute(
+                "UPDATE users SET username = ?, password_hash = COALESCE(?, password_hash) "
+                "WHERE judge_id = ? AND role = 'judge'",
+                (username, password_hash or None, judge_id),
+            )
+            if updated.rowcount == 0:
+                conn.execute(
+                    "INSERT INTO users (id, username, password_hash, role, judge_id) "
+                    "VALUES (?, ?, ?, 'judge', ?)",
+                    (new_id(), username, password_hash or None, judge_id),
+                )
+
+        self._write(write)
+
+    def delete_judge_account(self, judge_id):
+        judge_id = str(judge_id)
+
+        def write(conn):
+            self._log_score_changes(
+                conn,
+                "SELECT judge_id, competitor_id, NULL AS score FROM scores WHERE judge_id = ?",
+                (judge_id,),
+            )
+            for table, column in (
+                ("scores", "judge_id"),
+                ("answers", "judge_id"),
+                ("users", "judge_id"),
+                ("judges", "id"),
+            ):
+                conn.execute(f"DELETE FROM {table} WHERE {column} = ?", (judge_id,))
+
+        self._write(write)
+
+    def get_user_by_username(self, username):
+        rows = self._query(
+            "SELECT id, username, password_hash, role, judge_id FROM users WHERE username = ?",
+            (username,),
+        )
+        return rows[0] if rows else None
+
+    # --- Competitors ---
+
+    def get_competitors(self):
+        rows = self._query("SELECT id, name, notes FROM competitors ORDER BY id")
+        for row in rows:
+            row.setdefault("notes", "")
+        return rows
+
+    def list_competitors_page(self, after_id=None, limit=25, prefix=None):
+        where, params = ["id > ?"], [str(after_id or "")]
+        if prefix:
+            where.append("lower(name) >= ? AND lower(name) < ?")
+            params += list(_prefix_bounds(prefix))
+        rows = self._query(
+            f"SELECT id, name, notes FROM competitors WHERE {' AND '.join(where)} "
+            "ORDER BY id LIMIT ?",
+            (*params, limit),
+        )
+        for row in rows:
+            row.setdefault("notes", "")
+        return rows
+
+    def search_competitors_for_judge(self, judge_id, prefix=None, limit=20):
+        where, params = "", [str(judge_id)]
+        if prefix:
+            where = "WHERE lower(c.name) >= ? AND lower(c.name) < ? "
+            params += list(_prefix_bounds(prefix))
+        rows = self._query(
+            "SELECT c.id, c.name, EXISTS (SELECT 1 FROM scores s "
+            "WHERE s.judge_id = ? AND s.competitor_id = c.id) AS scored "
+            f"FROM competitors c {where}ORDER BY lower(c.name), c.id LIMIT ?",
+            (*params, limit),
+        )
+        for row in rows:
+            row["scored"] = bool(row["scored"])
+        return rows
+
+    def insert_competitor(self, name, notes=""):
+        self._write(
+            lambda conn: conn.execute(
+                "INSERT INTO competitors (id, name, notes) VALUES (?, ?, ?)",
+                (new_id(), name, notes),
+            )
+        )
+
+    def update_competitor(self, competitor_id, name, notes=None):
+        self._write(
+            lambda conn: conn.execute(
+                "UPDATE competitors SET name = ?, notes = COALESCE(?, notes) WHERE id = ?",
+                (name, notes, str(competitor_id)),
+            )
+        )
+
+    def delete_competitor(self, competitor_id):
+        competitor_id = str(competitor_id)
+
+        def write(conn):
+            self._log_score_changes(
+                conn,
+                "SELECT judge_id, competitor_id, NULL AS score FROM scores "
+                "WHERE competitor_id = ?",
+                (competitor_id,),
+            )
+            for table, column in (
+                ("scores", "competitor_id"),
+                ("answers", "competitor_id"),
+                ("competitors", "id"),
+            ):
+                conn.execute(f"DELETE FROM {table} WHERE {column} = ?", (competitor_id,))
+
+        self._write(write)
+
+    # --- Scores / answers ---
+
+    def replace_scores_for_judge(self, judge_id, items, batch_size):
+        judge_id = str(judge_id)
+        written = 0
+        failed: List[Dict[str, Any]] = []
+
+        def write(conn):
+            nonlocal written
+            known = {row[0] for row in conn.execute("SELECT id FROM competitors")}
+            previous = {
+                row[0]
+                for row in conn.execute(
+                    "SELECT competitor_id FROM scores WHERE judge_id = ?", (judge_id,)
+                )
+            }
+            conn.execute("DELETE FROM scores WHERE judge_id = ?", (judge_id,))
+            seen = set()
+            batch: List[tuple] = []
+
+            def flush():
+                nonlocal written
+                if batch:
+                    conn.executemany(
+                        "INSERT INTO scores (judge_id, competitor_id, value) VALUES (?, ?, ?)",
+                        batch,
+                    )
+                    written += len(batch)
+                    batch.clear()
+
+            for competitor_id, value in items:
+                try:
+                    numeric = float(value)
+                except (TypeError, ValueError) as exc:
+                    failed.append({"competitor_id": competitor_id, "error": str(exc)})
+                    continue
+                if str(competitor_id) not in known:
+                    failed.append({"competitor_id": competitor_id, "error": "Unknown competitor"})
+                    continue
+                # The judge's old rows are gone, so only a repeat within this load can clash
+                if str(competitor_id) in seen:
+                    failed.append({"competitor_id": competitor_id, "error": "Duplicate competitor"})
+                    continue
+                seen.add(str(competitor_id))
+                batch.append((judge_id, str(competitor_id), numeric))
+                if len(batch) >= batch_size:
+                    flush()
+            flush()
+            self._log_score_changes(
+                conn,
+                "SELECT judge_id, competitor_id, value AS score FROM scores WHERE judge_id = ?",
+                (judge_id,),
+            )
+            cleared = sorted(previous - seen)
+            if cleared:
+                placeholders = ", ".join("?" for _ in cleared)
+                self._log_score_changes(
+                    conn,
+                    "SELECT ? AS judge_id, id AS competitor_id, NULL AS score FROM competitors "
+                    f"WHERE id IN ({placeholders})",
+                    (judge_id, *cleared),
+                )
+
+        self._write(write)
+        return {"written": written, "failed": failed}
+
+    def save_answers_for_judge(self, judge_id, competitor_id, answers_dict, use_transaction=None):
+        self.save_answers_bulk(judge_id, {competitor_id: answers_dict}, use_transaction)
+
+    def save_answers_bulk(self, judge_id, answers_by_competitor, use_transaction=None, keys=None):
+        keys = {str(competitor_id): key for competitor_id, key in (keys or {}).items()}
+
+        def write(conn):
+            # Stamped under the lock, so a snapshot never lands between the stamp and the write
+            at = _ts(datetime.utcnow())
+            applied = set()
+            if keys:
+                # Submissions already logged under their key were applied by an earlier attempt
+                placeholders = ", ".join("?" for _ in keys)
+                applied = {
+                    row[0]
+                    for row in conn.execute(
+                        f"SELECT key FROM submissions WHERE key IN ({placeholders})",
+                        list(keys.values()),
+                    )
+                }
+            for competitor_id, answers_dict in answers_by_competitor.items():
+                key = keys.get(str(competitor_id))
+                if key in applied:
+                    continue
+                self._write_submission(conn, judge_id, competitor_id, answers_dict, at, key)
+
+        # Always transactional; use_transaction only matters for Mongo
+        self._write(write)
+
+    @staticmethod
+    def _write_submission(conn, judge_id, competitor_id, answers_dict, at, submission_key=None):
+        key = (str(judge_id), str(competitor_id))
+        question_ids = [str(question_id) for question_id in answers_dict]
+        score = sum(answers_dict.values()) / len(answers_dict) if answers_dict else None
+        # Append-only history next to the current state
+        conn.execute(
+            "INSERT INTO submissions (judge_id, competitor_id, answers, score, at, key) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                *key,
+                json.dumps(dict(zip(question_ids, answers_dict.values()))),
+                score,
+                at,
+                submission_key,
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO answers (judge_id, competitor_id, question_id, value) "
+            "VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (judge_id, competitor_id, question_id) "
+            "DO UPDATE SET value = excluded.value",
+            [
+                (*key, question_id, value)
+                for question_id, value in zip(question_ids, answers_dict.values())
+            ],
+        )
+        placeholders = ", ".join("?" for _ in question_ids)
+        conn.execute(
+            "DELETE FROM answers WHERE judge_id = ? AND competitor_id = ?"
+            + (f" AND question_id NOT IN ({placeholders})" if question_ids else ""),
+            (*key, *question_ids),
+        )
+        if answers_dict:
+            conn.execute(
+                "INSERT INTO scores (judge_id, competitor_id, value) VALUES (?, ?, ?) "
+                "ON CONFLICT (judge_id, competitor_id) DO UPDATE SET value = excluded.value",
+                (*key, score),
+            )
+        else:
+            conn.execute(
+                "DELETE FROM scores WHERE judge_id = ? AND competitor_id = ?", key
+            )
+
+    def get_scores_for_judge(self, judge_id):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT competitor_id, value FROM scores WHERE judge_id = ?", (str(judge_id),)
+            ).fetchall()
+        return dict(rows)
+
+    def get_leaderboard(self, limit=None):
+        with self._lock:
+            rows = self._conn.execute(LEADERBOARD_SQL + " LIMIT ?", (limit or -1,)).fetchall()
+        return [
+            {
+                "competitor_id": competitor_id,
+                "competitor_name": name,
+                "name": name,
+                "num_scores": count,
+                "total_score": total,
+                "avg_score": avg,
+            }
+            for competitor_id, name, count, total, avg in rows
+        ]
+
+    def get_answers_for_judge_competitor(self, judge_id, competitor_id):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT question_id, value FROM answers WHERE judge_id = ? AND competitor_id = ?",
+                (str(judge_id), str(competitor_id)),
+            ).fetchall()
+        return dict(rows)
+
+    def get_judge_with_answers(self, judge_id):
+        judge = self.get_judge_by_id(judge_id)
+        if not judge:
+            return None, {}
+        answers_by_competitor: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT competitor_id, question_id, value FROM answers WHERE judge_id = ?",
+                (judge["id"],),
+            ).fetchall()
+        for competitor_id, question_id, value in rows:
+            answers_by_competitor.setdefault(competitor_id, {})[question_id] = value
+        return judge, answers_by_competitor
+
+    def iter_answers_sorted(self) -> Iterator[Dict[str, Any]]:
+        # Keyset pages on the primary key, so the lock is never held while the caller works
+        last = ("", "", "")
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT judge_id, competitor_id, question_id, value FROM answers "
+                    "WHERE (judge_id, competitor_id, question_id) > (?, ?, ?) "
+                    "ORDER BY judge_id, competitor_id, question_id LIMIT ?",
+                    (*last, ANSWER_PAGE_SIZE),
+                ).fetchall()
+            for judge_id, competitor_id, question_id, value in rows:
+                yield {
+                    "judge_id": judge_id,
+                    "competitor_id": competitor_id,
+                    "question_id": question_id,
+                    "value": value,
+                }
+            if len(rows) < ANSWER_PAGE_SIZE:
+                return
+            last = rows[-1][:3]
+
+    def rebuild_scores_from_answers(self):
+        def write(conn):
+            removed = conn.execute(
+                "DELETE FROM scores WHERE NOT EXISTS (SELECT 1 FROM answers a "
+                "WHERE a.judge_id = scores.judge_id AND a.competitor_id = scores.competitor_id)"
+            ).rowcount
+            conn.execute(
+                "INSERT INTO scores (judge_id, competitor_id, value) "
+                "SELECT judge_id, competitor_id, AVG(value) FROM answers "
+                "GROUP BY judge_id, competitor_id "
+                "ON CONFLICT (judge_id, competitor_id) DO UPDATE SET value = excluded.value"
+            )
+            count = conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+            return {"scores": count, "removed": removed}
+
+        result = self._write(write)
+        # Any score may have moved, so history continues from a fresh snapshot
+        self.snapshot_scores()
+        return result
+
+    def verify_scores(self, tolerance=1e-6):
+        # The leaderboard is computed on read here, so only scores vs answers can drift
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                WITH expected AS (
+                    SELECT judge_id, competitor_id, AVG(value) AS value FROM answers
+                    GROUP BY judge_id, competitor_id
+                )
+                SELECT e.judge_id, e.competitor_id, e.value, s.value FROM expected e
+                LEFT JOIN scores s USING (judge_id, competitor_id)
+                WHERE s.value IS NULL OR ABS(e.value - s.value) > ?
+                UNION ALL
+                SELECT s.judge_id, s.competitor_id, NULL, s.value FROM scores s
+                LEFT JOIN expected e USING (judge_id, competitor_id)
+                WHERE e.value IS NULL
+                ORDER BY 1, 2
+                """,
+                (tolerance,),
+            ).fetchall()
+        drift = []
+        for judge_id, competitor_id, expected, actual in rows:
+            if actual is None:
+                kind = "missing_score"
+            elif expected is None:
+                kind = "orphan_score"
+            else:
+                kind = "value_mismatch"
+            drift.append(
+                {
+                    "kind": kind,
+                    "judge_id": judge_id,
+                    "competitor_id": competitor_id,
+                    "expected": expected,
+                    "actual": actual,
+                }
+            )
+        return drift
+
+    # --- Submission history ---
+
+    def get_submissions(
+        self, since=None, until=None, judge_id=None, competitor_id=None, limit=100
+    ):
+        where, params = [], []
+        for clause, value in (
+            ("at > ?", _ts(since) if since else None),
+            ("at <= ?", _ts(until) if until else None),
+            ("judge_id = ?", str(judge_id) if judge_id else None),
+            ("competitor_id = ?", str(competitor_id) if competitor_id else None),
+        ):
+            if value is not None:
+                where.append(clause)
+                params.append(value)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, judge_id, competitor_id, answers, score, at, key FROM submissions "
+                + (f"WHERE {' AND '.join(where)} " if where else "")
+                + "ORDER BY at DESC, seq DESC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        return [
+            {
+                "id": str(seq),
+                "judge_id": judge,
+                "competitor_id": competitor,
+                "answers": json.loads(answers),
+                "score": score,
+                "at": datetime.fromisoformat(at),
+                **({"key": key} if key else {}),
+            }
+            for seq, judge, competitor, answers, score, at, key in rows
+        ]
+
+    def iter_submission_scores(self, after, until):
+        last_seq = 0
+        while True:
+            # Keyset pages on seq so the lock is not held while the caller replays
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT seq, judge_id, competitor_id, score FROM submissions "
+                    "WHERE at > ? AND at <= ? AND seq > ? ORDER BY seq LIMIT ?",
+                    (_ts(after) if after else "", _ts(until), last_seq, ANSWER_PAGE_SIZE),
+                ).fetchall()
+            if not rows:
+                return
+            for _, judge_id, competitor_id, score in rows:
+                yield judge_id, competitor_id, score
+            last_seq = rows[-1][0]
+
+    def latest_snapshot(self, at):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, at, pairs FROM snapshots WHERE at <= ? ORDER BY at DESC LIMIT 1",
+                (_ts(at),),
+            ).fetchone()
+        if not row:
+            return None
+        return {"id": row[0], "at": datetime.fromisoformat(row[1]), "pairs": row[2]}
+
+    def iter_snapshot_scores(self, snapshot_id):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT judge_id, competitor_id, value FROM snapshot_scores WHERE snapshot_id = ?",
+                (str(snapshot_id),),
+            ).fetchall()
+        return iter(rows)
+
+    def insert_snapshot(self, at, scores):
+        snapshot_id = new_id()
+
+        def write(conn):
+            conn.execute(
+                "INSERT INTO snapshots (id, at, pairs) VALUES (?, ?, ?)",
+                (snapshot_id, _ts(at), len(scores)),
+            )
+            conn.executemany(
+                "INSERT INTO snapshot_scores (snapshot_id, judge_id, competitor_id, value) "
+                "VALUES (?, ?, ?, ?)",
+                [(snapshot_id, j, c, value) for (j, c), value in scores.items()],
+            )
+
+        self._write(write)
+        return snapshot_id
+
+    def snapshot_scores(self):
+        snapshot_id = new_id()
+
+        def write(conn):
+            conn.execute(
+                "INSERT INTO snapshots (id, at, pairs) "
+                "SELECT ?, ?, COUNT(*) FROM scores",
+                (snapshot_id, _ts(datetime.utcnow())),
+            )
+            conn.execute(
+                "INSERT INTO snapshot_scores (snapshot_id, judge_id, competitor_id, value) "
+                "SELECT ?, judge_id, competitor_id, value FROM scores",
+                (snapshot_id,),
+            )
+
+        self._write(write)
+        return snapshot_id
+
+    # --- Questions ---
+
+    def get_questions(self):
+        return self._query("SELECT id, prompt FROM questions ORDER BY id")
+
+    def list_questions_page(self, after_id=None, limit=25):
+        return self._query(
+            "SELECT id, prompt FROM questions WHERE id > ? ORDER BY id LIMIT ?",
+            (str(after_id or ""), limit),
+        )
+
+    def insert_question(self, prompt):
+        self._write(
+            lambda conn: conn.execute(
+                "INSERT INTO questions (id, prompt) VALUES (?, ?)", (new_id(), prompt)
+            )
+        )
+
+    def update_question(self, question_id, prompt):
+        self._write(
+            lambda conn: conn.execute(
+                "UPDATE questions SET prompt = ? WHERE id = ?", (prompt, str(question_id))
+            )
+        )
+
+    def delete_question(self, question_id):
+        question_id = str(question_id)
+
+        def write(conn):
+            # Re-average only the pairs that answered this question
+            conn.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS affected_pairs "
+                "(judge_id TEXT, competitor_id TEXT, PRIMARY KEY (judge_id, competitor_id))"
+            )
+            conn.execute("DELETE FROM affected_pairs")
+            conn.execute(
+                "INSERT INTO affected_pairs SELECT judge_id, competitor_id FROM answers "
+                "WHERE question_id = ?",
+                (question_id,),
+            )
+            conn.execute("DELETE FROM answers WHERE question_id = ?", (question_id,))
+            conn.execute("DELETE FROM questions WHERE id = ?", (question_id,))
+            conn.execute(
+                "DELETE FROM scores WHERE (judge_id, competitor_id) IN "
+                "(SELECT judge_id, competitor_id FROM affected_pairs)"
+            )
+            conn.execute(
+                "INSERT INTO scores (judge_id, competitor_id, value) "
+                "SELECT a.judge_id, a.competitor_id, AVG(a.value) FROM answers a "
+                "JOIN affected_pairs p USING (judge_id, competitor_id) "
+                "GROUP BY a.judge_id, a.competitor_id"
+            )
+            self._log_score_changes(
+                conn,
+                "SELECT p.judge_id, p.competitor_id, s.value AS score FROM affected_pairs p "
+                "LEFT JOIN scores s USING (judge_id, competitor_id)",
+            )
+
+        self._write(write)
+
+    # --- Assets ---
+
+    def get_asset(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT doc FROM assets WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_asset(self, key, fields):
+        doc = {**fields, "key": key, "updated_at": datetime.utcnow().isoformat()}
+        self._write(
+            lambda conn: conn.execute(
+                "INSERT INTO assets (key, doc) VALUES (?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET doc = excluded.doc",
+                (key, json.dumps(doc)),
+            )
+        )
+
+    def delete_asset(self, key):
+        self._write(lambda conn: conn.execute("DELETE FROM assets WHERE key = ?", (key,)))
+
+    def put_asset_blobs(self, owner, content_hash, blobs):
+        self._write(
+            lambda conn: conn.executemany(
+                "INSERT OR REPLACE INTO asset_blobs (id, owner, hash, variant, content_type, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (f"{content_hash}:{variant}", owner, content_hash, variant, ctype, data)
+                    for variant, (data, ctype) in blobs.items()
+                ],
+            )
+        )
+
+    def load_asset_blob(self, content_hash, variant):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM asset_blobs WHERE id = ?", (f"{content_hash}:{variant}",)
+            ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def delete_asset_blobs(self, owner, keep_hash=None):
+        self._write(
+            lambda conn: conn.execute(
+                "DELETE FROM asset_blobs WHERE owner = ? AND hash IS NOT ?", (owner, keep_hash)
+            )
+        )
@@ -0,0 +1,319 @@
+"""
+Write-behind queue for judges' saves.
+
+A save is committed to a local SQLite file and acknowledged straight away; one worker
+thread per process drains the file into storage in batches, backing off while the
+database is slow or unreachable. A worker claims its batch (state 'sending' under a
+claim id and lease) in a single statement before sending, so processes sharing the file
+send different rows; a claim whose worker died is taken over once its lease runs out.
+Each queued submission also carries an idempotency key stored with it in the
+submissions log, so a resend of a write that did land is skipped rather than applied
+twice.
+"""
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import streamlit as st
+from pymongo.errors import (
+    BulkWriteError,
+    ConnectionFailure,
+    DuplicateKeyError,
+    ExecutionTimeout,
+    PyMongoError,
+    WTimeoutError,
+)
+
+from db import get_submission_queue_path, save_answers_bulk, save_answers_for_judge
+from storage.base import new_id
+
+# Queued submissions sent to storage per batch
+QUEUE_BATCH_SIZE = 50
+# Backoff after a failed batch doubles from the base up to the cap
+RETRY_BASE_SECONDS = 1.0
+RETRY_MAX_SECONDS = 60.0
+# A claimed batch not finished within this long is taken over by another worker
+LEASE_SECONDS = 120.0
+# How long the worker sleeps with nothing queued (saves wake it early)
+IDLE_SECONDS = 30.0
+# Confirmed and failed entries stay visible to judges this long before being pruned
+DONE_RETENTION_SECONDS = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS queued_submissions (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    judge_id TEXT NOT NULL,
+    competitor_id TEXT NOT NULL,
+    answers TEXT NOT NULL,
+    queued_at REAL NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    done_at REAL,
+    claim TEXT,
+    lease_until REAL
+);
+CREATE INDEX IF NOT EXISTS queued_submissions_state ON queued_submissions (state, seq);
+CREATE INDEX IF NOT EXISTS queued_submissions_pair
+    ON queued_submissions (judge_id, competitor_id, seq);
+"""
+# Columns added after the first release of the queue file
+ADDED_COLUMNS = {"claim": "TEXT", "lease_until": "REAL"}
+
+# Oldest sendable rows: pending, or claimed by a worker whose lease ran out. A row waits
+# while an older save for its pair is still being sent, so saves land in order.
+CLAIM_SQL = """
+UPDATE queued_submissions SET state = 'sending', claim = ?, lease_until = ?
+WHERE seq IN (
+    SELECT seq FROM queued_submissions q
+    WHERE (state = 'pending' OR (state = 'sending' AND lease_until < ?))
+    AND NOT EXISTS (
+        SELECT 1 FROM queued_submissions o
+        WHERE o.judge_id = q.judge_id AND o.competitor_id = q.competitor_id
+        AND o.seq < q.seq AND o.state = 'sending' AND o.lease_until >= ?
+    )
+    ORDER BY seq LIMIT ?
+)
+"""
+
+
+def _key_clash(exc: Exception) -> bool:
+    # Only a duplicate on the submissions log's key: another send of the same save got
+    # there first, and resending skips whatever it logged
+    if isinstance(exc, BulkWriteError):
+        errors = exc.details.get("writeErrors") or []
+    elif isinstance(exc, DuplicateKeyError):
+        errors = [exc.details or {"errmsg": str(exc)}]
+    else:
+        return False
+    return bool(errors) and all(
+        error.get("keyPattern") == {"key": 1}
+        or any(name in error.get("errmsg", "") for name in ("key_1 ", "submissions.key"))
+        for error in errors
+    )
+
+
+def _is_transient(exc: Exception) -> bool:
+    # Worth retrying as-is: the database was slow, unreachable or mid-failover
+    transient_types = (ConnectionFailure, ExecutionTimeout, WTimeoutError, sqlite3.OperationalError)
+    if isinstance(exc, transient_types):
+        return True
+    if isinstance(exc, PyMongoError):
+        return exc.has_error_label("TransientTransactionError") or exc.has_error_label(
+            "RetryableWriteError"
+        )
+    return False
+
+
+class SubmissionQueue:
+    """Durable local queue of {competitor_id: answers} saves plus the worker draining it."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        # A judge's save is acknowledged once it is on disk, so sync every commit
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(queued_submissions)")}
+        for column, kind in ADDED_COLUMNS.items():
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE queued_submissions ADD COLUMN {column} {kind}")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS queued_submissions_claim ON queued_submissions (claim)"
+        )
+        self._conn.commit()
+        self.last_error: Optional[str] = None
+        threading.Thread(target=self._run, name="submission-queue", daemon=True).start()
+
+    def _write(self, sql: str, rows: List[tuple]):
+        with self._lock, self._conn:
+            self._conn.executemany(sql, rows)
+
+    def enqueue(self, judge_id: Any, answers_by_competitor: Dict[Any, Dict[Any, float]]):
+        """Persist the save locally and wake the worker; returns {competitor_id: key}."""
+        now = time.time()
+        keys = {str(competitor_id): new_id() for competitor_id in answers_by_competitor}
+        self._write(
+            "INSERT INTO queued_submissions (key, judge_id, competitor_id, answers, queued_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [
+                (
+                    keys[str(competitor_id)],
+                    str(judge_id),
+                    str(competitor_id),
+                    json.dumps({str(q): value for q, value in answers.items()}),
+                    now,
+                )
+                for competitor_id, answers in answers_by_competitor.items()
+            ],
+        )
+        self._wake.set()
+        return keys
+
+    def status_for_judge(self, judge_id: Any) -> Dict[str, Dict[str, Any]]:
+        """
+        Latest queued save per competitor for this judge:
+        {competitor_id: {"state", "answers", "attempts", "error"}}, state being
+        pending (including being sent), confirmed or failed.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT competitor_id, CASE state WHEN 'sending' THEN 'pending' ELSE state END, "
+                "answers, attempts, last_error "
+                "FROM queued_submissions q WHERE judge_id = ? AND seq = ("
+                "SELECT MAX(seq) FROM queued_submissions "
+                "WHERE judge_id = q.judge_id AND competitor_id = q.competitor_id)",
+                (str(judge_id),),
+            ).fetchall()
+        return {
+            competitor_id: {
+                "state": state,
+                "answers": json.loads(answers),
+                "attempts": attempts,
+                "error": error,
+            }
+            for competitor_id, state, answers, attempts, error in rows
+        }
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM queued_submissions WHERE state IN ('pending', 'sending')"
+            ).fetchone()[0]
+
+    # --- Worker ---
+
+    def _run(self):
+        failures = 0
+        while True:
+            self._wake.clear()
+            try:
+                sent = self.drain_batch()
+            except Exception as exc:
+                # Transient: keep everything queued and back off (new saves don't cut it short)
+                failures += 1
+                self.last_error = str(exc)
+                time.sleep(min(RETRY_BASE_SECONDS * 2 ** (failures - 1), RETRY_MAX_SECONDS))
+                continue
+            failures = 0
+            self.last_error = None
+            if not sent:
+                self._wake.wait(IDLE_SECONDS)
+
+    def _claim(self) -> Tuple[str, List[tuple]]:
+        claim = new_id()
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                CLAIM_SQL, (claim, now + LEASE_SECONDS, now, now, QUEUE_BATCH_SIZE)
+            )
+            rows = self._conn.execute(
+                "SELECT seq, key, judge_id, competitor_id, answers FROM queued_submissions "
+                "WHERE claim = ? ORDER BY seq",
+                (claim,),
+            ).fetchall()
+        return claim, rows
+
+    def drain_batch(self) -> int:
+        """
+        Claim and send the oldest QUEUE_BATCH_SIZE pending saves, one bulk save per judge.
+        Returns how many were handled; raises (leaving them pending) on a transient failure.
+        """
+        claim, rows = self._claim()
+        if not rows:
+            self._write(
+                "DELETE FROM queued_submissions "
+                "WHERE state IN ('confirmed', 'failed') AND done_at < ?",
+                [(time.time() - DONE_RETENTION_SECONDS,)],
+            )
+            return 0
+
+        # Later saves for the same competitor replace earlier ones, as they would in storage
+        by_judge: Dict[str, Dict[str, Any]] = {}
+        for seq, key, judge_id, competitor_id, answers in rows:
+            entry = by_judge.setdefault(judge_id, {"answers": {}, "keys": {}, "seqs": []})
+            entry["answers"][competitor_id] = json.loads(answers)
+            entry["keys"][competitor_id] = key
+            entry["seqs"].append(seq)
+
+        try:
+            for judge_id, entry in by_judge.items():
+                self._send(claim, judge_id, entry)
+        finally:
+            # Whatever this claim did not settle goes back to the queue straight away
+            self._write(
+                "UPDATE queued_submissions SET state = 'pending', claim = NULL, "
+                "lease_until = NULL WHERE claim = ? AND state = 'sending'",
+                [(claim,)],
+            )
+        return len(rows)
+
+    def _send(self, claim: str, judge_id: str, entry: Dict[str, Any]):
+        try:
+            save_answers_bulk(judge_id, entry["answers"], keys=entry["keys"])
+        except Exception as exc:
+            if _key_clash(exc):
+                # Left to the release above; the resend skips the keys already logged
+                return
+            # Transient failures stay pending however long the outage lasts: the queue holds
+            # the judge's only copy of these answers until storage has them
+            transient = _is_transient(exc)
+            self._write(
+                "UPDATE queued_submissions SET attempts = attempts + 1, last_error = ?, "
+                "state = ?, done_at = ?, claim = NULL, lease_until = NULL "
+                "WHERE seq = ? AND claim = ?",
+                [
+                    (
+                        str(exc),
+                        "pending" if transient else "failed",
+                        None if transient else time.time(),
+                        seq,
+                        claim,
+                    )
+                    for seq in entry["seqs"]
+                ],
+            )
+            if transient:
+                raise
+            return
+        self._write(
+            "UPDATE queued_submissions SET attempts = attempts + 1, last_error = NULL, "
+            "state = 'confirmed', done_at = ?, claim = NULL, lease_until = NULL "
+            "WHERE seq = ? AND claim = ?",
+            [(time.time(), seq, claim) for seq in entry["seqs"]],
+        )
+
+
+@st.cache_resource
+def _queue_at(path: str) -> SubmissionQueue:
+    # One queue (and one worker) per process and file
+    return SubmissionQueue(path)
+
+
+def get_submission_queue() -> Optional[SubmissionQueue]:
+    """The process's write-behind queue, or None when SUBMISSION_QUEUE is off."""
+    path = get_submission_queue_path()
+    return _queue_at(path) if path else None
+
+
+def submit_answers(judge_id: Any, answers_by_competitor: Dict[Any, Dict[Any, float]]) -> bool:
+    """
+    Save a judge's answers through the queue when it is on (returns True: pending) or
+    straight to storage otherwise (returns False: already confirmed).
+    """
+    queue = get_submission_queue()
+    if queue is not None:
+        queue.enqueue(judge_id, answers_by_competitor)
+        return True
+    if len(answers_by_competitor) == 1:
+        (competitor_id, answers), = answers_by_competitor.items()
+        save_answers_for_judge(judge_id, competitor_id, answers)
+    else:
+        save_answers_bulk(judge_id, answers_by_competitor)
+    return False
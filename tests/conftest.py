@@ -0,0 +1,51 @@
+import os
+import sys
+import time
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+from storage import MemoryBackend  # noqa: E402
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    """A fresh MemoryBackend behind db.py, with an empty read cache."""
+    store = MemoryBackend()
+    store.init()
+    monkeypatch.setattr(db, "get_backend", lambda: store)
+    monkeypatch.setattr(db, "_read_cache", db._ReadCache(db.READ_CACHE_MAX_ENTRIES))
+    return store
+
+
+@pytest.fixture
+def event(backend):
+    """Two judges, three competitors and two questions: {"judges", "competitors", "questions"}."""
+    judges = [db.create_judge_account(name, f"{name}@example.com", name, "pw") for name in "JK"]
+    for name in ("Alpha", "Bravo", "Charlie"):
+        db.insert_competitor(name)
+    db.insert_question("Creativity")
+    db.insert_question("Execution")
+    return {
+        "judges": judges,
+        "competitors": [row["id"] for row in db.get_competitors()],
+        "questions": [row["id"] for row in db.get_questions()],
+    }
+
+
+def mark() -> datetime:
+    """A UTC time strictly between the writes made before and after the call."""
+    time.sleep(0.002)
+    at = datetime.utcnow()
+    time.sleep(0.002)
+    return at
+
+
+def board(rows):
+    """{competitor name: (num_scores, total_score)} for comparing leaderboards."""
+    return {
+        row["competitor_name"]: (row["num_scores"], round(row["total_score"], 6)) for row in rows
+    }
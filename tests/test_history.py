@@ -0,0 +1,73 @@
+from datetime import datetime
+
+import pytest
+
+import db
+from conftest import board, mark
+
+
+def _live(names):
+    # The live board as get_leaderboard_as_of will show it later: today's competitors only
+    return {name: totals for name, totals in board(db.get_leaderboard()).items() if name in names}
+
+
+def test_as_of_replays_saves_imports_reaveraging_and_deletes(event):
+    judge, other = event["judges"]
+    alpha, bravo, charlie = event["competitors"]
+    creativity, execution = event["questions"]
+    kept = {"Alpha", "Bravo"}
+    expected = {}
+
+    db.save_answers_for_judge(judge, alpha, {creativity: 4, execution: 6})
+    db.save_answers_bulk(other, {alpha: {creativity: 8}, charlie: {execution: 2}})
+    at = mark()
+    expected[at] = _live(kept)
+
+    db.replace_scores_for_judge(judge, {bravo: 3, charlie: 9})
+    at = mark()
+    expected[at] = _live(kept)
+
+    db.save_answers_for_judge(judge, alpha, {creativity: 2, execution: 10})
+    db.delete_question(creativity)
+    at = mark()
+    expected[at] = _live(kept)
+
+    db.delete_judge_account(other)
+    db.delete_competitor(charlie)
+    expected[mark()] = _live(kept)
+
+    for at, standings in expected.items():
+        assert board(db.get_leaderboard_as_of(at)) == standings
+    assert board(db.get_leaderboard_as_of(datetime.utcnow())) == board(db.get_leaderboard())
+
+
+def test_compaction_keeps_as_of_results(event):
+    judge, other = event["judges"]
+    alpha, bravo, _ = event["competitors"]
+    creativity, _ = event["questions"]
+
+    db.save_answers_for_judge(judge, alpha, {creativity: 5})
+    db.save_answers_for_judge(other, bravo, {creativity: 7})
+    middle = mark()
+    db.save_answers_for_judge(judge, alpha, {creativity: 1})
+    db.save_answers_for_judge(other, bravo, {})
+    end = mark()
+    before = {at: board(db.get_leaderboard_as_of(at)) for at in (middle, end)}
+
+    result = db.compact_submissions(until=middle)
+
+    assert result["snapshot_at"] is not None
+    assert result["pairs"] == 2
+    assert result["replayed"] == 2
+    # Already covered by the new snapshot, so there is nothing more to fold
+    assert db.compact_submissions(until=result["snapshot_at"])["snapshot_at"] is None
+    db._read_cache.clear()
+    assert {at: board(db.get_leaderboard_as_of(at)) for at in (middle, end)} == before
+    assert before[end]["Alpha"] == (1, 1.0)
+    assert before[end]["Bravo"] == (0, 0)
+
+
+def test_as_of_refuses_times_before_the_history_starts(event):
+    with pytest.raises(ValueError):
+        db.get_leaderboard_as_of(datetime(2000, 1, 1))
+    assert db.compact_submissions(until=datetime(2000, 1, 1))["snapshot_at"] is None
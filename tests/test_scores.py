@@ -0,0 +1,67 @@
+import db
+from conftest import board
+
+
+def test_replace_scores_reports_bad_rows_and_keeps_the_rest(event):
+    judge = event["judges"][0]
+    alpha, bravo, charlie = event["competitors"]
+    db.replace_scores_for_judge(judge, {alpha: 1.0, charlie: 9.0})
+
+    result = db.replace_scores_for_judge(
+        judge,
+        [
+            (alpha, 4),
+            ("not-an-id", 5),
+            ("0" * 24, 6),
+            (bravo, "lots"),
+            (bravo, 8),
+            (bravo, 2),
+        ],
+        batch_size=2,
+    )
+
+    assert result["written"] == 2
+    failed = [row["competitor_id"] for row in result["failed"]]
+    assert sorted(failed) == sorted(["not-an-id", "0" * 24, bravo, bravo])
+    assert all(row["error"] for row in result["failed"])
+    # The load replaces the judge's scores: Charlie's old score is gone
+    assert db.get_scores_for_judge(judge) == {alpha: 4.0, bravo: 8.0}
+    assert board(db.get_leaderboard()) == {
+        "Alpha": (1, 4.0),
+        "Bravo": (1, 8.0),
+        "Charlie": (0, 0),
+    }
+
+
+def test_replace_scores_leaves_other_judges_alone(event):
+    judge, other = event["judges"]
+    alpha, bravo, _ = event["competitors"]
+    db.replace_scores_for_judge(other, {alpha: 10})
+
+    result = db.replace_scores_for_judge(judge, {alpha: 2, bravo: 4})
+
+    assert result == {"written": 2, "failed": []}
+    assert db.get_scores_for_judge(other) == {alpha: 10.0}
+    assert board(db.get_leaderboard())["Alpha"] == (2, 12.0)
+
+
+def test_delete_question_reaverages_only_pairs_that_answered_it(event):
+    judge, other = event["judges"]
+    alpha, bravo, _ = event["competitors"]
+    creativity, execution = event["questions"]
+    db.save_answers_for_judge(judge, alpha, {creativity: 2, execution: 8})
+    db.save_answers_for_judge(other, alpha, {creativity: 6})
+    db.save_answers_for_judge(judge, bravo, {execution: 4})
+
+    db.delete_question(creativity)
+
+    assert db.get_scores_for_judge(judge) == {alpha: 8.0, bravo: 4.0}
+    # The only answer was to the deleted question, so the score goes with it
+    assert db.get_scores_for_judge(other) == {}
+    assert db.get_answers_for_judge_competitor(judge, alpha) == {execution: 8}
+    assert board(db.get_leaderboard()) == {
+        "Alpha": (1, 8.0),
+        "Bravo": (1, 4.0),
+        "Charlie": (0, 0),
+    }
+    assert db.verify_scores() == []
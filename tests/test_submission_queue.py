@@ -0,0 +1,126 @@
+import sqlite3
+
+import pytest
+
+import db
+import submission_queue
+from conftest import board
+from submission_queue import SubmissionQueue
+
+
+@pytest.fixture
+def queue_path(tmp_path, monkeypatch):
+    # No worker threads: the tests drive claims and sends themselves
+    monkeypatch.setattr(SubmissionQueue, "_run", lambda self: None)
+    return str(tmp_path / "queue.sqlite3")
+
+
+def _states(queue):
+    rows = queue._conn.execute("SELECT seq, state, claim FROM queued_submissions ORDER BY seq")
+    return {seq: (state, claim) for seq, state, claim in rows}
+
+
+def test_workers_claim_disjoint_batches_in_pair_order(event, queue_path, monkeypatch):
+    monkeypatch.setattr(submission_queue, "QUEUE_BATCH_SIZE", 2)
+    judge, other = event["judges"]
+    alpha, bravo, _ = event["competitors"]
+    question = event["questions"][0]
+    first, second = SubmissionQueue(queue_path), SubmissionQueue(queue_path)
+    first.enqueue(judge, {alpha: {question: 1}})
+    first.enqueue(judge, {alpha: {question: 2}})
+    first.enqueue(judge, {bravo: {question: 3}})
+    first.enqueue(other, {alpha: {question: 4}})
+
+    _, claimed_first = first._claim()
+    _, claimed_second = second._claim()
+
+    assert [row[0] for row in claimed_first] == [1, 2]
+    assert [row[0] for row in claimed_second] == [3, 4]
+    # Nothing left to claim while both leases run
+    assert first._claim()[1] == []
+
+
+def test_expired_lease_is_taken_over_and_the_late_worker_loses_its_rows(event, queue_path):
+    judge = event["judges"][0]
+    alpha = event["competitors"][0]
+    question = event["questions"][0]
+    first, second = SubmissionQueue(queue_path), SubmissionQueue(queue_path)
+    first.enqueue(judge, {alpha: {question: 5}})
+    stale_claim, rows = first._claim()
+    assert second._claim()[1] == []
+
+    first._conn.execute("UPDATE queued_submissions SET lease_until = 0")
+    first._conn.commit()
+    claim, taken = second._claim()
+    assert [row[0] for row in taken] == [rows[0][0]]
+
+    # The first worker finishing late can't settle rows that are no longer its own
+    seq, key = rows[0][0], rows[0][1]
+    entry = {"answers": {alpha: {question: 5}}, "keys": {alpha: key}, "seqs": [seq]}
+    first._send(stale_claim, judge, entry)
+    assert _states(first)[seq] == ("sending", claim)
+
+
+def test_resending_a_save_that_landed_applies_it_once(event, queue_path):
+    judge, other = event["judges"]
+    alpha = event["competitors"][0]
+    question = event["questions"][0]
+    queue = SubmissionQueue(queue_path)
+    db.save_answers_for_judge(other, alpha, {question: 10})
+    keys = queue.enqueue(judge, {alpha: {question: 4}})
+
+    # A worker sent the batch, then died before marking it confirmed
+    queue._claim()
+    db.save_answers_bulk(judge, {alpha: {question: 4}}, keys=keys)
+    queue._conn.execute(
+        "UPDATE queued_submissions SET state = 'pending', claim = NULL, lease_until = NULL"
+    )
+    queue._conn.commit()
+
+    assert queue.drain_batch() == 1
+    assert queue.status_for_judge(judge)[alpha]["state"] == "confirmed"
+    assert queue.pending_count() == 0
+    assert len(db.get_submission_history(judge_id=judge)) == 1
+    assert board(db.get_leaderboard())["Alpha"] == (2, 14.0)
+    assert db.verify_scores() == []
+
+
+def test_transient_failures_stay_pending_without_a_cap(event, queue_path, monkeypatch):
+    judge = event["judges"][0]
+    alpha = event["competitors"][0]
+    question = event["questions"][0]
+    queue = SubmissionQueue(queue_path)
+    queue.enqueue(judge, {alpha: {question: 6}})
+
+    def unavailable(*args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(submission_queue, "save_answers_bulk", unavailable)
+    for _ in range(10):
+        with pytest.raises(sqlite3.OperationalError):
+            queue.drain_batch()
+    status = queue.status_for_judge(judge)[alpha]
+    assert status["state"] == "pending"
+    assert status["attempts"] == 10
+    assert status["error"] == "database is locked"
+
+    monkeypatch.setattr(submission_queue, "save_answers_bulk", db.save_answers_bulk)
+    assert queue.drain_batch() == 1
+    assert queue.status_for_judge(judge)[alpha]["state"] == "confirmed"
+    assert db.get_scores_for_judge(judge) == {alpha: 6.0}
+
+
+def test_permanent_failures_are_marked_failed(event, queue_path, monkeypatch):
+    judge = event["judges"][0]
+    alpha = event["competitors"][0]
+    question = event["questions"][0]
+    queue = SubmissionQueue(queue_path)
+    queue.enqueue(judge, {alpha: {question: 6}})
+
+    def rejected(*args, **kwargs):
+        raise ValueError("bad answers")
+
+    monkeypatch.setattr(submission_queue, "save_answers_bulk", rejected)
+    assert queue.drain_batch() == 1
+    assert queue.status_for_judge(judge)[alpha]["state"] == "failed"
+    assert queue.pending_count() == 0
@@ -1,5 +1,6 @@
 import streamlit as st
-from db import get_competitors, insert_competitor, update_competitor, delete_competitor
+from db import list_competitors_page, insert_competitor, update_competitor, delete_competitor
+from views.pagination import paginate
 
 def show():
     # Init add form state and pending clear
@@ -35,10 +36,17 @@ def show():
 
     st.subheader("Current competitors")
 
-    # Load and display competitor list with edit/delete
-    competitors = get_competitors()
+    # Load and display the current page of competitors with edit/delete
+    competitors = paginate(
+        "competitor_list",
+        lambda after_id, prefix: list_competitors_page(after_id, prefix=prefix),
+        search_label="Search by name",
+    )
     if not competitors:
-        st.info("No competitors yet.")
+        if st.session_state.get("competitor_list_prefix"):
+            st.info("No competitors match that search.")
+        else:
+            st.info("No competitors yet.")
         return
 
     for comp in competitors:
@@ -30,10 +30,13 @@ def show():
 
     st.write("---")
 
+    # A fresh key after each upload drops the uploaded bytes from this session's state;
+    # the saved banner is read back through the process-wide blob cache
+    uploader_round = st.session_state.get("banner_uploader_round", 0)
     uploaded = st.file_uploader(
         "Choose image file",
         type=["png", "jpg", "jpeg", "webp"],
-        key="banner_uploader",
+        key=f"banner_uploader_{uploader_round}",
     )
     if uploaded:
         data = uploaded.getvalue()
@@ -48,6 +51,7 @@ def show():
             st.image(data, caption="Preview", width="stretch")
             if st.button("Upload banner"):
                 save_banner_image(data, uploaded.name, uploaded.type)
+                st.session_state["banner_uploader_round"] = uploader_round + 1
                 st.success("Banner uploaded.")
                 st.rerun()
 
@@ -0,0 +1,122 @@
+import streamlit as st
+from datetime import datetime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from db import get_backend
+from diagnostics import (
+    COMMAND_LOG_SIZE,
+    N_PLUS_ONE_THRESHOLD,
+    command_recorder,
+    commands_per_page,
+    commands_per_rerun,
+    export_json,
+    n_plus_one,
+    slowest_commands,
+)
+from profiling import PROFILE_MODES, profiler
+
+
+def show():
+    user = st.session_state.get("user")
+    if not user or user.get("role") != "admin":
+        st.error("Admin access required.")
+        st.stop()
+
+    st.header("Diagnostics")
+    render_profiling()
+
+    st.subheader("Database commands")
+    if get_backend().name != "mongo":
+        st.info("Command monitoring is only available with the Mongo backend.")
+        return
+
+    records = command_recorder.snapshot()
+    st.caption(
+        f"Last {len(records)} Mongo commands in this process (keeps up to {COMMAND_LOG_SIZE})."
+    )
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        only_mine = st.checkbox("Only this session", value=False)
+    with col2:
+        threshold = st.number_input(
+            "N+1 threshold (repeats per rerun)", min_value=1, value=N_PLUS_ONE_THRESHOLD
+        )
+    with col3:
+        if st.button("Clear log"):
+            command_recorder.clear()
+            st.rerun()
+
+    if only_mine:
+        ctx = get_script_run_ctx()
+        session_id = ctx.session_id if ctx else None
+        records = [r for r in records if r["session"] == session_id]
+    if not records:
+        st.info("No commands recorded yet.")
+        return
+
+    st.markdown("#### Commands per page")
+    st.dataframe(commands_per_page(records))
+
+    st.markdown("#### Possible N+1 patterns")
+    flagged = n_plus_one(records, int(threshold))
+    if flagged:
+        st.dataframe(flagged)
+    else:
+        st.success(f"No command shape repeated more than {int(threshold)} times in a rerun.")
+
+    st.markdown("#### Slowest commands")
+    st.dataframe(slowest_commands(records))
+
+    with st.expander("Commands per rerun"):
+        st.dataframe(commands_per_rerun(records))
+
+    st.download_button(
+        label="Export diagnostics (JSON)",
+        data=export_json(records, int(threshold)).encode("utf-8"),
+        file_name=f"diagnostics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+        mime="application/json",
+    )
+
+
+def render_profiling():
+    st.subheader("Profiling")
+    enabled = st.toggle(
+        "Profile every rerun (all sessions in this process)", value=profiler.enabled
+    )
+    mode = st.radio(
+        "Profiler",
+        PROFILE_MODES,
+        index=PROFILE_MODES.index(profiler.mode or "cprofile"),
+        format_func=lambda m: "cProfile (.prof)" if m == "cprofile" else "Sampled stacks",
+        horizontal=True,
+    )
+    wanted = mode if enabled else None
+    if wanted != profiler.mode:
+        profiler.set_mode(wanted)
+        st.rerun()
+
+    profiles = profiler.profiles()
+    if not profiles:
+        st.caption("No profiles captured yet." if enabled else "Profiling is off.")
+        return
+    if st.button("Clear profiles"):
+        profiler.clear()
+        st.rerun()
+    for page, entries in profiles.items():
+        with st.expander(f"{page} ({len(entries)} profiles)"):
+            for entry in entries:
+                stamp = entry["at"].strftime("%H:%M:%S")
+                file_name = (
+                    f"profile_{entry['id']}_{entry['at'].strftime('%Y%m%d_%H%M%S')}"
+                    f".{entry['file_ext']}"
+                )
+                st.write(f"**{stamp}** — {entry['seconds'] * 1000:.0f} ms ({entry['mode']})")
+                st.code(entry["summary"] or "(no samples)", language="text")
+                st.download_button(
+                    label=f"Download .{entry['file_ext']}",
+                    data=entry["data"],
+                    file_name=file_name,
+                    mime="application/octet-stream",
+                    key=f"profile_download_{entry['id']}",
+                )
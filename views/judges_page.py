@@ -1,11 +1,12 @@
 import streamlit as st
 from db import (
-    get_judges_with_user,
+    list_judges_page,
     create_judge_account,
     update_judge_account,
     delete_judge_account,
 )
 from pymongo.errors import DuplicateKeyError
+from views.pagination import paginate
 
 def show():
     user = st.session_state.get("user")
@@ -53,10 +54,17 @@ def show():
 
     st.subheader("Current judges")
 
-    # Load and display judge list with edit/delete controls
-    judges = get_judges_with_user()
+    # Load and display the current page of judges with edit/delete controls
+    judges = paginate(
+        "judge_list",
+        lambda after_id, prefix: list_judges_page(after_id, prefix=prefix),
+        search_label="Search by name or email",
+    )
     if not judges:
-        st.info("No judges yet.")
+        if st.session_state.get("judge_list_prefix"):
+            st.info("No judges match that search.")
+        else:
+            st.info("No judges yet.")
         return
 
     for judge in judges:
@@ -1,14 +1,19 @@
 import streamlit as st
 from db import (
-    get_leaderboard,
-    get_judges_with_user,
-    get_competitors,
-    get_questions,
-    get_answers_for_judge_competitor,
+    get_judges,
+    get_leaderboard_as_of,
+    get_leaderboard_page_data,
+    get_submission_history,
 )
+from exports import get_detailed_export_job, start_detailed_export
+from live_leaderboard import get_leaderboard_feed
 import io
 import csv
-from datetime import datetime
+from datetime import datetime, timedelta
+
+LIVE_KEY = "live_leaderboard"
+# How often a live screen checks the shared feed for changed rows
+LIVE_REFRESH_SECONDS = 2
 
 def show():
     user = st.session_state.get("user")
@@ -17,37 +22,20 @@ def show():
         st.stop()
 
     st.header("Leaderboard")
+    if st.toggle("Live", key="leaderboard_live", help="Update in place as scores come in"):
+        render_live_leaderboard()
+        return
     if st.button("Refresh leaderboard"):
         st.rerun()
 
-    # Get aggregated scores
-    results = get_leaderboard()
+    # Get aggregated scores (and the data version for the export cache) in parallel
+    page_data = get_leaderboard_page_data()
+    results = page_data.leaderboard
     if not results:
         st.info("No scores yet.")
         return
 
-    # Convert result rows into dict format for Streamlit
-    # Assign ranks so that tied average scores share the same rank
-    data = []
-    # Dense ranking: ties receive the same rank, and the next distinct score increments rank by 1
-    prev_avg = None
-    current_rank = 0
-    for row in results:
-        avg = row.get("avg_score", 0)
-        if prev_avg is None:
-            current_rank = 1
-        elif avg != prev_avg:
-            current_rank += 1
-        rank = current_rank
-        data.append({
-            "Rank": rank,
-            "Competitor": row["competitor_name"],
-            "Number of Judges that entered scores": row["num_scores"],
-            "Total Score": round(row["total_score"], 2),
-            "Average Score": round(avg, 2),
-        })
-        prev_avg = avg
-
+    data = ranked_rows(results)
     st.dataframe(data)
 
     # CSV export: create CSV bytes and provide a download button
@@ -73,69 +61,142 @@ def show():
             help="Download current leaderboard as a CSV file",
         )
 
-    # Detailed export: per-judge per-competitor with individual question values
-    if True:
-        judges = get_judges_with_user()
-        competitors = get_competitors()
-        questions = get_questions()
-        # Build headers: judge info + competitor info + one column per question
-        q_headers = [f"Q: {q['prompt']}" for q in questions]
-        fieldnames = [
-            "Judge ID",
-            "Judge Name",
-            "Username",
-            "Judge Email",
-            "Competitor ID",
-            "Competitor",
-            "Competitor Notes",
-        ] + q_headers + ["Average Score"]
+    render_detailed_export(page_data.data_version)
+    render_history()
 
-        detailed_buffer = io.StringIO()
-        writer = csv.DictWriter(detailed_buffer, fieldnames=fieldnames)
-        writer.writeheader()
-        for j in judges:
-            j_id = j.get("id")
-            j_name = j.get("name")
-            j_user = j.get("username")
-            j_email = j.get("email")
-            for c in competitors:
-                row = {
-                    "Judge ID": j_id,
-                    "Judge Name": j_name,
-                    "Username": j_user,
-                    "Judge Email": j_email,
-                    "Competitor ID": c.get("id"),
-                    "Competitor": c.get("name"),
-                    "Competitor Notes": c.get("notes", ""),
-                }
-                answers = get_answers_for_judge_competitor(j_id, c.get("id"))
-                vals = []
-                for q in questions:
-                    raw = answers.get(q.get("id"))
-                    if raw is None:
-                        cell = ""
-                    else:
-                        try:
-                            # stored as multiples of 10 — convert back to 0-10 scale
-                            cell = float(raw) / 10.0
-                        except Exception:
-                            cell = raw
-                    row[f"Q: {q['prompt']}"] = cell
-                    if cell != "":
-                        try:
-                            vals.append(float(cell))
-                        except Exception:
-                            pass
-                # avg of question values (0-10), empty if no vals
-                row["Average Score"] = round(sum(vals) / len(vals), 2) if vals else ""
-                writer.writerow(row)
-
-        detailed_bytes = detailed_buffer.getvalue().encode("utf-8")
-        detailed_name = f"detailed_submissions_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        st.download_button(
-            label="Export detailed submissions (CSV)",
-            data=detailed_bytes,
-            file_name=detailed_name,
-            mime="text/csv",
-            help="Download per-judge, per-competitor question-level submissions",
+
+def ranked_rows(results):
+    # Convert result rows into dict format for Streamlit
+    # Assign ranks so that tied average scores share the same rank
+    data = []
+    # Dense ranking: ties receive the same rank, and the next distinct score increments rank by 1
+    prev_avg = None
+    current_rank = 0
+    for row in results:
+        avg = row.get("avg_score", 0)
+        if prev_avg is None:
+            current_rank = 1
+        elif avg != prev_avg:
+            current_rank += 1
+        rank = current_rank
+        data.append({
+            "Rank": rank,
+            "Competitor": row["competitor_name"],
+            "Number of Judges that entered scores": row["num_scores"],
+            "Total Score": round(row["total_score"], 2),
+            "Average Score": round(avg, 2),
+        })
+        prev_avg = avg
+    return data
+
+
+def render_detailed_export(version):
+    # Detailed export: per-judge per-competitor with individual question values.
+    # Built on request in a worker thread and cached per data version.
+    st.subheader("Detailed submissions")
+    job = get_detailed_export_job(version)
+
+    if job is None or job.error:
+        if job and job.error:
+            st.error(f"Detailed export failed: {job.error}")
+        if st.button("Prepare detailed export"):
+            start_detailed_export(version)
+            st.rerun()
+        return
+
+    if job.running:
+        render_export_progress(version)
+        return
+
+    detailed_name = f"detailed_submissions_{job.finished_at.strftime('%Y%m%d_%H%M%S')}.csv"
+    st.download_button(
+        label="Export detailed submissions (CSV)",
+        data=job.data,
+        file_name=detailed_name,
+        mime="text/csv",
+        help="Download per-judge, per-competitor question-level submissions",
+    )
+
+
+@st.fragment(run_every=1)
+def render_export_progress(version):
+    job = get_detailed_export_job(version)
+    if job is None or not job.running:
+        # Finished (or evicted): rerun the page so the download button renders
+        st.rerun()
+    st.progress(
+        job.progress,
+        text=f"Building detailed export... {job.done}/{job.total or '?'} rows",
+    )
+
+
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def render_live_leaderboard():
+    # Only this fragment reruns; each screen merges just the rows changed since its last tick
+    feed = get_leaderboard_feed()
+    feed.refresh()
+    state = st.session_state.get(LIVE_KEY)
+    seq, changed = feed.changes_since(state["seq"] if state else None)
+    if changed is None:
+        seq, rows = feed.rows()
+        state = {"seq": seq, "rows": rows, "updated": [], "updated_at": datetime.now()}
+    elif changed:
+        for competitor_id, row in changed.items():
+            if row is None:
+                state["rows"].pop(competitor_id, None)
+            else:
+                state["rows"][competitor_id] = row
+        state["seq"] = seq
+        state["updated"] = [row["competitor_name"] for row in changed.values() if row]
+        state["updated_at"] = datetime.now()
+    st.session_state[LIVE_KEY] = state
+
+    results = sorted(
+        state["rows"].values(), key=lambda row: (-row["avg_score"], row["competitor_id"])
+    )
+    if not results:
+        st.info("No scores yet.")
+    else:
+        st.dataframe(ranked_rows(results))
+    caption = f"Live via {feed.mode}; last change {state['updated_at']:%H:%M:%S}"
+    if state["updated"]:
+        caption += f" ({', '.join(state['updated'])})"
+    st.caption(caption)
+
+
+def render_history():
+    # Rebuilt from the submissions log, so earlier standings and late changes can be audited.
+    # A toggle rather than an expander: expander bodies run (and query) even when closed.
+    st.subheader("History")
+    if st.toggle("Show standings as of a past time", key="history_open"):
+        # Default to the end of the current minute so the latest saves are included
+        default = (datetime.utcnow() + timedelta(minutes=1)).replace(second=0, microsecond=0)
+        col_date, col_time = st.columns(2)
+        day = col_date.date_input("As of date (UTC)", value=default.date(), key="history_date")
+        moment = col_time.time_input(
+            "As of time (UTC)", value=default.time(), step=60, key="history_time"
         )
+        as_of = datetime.combine(day, moment)
+        try:
+            standings = get_leaderboard_as_of(as_of)
+        except ValueError as exc:
+            st.info(str(exc))
+            return
+        st.dataframe(ranked_rows(standings))
+
+        st.write("#### Score changes in the 24 hours before that time")
+        changes = get_submission_history(since=as_of - timedelta(days=1), until=as_of)
+        if not changes:
+            st.caption("No score changes in that window.")
+            return
+        competitors = {row["competitor_id"]: row["competitor_name"] for row in standings}
+        judges = {judge["id"]: judge["name"] for judge in get_judges()}
+        st.dataframe([
+            {
+                "At (UTC)": change["at"].strftime("%Y-%m-%d %H:%M:%S"),
+                "Judge": judges.get(change["judge_id"], change["judge_id"]),
+                "Competitor": competitors.get(change["competitor_id"], change["competitor_id"]),
+                "Score": "cleared" if change["score"] is None else round(change["score"], 2),
+            }
+            for change in changes
+        ])
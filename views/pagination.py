@@ -0,0 +1,38 @@
+import streamlit as st
+
+
+def paginate(key, fetch_page, search_label=None):
+    """
+    Fetch the current page for a list view and render its search box and Prev/Next buttons.
+
+    `fetch_page(after_id, prefix)` returns a db.EntityPage. The session keeps a stack of
+    page starts under `key`, so Prev goes back without re-counting; a changed search
+    starts again from the first page. Returns the page's items.
+    """
+    cursors_key = f"{key}_cursors"
+    prefix_key = f"{key}_prefix"
+
+    prefix = ""
+    if search_label:
+        prefix = st.text_input(search_label, key=f"{key}_search").strip()
+    if st.session_state.get(prefix_key) != prefix or cursors_key not in st.session_state:
+        st.session_state[prefix_key] = prefix
+        st.session_state[cursors_key] = [None]
+    cursors = st.session_state[cursors_key]
+
+    page = fetch_page(cursors[-1], prefix)
+    # Deleting the last row on a page leaves it empty; step back to the previous page
+    if not page.items and len(cursors) > 1:
+        cursors.pop()
+        st.rerun()
+
+    if len(cursors) > 1 or page.next_after:
+        col_prev, col_page, col_next = st.columns([1, 2, 1])
+        if col_prev.button("Prev", key=f"{key}_prev", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+        col_page.caption(f"Page {len(cursors)}")
+        if col_next.button("Next", key=f"{key}_next", disabled=not page.next_after):
+            cursors.append(page.next_after)
+            st.rerun()
+    return page.items
@@ -1,6 +1,6 @@
 import streamlit as st
 from db import (
-    get_questions,
+    list_questions_page,
     insert_question,
     update_question,
     delete_question,
@@ -8,6 +8,7 @@ from db import (
     set_intro_message,
     clear_intro_message,
 )
+from views.pagination import paginate
 
 
 def show():
@@ -48,7 +49,7 @@ def render_add_form():
 
 def render_question_list():
     st.subheader("Current questions")
-    questions = get_questions()
+    questions = paginate("question_list", lambda after_id, prefix: list_questions_page(after_id))
     if not questions:
         st.info("No questions yet.")
         return
@@ -1,13 +1,32 @@
 import streamlit as st
 from db import (
-    get_competitors,
-    get_judge_by_id,
-    get_questions,
-    get_answers_for_judge_competitor,
-    save_answers_for_judge,
+    COMPETITOR_PICKER_LIMIT,
+    SCORING_CONTEXT_COLLECTIONS,
     get_banner_image,
-    get_intro_message,
+    get_scoring_context,
+    get_versions,
+    search_competitors_for_judge,
 )
+from submission_queue import get_submission_queue, submit_answers
+
+CONTEXT_KEY = "scoring_context"
+# How often the pending-saves notice checks whether the queue has drained
+QUEUE_STATUS_SECONDS = 2
+# Competitors shown at once in grid mode
+GRID_ROWS = 50
+
+
+def load_context(judge_id):
+    # Reuse this judge's snapshot until they save or an admin changes shared data
+    cached = st.session_state.get(CONTEXT_KEY)
+    version = get_versions(*SCORING_CONTEXT_COLLECTIONS)
+    if cached and cached["judge_id"] == judge_id and cached["version"] == version:
+        return cached
+    context = get_scoring_context(judge_id)
+    context["judge_id"] = judge_id
+    st.session_state[CONTEXT_KEY] = context
+    return context
+
 
 def show():
     user = st.session_state.get("user")
@@ -15,35 +34,33 @@ def show():
         st.error("Judge access required to enter scores.")
         st.stop()
 
+    judge_id = user.get("judge_id")
+    context = load_context(judge_id) if judge_id else {}
+
     # Show optional banner image configured by admin
-    try:
-        banner = get_banner_image()
-    except Exception:
-        banner = None
+    # Bytes come from the process-wide blob cache, never from session state
+    banner = get_banner_image() if context.get("banner") else None
     if banner and banner.get("data"):
         st.image(banner["data"], width="stretch")
 
     st.header("Enter Scores")
-    intro = get_intro_message()
+    intro = context.get("intro")
     if intro:
         st.info(intro)
 
     # Show success toast if flagged from previous save
-    if st.session_state.pop("score_saved", False):
+    saved = st.session_state.pop("score_saved", False)
+    if saved == "queued":
+        st.toast("Scores saved on this device; sending them to the database.", icon="⏳")
+    elif saved:
         st.toast("Scores saved.", icon="✅")
 
-    # Load competitors for scoring and active questions
-    competitors = get_competitors()
-    questions = get_questions()
+    questions = context.get("questions", [])
 
-    judge_id = user.get("judge_id")
-    judge = get_judge_by_id(judge_id) if judge_id else None
+    judge = context.get("judge")
     if not judge:
         st.error("Judge account is missing a profile.")
         return
-    if not competitors:
-        st.warning("Add competitors first.")
-        return
 
     if not questions:
         st.warning("Admin needs to add questions before scoring.")
@@ -51,15 +68,37 @@ def show():
 
     st.write("---")
 
-    # Competitor selector
-    competitor_options = {f"{c['name']}": c for c in competitors}
-    selected_label = st.selectbox("Select a competitor", list(competitor_options.keys()), index=0)
-    comp = competitor_options[selected_label]
+    # Saves still in the write-behind queue win over what storage has confirmed so far
+    queued = {}
+    queue = get_submission_queue()
+    if queue is not None:
+        queued = queue.status_for_judge(judge_id)
+        if any(entry["state"] == "pending" for entry in queued.values()):
+            render_pending_notice(judge_id)
+    answers_by_competitor = dict(context["answers_by_competitor"])
+    for competitor_id, entry in queued.items():
+        if entry["state"] == "pending":
+            answers_by_competitor[competitor_id] = entry["answers"]
+
+    if st.toggle("Grid mode", key="score_grid_mode", help="Score many competitors, save once"):
+        render_score_grid(judge_id, questions, answers_by_competitor)
+        return
+
+    comp = render_competitor_picker(judge_id, queued)
+    if not comp:
+        return
 
     st.write(f"### Scoring: {comp['name']}")
+    queue_entry = queued.get(comp["id"])
+    if queue_entry and queue_entry["state"] == "pending":
+        st.info("Saved on this device and waiting for the database; nothing else to do.")
+    elif queue_entry and queue_entry["state"] == "failed":
+        st.error(
+            f"The database rejected your last save ({queue_entry['error']}). Please save again."
+        )
 
     # Load existing answers
-    existing_answers = get_answers_for_judge_competitor(judge_id, comp["id"])
+    existing_answers = answers_by_competitor.get(comp["id"], {})
     answers = {}
     # Determine whether this competitor has already been scored by this judge
     scored = any(int(v) > 0 for v in (existing_answers.values() if existing_answers else []))
@@ -100,8 +139,133 @@ def show():
             st.error("Please score all questions before saving.")
         else:
             cleaned = {qid: val * 10 for qid, val in answers.items()}
-            save_answers_for_judge(judge_id, comp["id"], cleaned)
+            pending = submit_answers(judge_id, {comp["id"]: cleaned})
+            st.session_state.pop(CONTEXT_KEY, None)
             # clear editing state and show toast on rerun
             st.session_state[editing_key] = False
-            st.session_state["score_saved"] = True
+            st.session_state["score_saved"] = "queued" if pending else True
             st.rerun()
+
+
+def render_competitor_picker(judge_id, queued):
+    # Only a bounded page of prefix matches is fetched, however many competitors exist
+    search = st.text_input(
+        "Find a competitor", key="competitor_search", placeholder="Start typing a name"
+    )
+    matches = search_competitors_for_judge(judge_id, search)
+    if not matches:
+        if search.strip():
+            st.info("No competitors match that name.")
+        else:
+            st.warning("Add competitors first.")
+        return None
+
+    # Options are ids so competitors sharing a name stay separate
+    by_id = {c["id"]: c for c in matches}
+
+    def label(cid):
+        state = queued.get(cid, {}).get("state")
+        if state == "pending":
+            return f"{by_id[cid]['name']} ⏳"
+        if state == "failed":
+            return f"{by_id[cid]['name']} ⚠"
+        return f"{by_id[cid]['name']}{' ✓' if by_id[cid]['scored'] else ''}"
+
+    selected_id = st.selectbox("Select a competitor", list(by_id), index=0, format_func=label)
+    if len(matches) == COMPETITOR_PICKER_LIMIT:
+        st.caption(
+            f"Showing the first {COMPETITOR_PICKER_LIMIT} matches; keep typing to narrow the list."
+        )
+    return by_id[selected_id]
+
+
+def _grid_value(value):
+    # Cleared cells come back as None or NaN
+    if value is None or value != value:
+        return None
+    return int(value)
+
+
+def render_score_grid(judge_id, questions, answers_by_competitor):
+    search = st.text_input(
+        "Find competitors", key="grid_search", placeholder="Start typing a name"
+    )
+    matches = search_competitors_for_judge(judge_id, search, limit=GRID_ROWS)
+    if not matches:
+        if search.strip():
+            st.info("No competitors match that name.")
+        else:
+            st.warning("Add competitors first.")
+        return
+
+    # Same 1-10 scale as the radios; stored values are x10
+    rows = []
+    for comp in matches:
+        stored = answers_by_competitor.get(comp["id"], {})
+        row = {"competitor": comp["name"], "scored": comp["scored"]}
+        for q in questions:
+            value = stored.get(q["id"])
+            row[q["id"]] = int(value / 10) if value else None
+        rows.append(row)
+    column_config = {
+        "competitor": st.column_config.TextColumn("Competitor", disabled=True),
+        "scored": st.column_config.CheckboxColumn("Scored", disabled=True),
+    }
+    for q in questions:
+        column_config[q["id"]] = st.column_config.NumberColumn(
+            q["prompt"], min_value=1, max_value=10, step=1, format="%d"
+        )
+
+    # Edits inside a form don't rerun the page; everything is sent on Save
+    grid_key = f"score_grid_{judge_id}_{search.strip().lower()}"
+    with st.form("score_grid"):
+        edited = st.data_editor(
+            rows,
+            column_config=column_config,
+            hide_index=True,
+            num_rows="fixed",
+            key=grid_key,
+        )
+        submitted = st.form_submit_button("Save grid")
+    if len(matches) == GRID_ROWS:
+        st.caption(f"Showing the first {GRID_ROWS} matches; search to reach the others.")
+    if not submitted:
+        return
+
+    changed, incomplete = {}, []
+    for comp, before, after in zip(matches, rows, edited):
+        values = {q["id"]: _grid_value(after.get(q["id"])) for q in questions}
+        if all(values[qid] == before[qid] for qid in values):
+            continue
+        if any(value is None for value in values.values()):
+            incomplete.append(comp["name"])
+        else:
+            changed[comp["id"]] = {qid: value * 10 for qid, value in values.items()}
+    if incomplete:
+        st.error(f"Please score all questions before saving: {', '.join(incomplete)}.")
+        return
+    if not changed:
+        st.info("No changes to save.")
+        return
+
+    pending = submit_answers(judge_id, changed)
+    st.session_state.pop(CONTEXT_KEY, None)
+    st.session_state.pop(grid_key, None)
+    st.session_state["score_saved"] = "queued" if pending else True
+    st.rerun()
+
+
+@st.fragment(run_every=QUEUE_STATUS_SECONDS)
+def render_pending_notice(judge_id):
+    # Local-file check only; reruns the page once the queue has caught up
+    queue = get_submission_queue()
+    pending = sum(
+        entry["state"] == "pending" for entry in queue.status_for_judge(judge_id).values()
+    )
+    if not pending:
+        st.session_state.pop(CONTEXT_KEY, None)
+        st.rerun()
+    message = f"{pending} save{'s' if pending != 1 else ''} waiting for the database."
+    if queue.last_error:
+        message += " The database is not responding; retrying automatically."
+    st.caption(message)